@@ -8,10 +8,14 @@ from basyx.aas.adapter import aasx
 from basyx.aas.model.base import Identifier
 
 from typing import Dict, List, Set
+from backend.knowledge_graph.GraphChangeLog import GraphChangeLog, GraphChangeTypes
 from backend.knowledge_graph.KnowledgeGraphPersistenceService import (
     KnowledgeGraphPersistenceService,
 )
 from backend.knowledge_graph.dao.AssetNodesDao import AssetsDao
+from backend.specialized_databases.timeseries.range_cache_invalidation import (
+    invalidate_cached_ranges,
+)
 from graph_domain.main_digital_twin.SupplementaryFileNode import (
     SupplementaryFileNodeDeep,
 )
@@ -521,3 +525,8 @@ def deserialize_from_aasx(
             asset2_iri=similarity.get("asset2"),
             similarity_score=similarity.get("similarity_score"),
         )
+
+    # New timeseries inputs, connections...: workers have to reload everything
+    GraphChangeLog.instance().record_change(change_type=GraphChangeTypes.FULL)
+    # Imported time-series might reuse IRIs of cached ones
+    invalidate_cached_ranges(reason="AASX file imported")
@@ -42,6 +42,7 @@ from dateutil import tz
 from backend.knowledge_graph.dao.AnnotationNodesDao import AnnotationNodesDao
 from datetime import datetime, timedelta
 from graph_domain.main_digital_twin.RuntimeConnectionNode import RuntimeConnectionNode
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
 from util.environment_and_configuration import (
     get_environment_variable,
@@ -88,16 +89,7 @@ class AnnotationDetector(abc.ABC):
 
         # Get original timeseries excerpt:
         self.original_ts_dataframes: Dict[str, pd.DataFrame] = dict()
-        for ts_iri in self.scanned_timeseries_iris.keys():
-            service: TimeseriesPersistenceService = self.persistence_services.get(
-                ts_iri
-            )
-            dataframe = service.read_period_to_dataframe(
-                iri=ts_iri,
-                begin_time=self.scanned_annotation_instance.occurance_start_date_time,
-                end_time=self.scanned_annotation_instance.occurance_end_date_time,
-            )
-
+        for ts_iri, dataframe in self._read_original_ts_dataframes().items():
             # Convert bools to integers to allow comparison
             if len(dataframe["value"]) > 0 and isinstance(
                 dataframe["value"][0], np.bool_
@@ -124,12 +116,15 @@ class AnnotationDetector(abc.ABC):
         self.timeseries_max_values_for_original: Dict[str, float] = dict()
         self.timeseries_max_values_for_scanned: Dict[str, float] = dict()
         for ts_iri in self.scanned_timeseries_iris.keys():
-            self.timeseries_max_values_for_original[
-                ts_iri
-            ] = self.persistence_services.get(ts_iri).max_value_for_period(ts_iri)
-            self.timeseries_min_values_for_original[
-                ts_iri
-            ] = self.persistence_services.get(ts_iri).min_value_for_period(ts_iri)
+            # Running statistics instead of scanning the whole history.
+            # None (not normalized) for non-numeric series
+            statistics = self.persistence_services.get(ts_iri).get_statistics(ts_iri)
+            self.timeseries_max_values_for_original[ts_iri] = (
+                statistics.max if statistics is not None else None
+            )
+            self.timeseries_min_values_for_original[ts_iri] = (
+                statistics.min if statistics is not None else None
+            )
             self.timeseries_min_values_for_scanned[
                 self.scanned_timeseries_iris.get(ts_iri)
             ] = self.timeseries_min_values_for_original.get(ts_iri)
@@ -141,6 +136,36 @@ class AnnotationDetector(abc.ABC):
 
         self.runtime_con_container = RuntimeConnectionContainer.instance()
 
+    def _read_original_ts_dataframes(self) -> Dict[str, pd.DataFrame]:
+        """
+        Reads the annotated excerpts of all original time-series, with one batch read per database
+        :return: ts iri -> dataframe
+        """
+        iris_per_service: Dict[TimeseriesPersistenceService, List[str]] = dict()
+        for ts_iri in self.scanned_timeseries_iris.keys():
+            iris_per_service.setdefault(
+                self.persistence_services.get(ts_iri), []
+            ).append(ts_iri)
+
+        dataframes: Dict[str, pd.DataFrame] = dict()
+        for service, ts_iris in iris_per_service.items():
+            service_dataframes = service.read_many_periods_to_dataframes(
+                iris=ts_iris,
+                begin_time=self.scanned_annotation_instance.occurance_start_date_time,
+                end_time=self.scanned_annotation_instance.occurance_end_date_time,
+            )
+            if service_dataframes is None:
+                # Database not available
+                logger.info(
+                    f"Original time-series of {self.input_handler_id} not available: {service.iri} not reachable"
+                )
+                service_dataframes = {
+                    ts_iri: pd.DataFrame({"time": [], "value": []})
+                    for ts_iri in ts_iris
+                }
+            dataframes.update(service_dataframes)
+        return dataframes
+
     @abc.abstractmethod
     def _handle_new_reading(self, reading):
         pass
@@ -252,18 +277,25 @@ class AnnotationDetector(abc.ABC):
         rt_con_container = RuntimeConnectionContainer.instance()
         for ts_iri in self.scanned_timeseries_iris.values():
             ts_input = rt_con_container.get_timeseries_input_by_iri(ts_iri)
+            # Resolved once per input: only boolean series need to be converted
             ts_input.register_handler(
-                self._reading_handler, handler_id=self.input_handler_id
+                self._bool_reading_handler
+                if ts_input.value_type == TimeseriesValueTypes.BOOL.value
+                else self._reading_handler,
+                handler_id=self.input_handler_id,
             )
 
         self.active = True
 
     def _reading_handler(self, ts_iri, reading_value, reading_time):
-        # Convert bool values to integers
-        if isinstance(reading_value, bool):
-            reading_value = 1 if reading_value else 0
         self.detector_input_queue.put((ts_iri, reading_value, reading_time))
 
+    def _bool_reading_handler(self, ts_iri, reading_value, reading_time):
+        # Convert bool values to integers
+        self.detector_input_queue.put(
+            (ts_iri, 1 if reading_value else 0, reading_time)
+        )
+
     def stop_detection(self):
         logger.info(
             f"Stopping detection of {self.scanned_annotation_instance.caption} on {self.scanned_asset.caption}"
@@ -1,9 +1,16 @@
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, List, Set, Tuple
 from backend.annotation_detection.AnnotationDetector import AnnotationDetector
 from backend.annotation_detection.EuclidianDistanceAnnotationDetector import (
     EuclidianDistanceAnnotationDetector,
 )
+from backend.knowledge_graph.GraphChangeLog import (
+    FULL_REFRESH_INTERVAL,
+    INITIAL_CURSOR,
+    GraphChangeCursor,
+    GraphChangeLog,
+    GraphChangeTypes,
+)
 from backend.knowledge_graph.dao.AnnotationNodesDao import AnnotationNodesDao
 from graph_domain.expert_annotations.AnnotationInstanceNode import (
     AnnotationInstanceNodeDeep,
@@ -73,6 +80,8 @@ class AnnotationDetectorContainer:
         # Dict: (instance_iri, asset_iri) -> AnnotationDetector
         self.detectors: Dict[Tuple[str, str, float], AnnotationDetector] = {}
         self._active_detectors_status_thread = None
+        self._graph_change_cursor: GraphChangeCursor = INITIAL_CURSOR
+        self._last_full_refresh = 0.0
 
     def start_active_detectors_status_thread(self):
         self._active_detectors_status_thread = Thread(
@@ -80,8 +89,36 @@ class AnnotationDetectorContainer:
         )
         self._active_detectors_status_thread.start()
 
+    def apply_graph_changes(self):
+        """Polls the graph change log and only refreshes the detectors of the changed annotation instances.
+        Falls back to a full refresh, if the log can not tell what changed. Refreshes fully every
+        FULL_REFRESH_INTERVAL as well, for changes not in the log."""
+        cursor, changes = GraphChangeLog.instance().get_changes_since(
+            self._graph_change_cursor
+        )
+        if (
+            changes is None
+            or time.monotonic() - self._last_full_refresh >= FULL_REFRESH_INTERVAL
+        ):
+            self.refresh_annotation_detectors()
+        else:
+            instance_iris = set(
+                [
+                    iri
+                    for change_type, iri in changes
+                    if change_type == GraphChangeTypes.ANNOTATION_INSTANCE
+                ]
+            )
+            if len(instance_iris) > 0:
+                self.refresh_annotation_detectors_for_instances(instance_iris)
+
+        # Only after successfully applying, so that the changes are retried otherwise
+        self._graph_change_cursor = cursor
+
     def refresh_annotation_detectors(self):
         """Refreshes the annotation detectors, creating new ones if available in the graph, or deleting old ones."""
+        logger.info("Refreshing all annotation detectors...")
+        self._last_full_refresh = time.monotonic()
         annotations_dao: AnnotationNodesDao = AnnotationNodesDao.instance()
         updated_instance_nodes_flat: List[
             AnnotationInstanceNodeFlat
@@ -89,21 +126,57 @@ class AnnotationDetectorContainer:
 
         updated_detector_tuples: List[Tuple[str, str, float]] = []
         for instance in updated_instance_nodes_flat:
-            updated_detector_tuples.extend(
-                [
-                    # Precision sum used so that the detectors will be reinstantiated if one of the values was changed (sum as to only use one value in the tuple)
-                    (
-                        instance.iri,
-                        asset.iri,
-                        annotations_dao.get_detection_precision_sum_for_instance(
-                            instance.iri
-                        ),
-                    )
-                    for asset in annotations_dao.get_scanned_assets_for_annotation_instance(
-                        instance.iri
-                    )
-                ]
+            updated_detector_tuples.extend(self._get_detector_tuples(instance.iri))
+
+        self._update_detectors(
+            current_detector_tuples=list(self.detectors.keys()),
+            updated_detector_tuples=updated_detector_tuples,
+        )
+
+    def refresh_annotation_detectors_for_instances(self, instance_iris: Set[str]):
+        """Refreshes only the annotation detectors of the given instances (e.g. after they have been changed)"""
+        logger.info(
+            f"Refreshing annotation detectors of {len(instance_iris)} changed annotation instance(s)..."
+        )
+        annotations_dao: AnnotationNodesDao = AnnotationNodesDao.instance()
+
+        updated_detector_tuples: List[Tuple[str, str, float]] = []
+        for instance_iri in instance_iris:
+            instance = annotations_dao.get_annotation_instance_flat(instance_iri)
+            # Deleted or scan deactivated:
+            if instance is None or instance.activate_occurance_scan is False:
+                continue
+            updated_detector_tuples.extend(self._get_detector_tuples(instance_iri))
+
+        self._update_detectors(
+            current_detector_tuples=[
+                detector_tuple
+                for detector_tuple in self.detectors.keys()
+                if detector_tuple[0] in instance_iris
+            ],
+            updated_detector_tuples=updated_detector_tuples,
+        )
+
+    def _get_detector_tuples(self, instance_iri: str) -> List[Tuple[str, str, float]]:
+        """One detector per scanned asset of the instance"""
+        annotations_dao: AnnotationNodesDao = AnnotationNodesDao.instance()
+        # Precision sum used so that the detectors will be reinstantiated if one of the values was changed (sum as to only use one value in the tuple)
+        precision_sum = annotations_dao.get_detection_precision_sum_for_instance(
+            instance_iri
+        )
+        return [
+            (instance_iri, asset.iri, precision_sum)
+            for asset in annotations_dao.get_scanned_assets_for_annotation_instance(
+                instance_iri
             )
+        ]
+
+    def _update_detectors(
+        self,
+        current_detector_tuples: List[Tuple[str, str, float]],
+        updated_detector_tuples: List[Tuple[str, str, float]],
+    ):
+        """Stops the detectors not contained in the updated tuples anymore and starts the new ones"""
 
         #
         # Check if detectors have been removed:
@@ -111,7 +184,7 @@ class AnnotationDetectorContainer:
 
         removed_detector_tuples = [
             tuple
-            for tuple in self.detectors.keys()
+            for tuple in current_detector_tuples
             if tuple not in updated_detector_tuples
         ]
 
@@ -3,9 +3,6 @@ import pandas as pd
 import numpy as np
 from typing import Dict
 from util.log import logger
-from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
-    TimeseriesPersistenceService,
-)
 from util.environment_and_configuration import (
     ConfigGroups,
     get_configuration,
@@ -176,16 +173,7 @@ class EuclidianDistanceAnnotationDetector(AnnotationDetector):
         self.current_ts_arrays: Dict[str, np.array] = dict()
 
         # Calculate the threshold to be used for detections:
-        for ts_iri in self.scanned_timeseries_iris.keys():
-            service: TimeseriesPersistenceService = self.persistence_services.get(
-                ts_iri
-            )
-            dataframe = service.read_period_to_dataframe(
-                iri=ts_iri,
-                begin_time=self.scanned_annotation_instance.occurance_start_date_time,
-                end_time=self.scanned_annotation_instance.occurance_end_date_time,
-            )
-            self.original_ts_dataframes[ts_iri] = dataframe
+        self.original_ts_dataframes.update(self._read_original_ts_dataframes())
 
     def _normalize_array(self, array: np.array, min_value, max_value) -> np.array:
         if min_value is None or max_value is None:
@@ -0,0 +1,261 @@
+import json
+from typing import Dict, List, Tuple
+
+from backend.runtime_connections.IngestionSupervisor import (
+    SHARD_COUNT_KEY,
+    get_shard_metrics_publisher,
+)
+from backend.runtime_connections.RuntimeConnectionContainer import (
+    MAIN_METRICS_PUBLISHER,
+    METRICS_KEY_PREFIX,
+)
+from util.inter_process_cache import memcache
+from util.metrics import (
+    Sample,
+    histogram_samples,
+    merge_histograms,
+    render_prometheus,
+)
+
+# metric name -> (type, help text)
+METRIC_TYPES: Dict[str, Tuple[str, str]] = {
+    "sindit_ingestion_processes": (
+        "gauge",
+        "Ingestion processes currently publishing metrics",
+    ),
+    "sindit_ingestion_connection_active": (
+        "gauge",
+        "Whether the runtime connection is active",
+    ),
+    "sindit_ingestion_timeseries_inputs": (
+        "gauge",
+        "Timeseries inputs of the runtime connection",
+    ),
+    "sindit_ingestion_messages_received_total": (
+        "counter",
+        "Messages, notifications or read results received by the runtime connection",
+    ),
+    "sindit_ingestion_readings_total": (
+        "counter",
+        "Readings handled by the timeseries inputs of the runtime connection",
+    ),
+    "sindit_ingestion_timestamp_fallbacks_total": (
+        "counter",
+        "Readings without valid timestamp, for which the receive time was used",
+    ),
+    "sindit_ingestion_handler_latency_seconds": (
+        "histogram",
+        "Time for converting a reading and calling all handlers of the input",
+    ),
+    "sindit_ingestion_compression_readings_total": (
+        "counter",
+        "Readings received, stored and suppressed by the ingestion compression filters",
+    ),
+    "sindit_timeseries_write_queue_depth": (
+        "gauge",
+        "Readings waiting in the write buffers",
+    ),
+    "sindit_timeseries_write_queue_size": (
+        "gauge",
+        "Capacity of the write buffers",
+    ),
+    "sindit_timeseries_write_readings_total": (
+        "counter",
+        "Readings passed through the write buffers by result",
+    ),
+    "sindit_timeseries_write_batches_total": (
+        "counter",
+        "Batches written to the timeseries database",
+    ),
+    "sindit_timeseries_write_backpressure_events_total": (
+        "counter",
+        "Readings for which the producer was blocked by a full write buffer",
+    ),
+    "sindit_timeseries_write_batch_latency_seconds": (
+        "histogram",
+        "Duration of successful batch writes to the timeseries database",
+    ),
+    "sindit_timeseries_rollup_readings_total": (
+        "counter",
+        "Readings aggregated into rollups or ignored as late (bucket already written)",
+    ),
+    "sindit_timeseries_rollup_buckets_total": (
+        "counter",
+        "Closed rollup buckets written or dropped",
+    ),
+    "sindit_timeseries_spool_readings": (
+        "gauge",
+        "Readings spooled to disk and not yet replayed",
+    ),
+    "sindit_timeseries_spool_disk_usage_bytes": (
+        "gauge",
+        "Disk usage of the spool",
+    ),
+}
+
+# Write statistics key -> result label of sindit_timeseries_write_readings_total
+WRITE_READINGS_RESULTS = {
+    "enqueued": "enqueued",
+    "written": "written",
+    "dropped_queue_full": "dropped_queue_full",
+    "overflow_spooled": "overflow_spooled",
+    "dropped_write_failed": "dropped_write_failed",
+    "spooled": "spooled",
+    "replayed": "replayed",
+    "dropped_spool_full": "dropped_spool_full",
+    "spool_corrupted": "dropped_spool_corrupted",
+}
+
+
+def _get_metrics_snapshots() -> List[Dict]:
+    """
+    :return: the latest metrics snapshots of all ingestion processes (not sharded or all shards)
+    """
+    publishers = [MAIN_METRICS_PUBLISHER]
+    shard_count = memcache.get(SHARD_COUNT_KEY)
+    if shard_count is not None:
+        publishers.extend(
+            get_shard_metrics_publisher(shard_id)
+            for shard_id in range(int(shard_count))
+        )
+
+    snapshots = memcache.get_many(
+        [f"{METRICS_KEY_PREFIX}{publisher}" for publisher in publishers]
+    )
+    return [json.loads(snapshot) for snapshot in snapshots.values()]
+
+
+def _sum_dicts(dicts: List[Dict]) -> Dict:
+    summed: Dict = dict()
+    for values in dicts:
+        for key, value in values.items():
+            summed[key] = summed.get(key, 0) + value
+    return summed
+
+
+def _connection_samples(iri: str, metrics: List[Dict]) -> List[Sample]:
+    """
+    :param metrics: metrics of the same connection published by different processes (e.g. while rebalancing)
+    """
+    labels = {"connection": iri}
+    samples: List[Sample] = [
+        (
+            "sindit_ingestion_connection_active",
+            labels,
+            max(m["active"] for m in metrics),
+        ),
+        (
+            "sindit_ingestion_timeseries_inputs",
+            labels,
+            max(m["timeseries_inputs"] for m in metrics),
+        ),
+        (
+            "sindit_ingestion_messages_received_total",
+            labels,
+            sum(m["messages_received"] for m in metrics),
+        ),
+        (
+            "sindit_ingestion_readings_total",
+            labels,
+            sum(m["readings"] for m in metrics),
+        ),
+        (
+            "sindit_ingestion_timestamp_fallbacks_total",
+            labels,
+            sum(m["timestamp_fallbacks"] for m in metrics),
+        ),
+    ]
+    samples.extend(
+        histogram_samples(
+            "sindit_ingestion_handler_latency_seconds",
+            labels,
+            merge_histograms(m["handler_latency"] for m in metrics),
+        )
+    )
+    for result, count in _sum_dicts([m["compression"] for m in metrics]).items():
+        samples.append(
+            (
+                "sindit_ingestion_compression_readings_total",
+                {**labels, "result": result},
+                count,
+            )
+        )
+    return samples
+
+
+def _database_samples(iri: str, metrics: List[Dict]) -> List[Sample]:
+    """
+    :param metrics: metrics of the same database published by the different processes (each having own buffers)
+    """
+    labels = {"database": iri}
+    write = _sum_dicts([m["write"] for m in metrics])
+    samples: List[Sample] = [
+        ("sindit_timeseries_write_queue_depth", labels, write["queue_depth"]),
+        ("sindit_timeseries_write_queue_size", labels, write["queue_size"]),
+        ("sindit_timeseries_write_batches_total", labels, write["batches_written"]),
+        (
+            "sindit_timeseries_write_backpressure_events_total",
+            labels,
+            write["backpressure_events"],
+        ),
+    ]
+    for key, result in WRITE_READINGS_RESULTS.items():
+        if key in write:
+            samples.append(
+                (
+                    "sindit_timeseries_write_readings_total",
+                    {**labels, "result": result},
+                    write[key],
+                )
+            )
+    if "spool_readings" in write:
+        samples.append(
+            ("sindit_timeseries_spool_readings", labels, write["spool_readings"])
+        )
+        samples.append(
+            (
+                "sindit_timeseries_spool_disk_usage_bytes",
+                labels,
+                write["spool_disk_usage_bytes"],
+            )
+        )
+    rollups = _sum_dicts([m["rollups"] for m in metrics])
+    for key, name in [
+        ("aggregated", "sindit_timeseries_rollup_readings_total"),
+        ("late", "sindit_timeseries_rollup_readings_total"),
+        ("written", "sindit_timeseries_rollup_buckets_total"),
+        ("dropped", "sindit_timeseries_rollup_buckets_total"),
+    ]:
+        samples.append((name, {**labels, "result": key}, rollups[key]))
+    samples.extend(
+        histogram_samples(
+            "sindit_timeseries_write_batch_latency_seconds",
+            labels,
+            merge_histograms(m["write_latency"] for m in metrics),
+        )
+    )
+    return samples
+
+
+def get_metrics() -> str:
+    """
+    Aggregates the metrics of all ingestion processes
+    :return: metrics in the Prometheus text exposition format
+    """
+    snapshots = _get_metrics_snapshots()
+
+    connections: Dict[str, List[Dict]] = dict()
+    databases: Dict[str, List[Dict]] = dict()
+    for snapshot in snapshots:
+        for iri, metrics in snapshot["connections"].items():
+            connections.setdefault(iri, []).append(metrics)
+        for iri, metrics in snapshot["databases"].items():
+            databases.setdefault(iri, []).append(metrics)
+
+    samples: List[Sample] = [("sindit_ingestion_processes", {}, len(snapshots))]
+    for iri, metrics in connections.items():
+        samples.extend(_connection_samples(iri, metrics))
+    for iri, metrics in databases.items():
+        samples.extend(_database_samples(iri, metrics))
+
+    return render_prometheus(METRIC_TYPES, samples)
@@ -8,6 +8,9 @@ from backend.knowledge_graph.dao.RuntimeConnectionsDao import RuntimeConnections
 from backend.runtime_connections.RuntimeConnectionContainer import (
     RuntimeConnectionContainer,
 )
+from backend.runtime_connections.IngestionSupervisor import (
+    get_ingestion_shards_health,
+)
 from util.inter_process_cache import memcache
 
 BASE_NODE_DAO: BaseNodeDao = BaseNodeDao.instance()
@@ -34,6 +37,10 @@ def get_rt_active_connections_count():
     return int(memcache.get("active_runtime_connections_count"))
 
 
+def get_ingestion_shards():
+    return get_ingestion_shards_health()
+
+
 def get_status():
     """Combined status endpoint. Should be preferred to use less API calls.
 
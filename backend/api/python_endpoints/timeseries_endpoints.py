@@ -9,12 +9,19 @@ from backend.knowledge_graph.KnowledgeGraphPersistenceService import (
 )
 from backend.knowledge_graph.dao.DatabaseConnectionsDao import DatabaseConnectionsDao
 from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
+from backend.runtime_connections.LastValueCache import LastValueCache
 from backend.specialized_databases.DatabasePersistenceServiceContainer import (
     DatabasePersistenceServiceContainer,
 )
 from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
     TimeseriesPersistenceService,
 )
+from backend.specialized_databases.timeseries.TimeseriesRangeCache import (
+    TimeseriesRangeCache,
+)
+from backend.specialized_databases.timeseries.downsampling import (
+    DownsamplingMethods,
+)
 from backend.specialized_databases.timeseries.influx_db.InfluxDbPersistenceService import (
     InfluxDbPersistenceService,
 )
@@ -25,6 +32,8 @@ DB_CON_NODE_DAO: DatabaseConnectionsDao = DatabaseConnectionsDao.instance()
 
 TIMESERIES_NODES_DAO: TimeseriesNodesDao = TimeseriesNodesDao.instance()
 
+RANGE_CACHE: TimeseriesRangeCache = TimeseriesRangeCache.instance()
+
 
 def get_ts_details_flat(iri: str):
     """
@@ -40,12 +49,16 @@ def get_timeseries_current_range(
     iri: str,
     duration: float | None,
     aggregation_window_ms: int | None = None,
+    max_points: int | None = None,
+    downsampling: str = DownsamplingMethods.LTTB.value,
 ):
     """
     Queries the current measurements for the given duration up to the current time.
     :raises IdNotFoundException: If no data is available for that id at the current time
     :param id_uri:
     :param duration: timespan to query in seconds or None (forever)
+    :param max_points: if given, downsampled to at most that many points
+    :param downsampling: method used with max_points (see DownsamplingMethods)
     :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
     """
     return get_timeseries_range(
@@ -53,9 +66,42 @@ def get_timeseries_current_range(
         duration=duration,
         date_time=datetime.now(),
         aggregation_window_ms=aggregation_window_ms,
+        max_points=max_points,
+        downsampling=downsampling,
     )
 
 
+def get_timeseries_latest(iris: List[str]) -> Dict[str, Dict | None]:
+    """
+    Reads the last reading of each time-series from the inter-process cache (not from the database)
+    :param iris:
+    :return: iri -> {"time": iso-format, "value": value} or None, if no reading was received yet
+    """
+    return LastValueCache.instance().get_latest(iris)
+
+
+def get_timeseries_statistics(iris: List[str]) -> Dict[str, Dict | None]:
+    """
+    Running statistics (count, mean, variance, std, min, max, last reading time) of each time-series, maintained at
+    ingestion (does not scan the history)
+    :param iris:
+    :return: iri -> statistics or None, if not available (e.g. non-numeric time-series)
+    """
+    statistics = dict()
+    for iri in iris:
+        try:
+            ts_service = get_related_timeseries_database_service(iri)
+        except IdNotFoundException:
+            statistics[iri] = None
+            continue
+        if not isinstance(ts_service, TimeseriesPersistenceService):
+            statistics[iri] = None
+            continue
+        ts_statistics = ts_service.get_statistics(iri)
+        statistics[iri] = ts_statistics.to_dict() if ts_statistics is not None else None
+    return statistics
+
+
 def get_related_timeseries_database_service(iri: str) -> TimeseriesPersistenceService:
     try:
         # Get related timeseries-database service:
@@ -84,6 +130,8 @@ def get_timeseries_range(
     date_time: datetime | None,
     duration: float | None,
     aggregation_window_ms: int | None = None,
+    max_points: int | None = None,
+    downsampling: str = DownsamplingMethods.LTTB.value,
 ):
     """
     Queries the measurements for the given duration up to the given date and time.
@@ -91,6 +139,8 @@ def get_timeseries_range(
     :param id_uri:
     :param date_time: date and time to be observed in iso format or None (forever)
     :param duration: timespan to query in seconds or None (forever)
+    :param max_points: if given, downsampled to at most that many points (preserving peaks)
+    :param downsampling: method used with max_points (see DownsamplingMethods)
     :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
     """
 
@@ -100,19 +150,187 @@ def get_timeseries_range(
             get_related_timeseries_database_service(iri)
         )
 
-        # Read the actual measurements:
-        readings_df = ts_service.read_period_to_dataframe(
-            iri=iri,
+        begin_time = (
+            date_time - timedelta(seconds=duration) if duration is not None else None
+        )
+
+        # Read the actual measurements (historic parts from the cache):
+        if isinstance(max_points, int) and max_points > 0:
+            readings_df = RANGE_CACHE.read_downsampled(
+                ts_service=ts_service,
+                iri=iri,
+                begin_time=begin_time,
+                end_time=date_time,
+                max_points=max_points,
+                downsampling=downsampling,
+            )
+        else:
+            readings_df = RANGE_CACHE.read_period(
+                ts_service=ts_service,
+                iri=iri,
+                begin_time=begin_time,
+                end_time=date_time,
+                aggregation_window_ms=aggregation_window_ms,
+            )
+
+        return readings_df
+    except IdNotFoundException:
+        return pd.DataFrame(columns=["time", "value"])
+
+
+def get_timeseries_batch_range(
+    iris: List[str],
+    date_time: datetime | None,
+    duration: float | None,
+    aggregation_window_ms: int | None = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Queries the measurements of multiple time-series for the given duration up to the given date and time, with
+    one batch read per database (instead of one query per time-series)
+    :param iris:
+    :param date_time: date and time to be observed or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :param aggregation_window_ms: if given, only the first reading per window
+    :return: iri -> Pandas Dataframe featuring the columns "time" and "value" (empty, if not available)
+    """
+    if date_time is None:
+        date_time = datetime.now()
+
+    iris_per_service: Dict[TimeseriesPersistenceService, List[str]] = dict()
+    dataframes: Dict[str, pd.DataFrame] = dict()
+    for iri in iris:
+        try:
+            ts_service = get_related_timeseries_database_service(iri)
+        except IdNotFoundException:
+            ts_service = None
+        if isinstance(ts_service, TimeseriesPersistenceService):
+            iris_per_service.setdefault(ts_service, []).append(iri)
+        else:
+            dataframes[iri] = pd.DataFrame(columns=["time", "value"])
+
+    for ts_service, service_iris in iris_per_service.items():
+        service_dataframes = ts_service.read_many_periods_to_dataframes(
+            iris=service_iris,
             begin_time=date_time - timedelta(seconds=duration)
             if duration is not None
             else None,
             end_time=date_time,
             aggregation_window_ms=aggregation_window_ms,
         )
+        for iri in service_iris:
+            dataframes[iri] = (
+                service_dataframes[iri]
+                if service_dataframes is not None
+                else pd.DataFrame(columns=["time", "value"])
+            )
 
-        return readings_df
+    return dataframes
+
+
+def get_timeseries_batch_entries_count(
+    iris: List[str],
+    date_time: datetime | None,
+    duration: float | None,
+) -> Dict[str, int]:
+    """
+    Counts the entries of multiple time-series for the given duration up to the given date and time, with one
+    batch query per database (instead of one query per time-series)
+    :param iris:
+    :param date_time: date and time to be observed or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :return: iri -> Count of entries in that given range (0, if not available)
+    """
+    if date_time is None:
+        date_time = datetime.now()
+
+    iris_per_service: Dict[TimeseriesPersistenceService, List[str]] = dict()
+    counts: Dict[str, int] = dict()
+    for iri in iris:
+        try:
+            ts_service = get_related_timeseries_database_service(iri)
+        except IdNotFoundException:
+            ts_service = None
+        if isinstance(ts_service, TimeseriesPersistenceService):
+            iris_per_service.setdefault(ts_service, []).append(iri)
+        else:
+            counts[iri] = 0
+
+    for ts_service, service_iris in iris_per_service.items():
+        service_counts = ts_service.count_many_entries_for_period(
+            iris=service_iris,
+            begin_time=date_time - timedelta(seconds=duration)
+            if duration is not None
+            else None,
+            end_time=date_time,
+        )
+        for iri in service_iris:
+            counts[iri] = service_counts[iri] if service_counts is not None else 0
+
+    return counts
+
+
+def get_timeseries_adaptive_range(
+    iri: str,
+    date_time: datetime | None,
+    duration: float | None,
+    max_points: int,
+    downsampling: str = DownsamplingMethods.LTTB.value,
+) -> Dict | None:
+    """
+    Queries the measurements for the given duration up to the given date and time at a resolution decided by the
+    backend: all readings, if there are not more than max_points, otherwise downsampled to max_points.
+    Replaces counting the entries and querying the range in separate calls.
+    :param id_uri:
+    :param date_time: date and time to be observed or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :param max_points:
+    :param downsampling: method used, if there are more readings than max_points (see DownsamplingMethods)
+    :return: {"count": readings in the range, "aggregation": {"method", "max_points"} or None (all readings),
+    "data": Pandas Dataframe featuring the columns "time" and "value"}. None, if the database is not available
+    """
+    if date_time is None:
+        date_time = datetime.now()
+
+    try:
+        # Get related timeseries-database service:
+        ts_service: TimeseriesPersistenceService = (
+            get_related_timeseries_database_service(iri)
+        )
+        if not isinstance(ts_service, TimeseriesPersistenceService):
+            # No database connection
+            return {
+                "count": 0,
+                "aggregation": None,
+                "data": pd.DataFrame(columns=["time", "value"]),
+            }
+
+        result = RANGE_CACHE.read_adaptive(
+            ts_service=ts_service,
+            iri=iri,
+            begin_time=date_time - timedelta(seconds=duration)
+            if duration is not None
+            else None,
+            end_time=date_time,
+            max_points=max_points,
+            downsampling=downsampling,
+        )
+        if result is None:
+            return None
+        readings_df, count = result
+
+        return {
+            "count": count,
+            "aggregation": {"method": downsampling, "max_points": max_points}
+            if count > max_points
+            else None,
+            "data": readings_df,
+        }
     except IdNotFoundException:
-        return pd.DataFrame(columns=["time", "value"])
+        return {
+            "count": 0,
+            "aggregation": None,
+            "data": pd.DataFrame(columns=["time", "value"]),
+        }
 
 
 def get_timeseries_entries_count(
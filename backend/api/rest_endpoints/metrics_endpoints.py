@@ -0,0 +1,18 @@
+from fastapi.responses import PlainTextResponse
+
+from backend.api.api import app
+import backend.api.python_endpoints.metrics_endpoints as python_metrics_endpoints
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Ingestion metrics (messages, readings, handler latency, write buffer queue depth, dropped readings...),
+    aggregated across all ingestion processes.
+    :return: Prometheus text exposition format
+    """
+    return PlainTextResponse(
+        python_metrics_endpoints.get_metrics(), media_type=PROMETHEUS_CONTENT_TYPE
+    )
@@ -36,6 +36,16 @@ async def get_rt_active_connections_count():
     return python_status_endpoints.get_rt_active_connections_count()
 
 
+@app.get("/runtime_connections/ingestion_shards")
+async def get_ingestion_shards():
+    """Health of the ingestion shards (empty, if the ingestion is not sharded)
+
+    Returns:
+        _type_: json
+    """
+    return python_status_endpoints.get_ingestion_shards()
+
+
 @app.get("/status")
 async def get_status():
     """Combined status endpoint. Should be preferred to use less API calls.
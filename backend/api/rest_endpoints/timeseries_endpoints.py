@@ -1,42 +1,106 @@
+import json
 from datetime import datetime
+from typing import Dict, List
+
+from fastapi import Header, Query, Response
 
 from backend.api.api import app
 
 from backend.knowledge_graph.dao.DatabaseConnectionsDao import DatabaseConnectionsDao
 from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
+from backend.specialized_databases.timeseries.downsampling import (
+    DownsamplingMethods,
+)
 
 import backend.api.python_endpoints.timeseries_endpoints as python_timeseries_endpoints
+from util.timeseries_wire_format import (
+    AGGREGATION_MAX_POINTS_HEADER,
+    AGGREGATION_METHOD_HEADER,
+    COUNT_HEADER,
+    TIMESERIES_MEDIA_TYPE,
+    accepts_binary,
+    encode_dataframe,
+)
 
 
 DB_CON_NODE_DAO: DatabaseConnectionsDao = DatabaseConnectionsDao.instance()
 TIMESERIES_NODES_DAO: TimeseriesNodesDao = TimeseriesNodesDao.instance()
 
 
+def _binary_response(
+    df, accept: str | None, headers: Dict[str, str] | None = None
+) -> Response | None:
+    """
+    :return: the readings in the binary format, if accepted by the client and the values are numeric. None
+    otherwise (to be returned as JSON)
+    """
+    if df is None or not accepts_binary(accept):
+        return None
+    content = encode_dataframe(df)
+    if content is None:
+        return None
+    return Response(content=content, media_type=TIMESERIES_MEDIA_TYPE, headers=headers)
+
+
 @app.get("/timeseries/current_range")
 async def get_timeseries_current_range(
     iri: str,
     duration: float,
     aggregation_window_ms: int | None = None,
+    max_points: int | None = Query(default=None, gt=0),
+    downsampling: DownsamplingMethods = DownsamplingMethods.LTTB,
+    accept: str | None = Header(default=None),
 ):
     """
     Queries the current measurements for the given duration up to the current time.
     :raises IdNotFoundException: If no data is available for that id at the current time
     :param id_uri:
     :param duration: timespan to query in seconds
-    :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
+    :param max_points: if given, downsampled to at most that many points (preserving peaks)
+    :param downsampling: method used with max_points
+    :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value". Binary (see
+    util.timeseries_wire_format), if accepted by the client and the values are numeric
     """
     df = python_timeseries_endpoints.get_timeseries_current_range(
-        iri, duration, aggregation_window_ms
+        iri, duration, aggregation_window_ms, max_points, downsampling.value
     )
+    binary_response = _binary_response(df, accept)
+    if binary_response is not None:
+        return binary_response
     return df.to_json(date_format="iso")
 
 
+@app.get("/timeseries/latest")
+async def get_timeseries_latest(iris: List[str] = Query()):
+    """
+    Last readings of many time-series at once, taken from the cache filled by the runtime connections (does not
+    query the timeseries database).
+    :param iris: iris of the time-series (repeated query parameter)
+    :return: iri -> {"time": iso-format, "value": value} or None, if no reading was received yet
+    """
+    return python_timeseries_endpoints.get_timeseries_latest(iris)
+
+
+@app.get("/timeseries/statistics")
+async def get_timeseries_statistics(iris: List[str] = Query()):
+    """
+    Running statistics of many time-series at once, maintained at ingestion (does not scan the history).
+    :param iris: iris of the time-series (repeated query parameter)
+    :return: iri -> {"count", "mean", "variance", "std", "min", "max", "last_reading_time"} or None, if not
+    available (e.g. non-numeric time-series)
+    """
+    return python_timeseries_endpoints.get_timeseries_statistics(iris)
+
+
 @app.get("/timeseries/range")
 async def get_timeseries_range(
     iri: str,
     date_time_str: str | None,
     duration: float | None,
     aggregation_window_ms: int | None = None,
+    max_points: int | None = Query(default=None, gt=0),
+    downsampling: DownsamplingMethods = DownsamplingMethods.LTTB,
+    accept: str | None = Header(default=None),
 ):
     """
     Queries the measurements for the given duration up to the given date and time.
@@ -44,15 +108,95 @@ async def get_timeseries_range(
     :param id_uri:
     :param date_time: date and time to be observed in iso format or None (forever)
     :param duration: timespan to query in seconds or None (forever)
-    :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
+    :param max_points: if given, downsampled to at most that many points in one call (preserving peaks). Takes
+    precedence over aggregation_window_ms
+    :param downsampling: method used with max_points: LTTB (default) or MIN_MAX (min and max per bucket)
+    :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value". Binary (see
+    util.timeseries_wire_format), if accepted by the client and the values are numeric
     """
     date_time = datetime.fromisoformat(date_time_str)
     df = python_timeseries_endpoints.get_timeseries_range(
-        iri, date_time, duration, aggregation_window_ms
+        iri, date_time, duration, aggregation_window_ms, max_points, downsampling.value
     )
+    binary_response = _binary_response(df, accept)
+    if binary_response is not None:
+        return binary_response
     return df.to_json(date_format="iso")
 
 
+@app.get("/timeseries/batch_range")
+async def get_timeseries_batch_range(
+    date_time_str: str | None,
+    duration: float | None,
+    aggregation_window_ms: int | None = None,
+    iris: List[str] = Query(),
+):
+    """
+    Queries the measurements of many time-series at once for the given duration up to the given date and time
+    (one database query per database instead of one request per time-series).
+    :param date_time: date and time to be observed in iso format or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :param aggregation_window_ms: if given, only the first reading per window
+    :param iris: iris of the time-series (repeated query parameter)
+    :return: iri -> Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
+    """
+    date_time = (
+        datetime.fromisoformat(date_time_str) if date_time_str is not None else None
+    )
+    dataframes = python_timeseries_endpoints.get_timeseries_batch_range(
+        iris, date_time, duration, aggregation_window_ms
+    )
+    return {
+        iri: json.loads(df.to_json(date_format="iso"))
+        for iri, df in dataframes.items()
+    }
+
+
+@app.get("/timeseries/adaptive_range")
+async def get_timeseries_adaptive_range(
+    iri: str,
+    date_time_str: str | None,
+    duration: float | None,
+    max_points: int = Query(default=300, gt=0),
+    downsampling: DownsamplingMethods = DownsamplingMethods.LTTB,
+    accept: str | None = Header(default=None),
+):
+    """
+    Queries the measurements for the given duration up to the given date and time in one call, at a resolution
+    decided by the backend: all readings, if there are not more than max_points, otherwise downsampled.
+    :param id_uri:
+    :param date_time: date and time to be observed in iso format or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :param max_points: max. number of returned readings
+    :param downsampling: method used, if there are more readings than max_points
+    :return: {"count": readings in the range, "aggregation": {"method", "max_points"} or None (all readings),
+    "data": Pandas Dataframe serialized to JSON featuring the columns "time" and "value"}. None, if the database
+    is not available. If the binary format is accepted by the client and the values are numeric: the binary
+    readings, with the count and aggregation as headers
+    """
+    date_time = (
+        datetime.fromisoformat(date_time_str) if date_time_str is not None else None
+    )
+    result = python_timeseries_endpoints.get_timeseries_adaptive_range(
+        iri, date_time, duration, max_points, downsampling.value
+    )
+    if result is None:
+        return None
+
+    headers = {COUNT_HEADER: str(result["count"])}
+    if result["aggregation"] is not None:
+        headers[AGGREGATION_METHOD_HEADER] = result["aggregation"]["method"]
+        headers[AGGREGATION_MAX_POINTS_HEADER] = str(
+            result["aggregation"]["max_points"]
+        )
+    binary_response = _binary_response(result["data"], accept, headers)
+    if binary_response is not None:
+        return binary_response
+
+    result["data"] = json.loads(result["data"].to_json(date_format="iso"))
+    return result
+
+
 @app.get("/timeseries/entries_count")
 async def get_timeseries_entries_count(
     iri: str, date_time_str: str | None, duration: float | None
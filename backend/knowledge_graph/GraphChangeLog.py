@@ -0,0 +1,126 @@
+import uuid
+from enum import Enum
+from typing import List, Tuple
+
+from util.inter_process_cache import memcache
+from util.log import logger
+
+REVISION_KEY = "graph_change_log_revision"
+EPOCH_KEY = "graph_change_log_epoch"
+CHANGE_KEY_PREFIX = "graph_change_log_"
+
+# Time a change is kept in the log (in s). Consumers that fell behind further do a full refresh
+CHANGE_RETENTION = 24 * 60 * 60
+# Consumers additionally do a full refresh in that interval, picking up changes not recorded in the log (e.g. made
+# directly in neo4j) (in s)
+FULL_REFRESH_INTERVAL = 5 * 60
+
+
+class GraphChangeTypes(Enum):
+    # Annotation instance (or its matchers, scanned assets...) changed: iri of the instance
+    ANNOTATION_INSTANCE = "ANNOTATION_INSTANCE"
+    # Bulk changes (import, restore...): everything has to be reloaded
+    FULL = "FULL"
+
+
+# (epoch, revision) of the last change applied by a consumer
+GraphChangeCursor = Tuple[str | None, int]
+# (change type, iri)
+GraphChange = Tuple[GraphChangeTypes, str | None]
+
+INITIAL_CURSOR: GraphChangeCursor = (None, 0)
+
+
+class GraphChangeLog(object):
+    """
+    Inter-process log of changes of the knowledge graph, written by the DAO mutations.
+    Consisting of a revision counter and one entry per revision, so that consumers (e.g. the worker containers)
+    can cheaply poll for changes and only apply those, instead of reloading the whole graph.
+    Whenever the log can not tell what changed (entries expired, cache restarted, bulk changes), consumers are told to
+    do a full refresh.
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        GraphChangeLog.__instance = self
+
+    def _init_log(self):
+        # Only set, if not existing yet. The epoch changes when the cache was restarted and the counter is lost
+        memcache.add(EPOCH_KEY, uuid.uuid4().hex, noreply=False)
+        memcache.add(REVISION_KEY, "0", noreply=False)
+
+    def record_change(self, change_type: GraphChangeTypes, iri: str | None = None):
+        """
+        Appends a change to the log
+        :param change_type:
+        :param iri: iri of the changed node (if not a full change)
+        :return:
+        """
+        # pylint: disable=W0703
+        try:
+            revision = memcache.incr(REVISION_KEY, 1)
+            if revision is None:
+                self._init_log()
+                revision = memcache.incr(REVISION_KEY, 1)
+
+            memcache.set(
+                CHANGE_KEY_PREFIX + str(revision),
+                f"{change_type.value}|{iri if iri is not None else ''}",
+                expire=CHANGE_RETENTION,
+            )
+        except Exception as exc:
+            # Consumers fall back to a full refresh, as the revision is missing
+            logger.info(f"Could not record graph change: {exc}")
+
+    def get_changes_since(
+        self, cursor: GraphChangeCursor
+    ) -> Tuple[GraphChangeCursor, List[GraphChange] | None]:
+        """
+        :param cursor: cursor returned by the previous call (or INITIAL_CURSOR)
+        :return: the new cursor and the changes since the given one. None if a full refresh is required instead
+        """
+        state = memcache.get_many([EPOCH_KEY, REVISION_KEY])
+        if len(state) < 2:
+            self._init_log()
+            state = memcache.get_many([EPOCH_KEY, REVISION_KEY])
+        epoch = state.get(EPOCH_KEY)
+        revision = int(state.get(REVISION_KEY, 0))
+        epoch = epoch.decode() if epoch is not None else None
+        new_cursor = (epoch, revision)
+
+        last_epoch, last_revision = cursor
+        if last_epoch is None or last_epoch != epoch or last_revision > revision:
+            return new_cursor, None
+
+        if last_revision == revision:
+            return new_cursor, []
+
+        change_keys = [
+            CHANGE_KEY_PREFIX + str(rev)
+            for rev in range(last_revision + 1, revision + 1)
+        ]
+        entries = memcache.get_many(change_keys)
+
+        changes: List[GraphChange] = []
+        for key in change_keys:
+            entry = entries.get(key)
+            if entry is None:
+                # Expired, evicted or not written yet
+                return new_cursor, None
+            change_type, iri = entry.decode().split("|", 1)
+            change_type = GraphChangeTypes(change_type)
+            if change_type == GraphChangeTypes.FULL:
+                return new_cursor, None
+            changes.append((change_type, iri if iri != "" else None))
+
+        return new_cursor, changes
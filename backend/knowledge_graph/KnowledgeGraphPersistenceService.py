@@ -15,6 +15,10 @@ import py2neo.ogm as ogm
 from py2neo.errors import ConnectionBroken
 from neo4j import GraphDatabase
 from neo4j_backup import Extractor, Importer
+from backend.knowledge_graph.GraphChangeLog import GraphChangeLog, GraphChangeTypes
+from backend.specialized_databases.timeseries.range_cache_invalidation import (
+    invalidate_cached_ranges,
+)
 from util.log import logger
 
 
@@ -203,4 +207,8 @@ class KnowledgeGraphPersistenceService(object):
         )
         importer.import_data()
 
+        GraphChangeLog.instance().record_change(change_type=GraphChangeTypes.FULL)
+        # Time-series might be assigned to other databases now
+        invalidate_cached_ranges(reason="knowledge graph restored")
+
         logger.info("Finished restoring neo4j.")
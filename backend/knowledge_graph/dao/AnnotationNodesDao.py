@@ -20,6 +20,7 @@ from graph_domain.expert_annotations.AnnotationTimeseriesMatcherNode import (
     AnnotationTimeseriesMatcherNodeFlat,
 )
 
+from backend.knowledge_graph.GraphChangeLog import GraphChangeLog, GraphChangeTypes
 from backend.knowledge_graph.KnowledgeGraphPersistenceService import (
     KnowledgeGraphPersistenceService,
 )
@@ -65,6 +66,22 @@ class AnnotationNodesDao(object):
         self.ps: KnowledgeGraphPersistenceService = (
             KnowledgeGraphPersistenceService.instance()
         )
+        self.change_log: GraphChangeLog = GraphChangeLog.instance()
+
+    def _record_instance_change(self, instance_iri: str):
+        """Notifies the annotation detectors, that the instance has to be re-evaluated"""
+        self.change_log.record_change(
+            change_type=GraphChangeTypes.ANNOTATION_INSTANCE, iri=instance_iri
+        )
+
+    def _record_matcher_change(self, matcher_iri: str):
+        instance = self.get_matcher_annotation_instance(matcher_iri)
+        if instance is not None:
+            self._record_instance_change(instance.iri)
+
+    def _record_definition_change(self, definition_iri: str):
+        for instance in self.get_instances_of_annotation_definition(definition_iri):
+            self._record_instance_change(instance.iri)
 
     def create_annotation_definition(
         self,
@@ -112,6 +129,7 @@ class AnnotationNodesDao(object):
             activate_occurance_scan=activate_occurance_scan,
         )
         self.ps.graph_push(instance)
+        self._record_instance_change(iri)
 
         return iri
 
@@ -122,12 +140,14 @@ class AnnotationNodesDao(object):
         node: Node = matcher.match(iri=instance_iri).first()
         node.update(activate_occurance_scan=active)
         self.ps.graph_push(node)
+        self._record_instance_change(instance_iri)
 
     def change_matcher_precision(self, matcher_iri: str, precision: float):
         matcher = NodeMatcher(self.ps.graph)
         node: Node = matcher.match(iri=matcher_iri).first()
         node.update(detection_precision=precision)
         self.ps.graph_push(node)
+        self._record_matcher_change(matcher_iri)
 
     def create_annotation_detection(
         self,
@@ -181,6 +201,7 @@ class AnnotationNodesDao(object):
             .first(),
         )
         self.ps.graph_create(relationship)
+        self._record_instance_change(instance_iri)
 
     def create_annotation_instance_asset_relationship(
         self, instance_iri: str, asset_iri: str
@@ -211,6 +232,7 @@ class AnnotationNodesDao(object):
             .first(),
         )
         self.ps.graph_create(relationship)
+        self._record_definition_change(definition_iri)
 
     def create_annotation_ts_matcher_instance_relationship(
         self, ts_matcher_iri: str, instance_iri: str
@@ -226,6 +248,7 @@ class AnnotationNodesDao(object):
             .first(),
         )
         self.ps.graph_create(relationship)
+        self._record_instance_change(instance_iri)
 
     def create_annotation_detection_timeseries_relationship(
         self, detection_iri: str, timeseries_iri: str
@@ -324,6 +347,7 @@ class AnnotationNodesDao(object):
                 .first(),
             )
         self.ps.graph_create(match_relationship)
+        self._record_matcher_change(ts_matcher_iri)
 
     @validate_result_nodes
     def get_instances_of_annotation_definition(
@@ -382,21 +406,27 @@ class AnnotationNodesDao(object):
         Args:
             definition_iri (_type_): _description_
         """
+        self._record_definition_change(definition_iri)
         self.ps.graph_run(
             f"MATCH (n:{NodeTypes.ANNOTATION_DEFINITION.value}) WHERE n.iri = '{definition_iri}' DETACH DELETE n"
         )
 
     def delete_annotation_ts_matcher(self, ts_matcher_iri):
         """Deletes a time-series matcher and the attached relationships."""
+        # Before deleting, as the instance can not be determined afterwards
+        instance = self.get_matcher_annotation_instance(ts_matcher_iri)
         self.ps.graph_run(
             f"MATCH (n:{NodeTypes.ANNOTATION_TS_MATCHER.value}) WHERE n.iri = '{ts_matcher_iri}' DETACH DELETE n"
         )
+        if instance is not None:
+            self._record_instance_change(instance.iri)
 
     def delete_annotation_instance(self, instance_iri):
         """Deletes a annotation instance and the attached relationships."""
         self.ps.graph_run(
             f"MATCH (n:{NodeTypes.ANNOTATION_INSTANCE.value}) WHERE n.iri = '{instance_iri}' DETACH DELETE n"
         )
+        self._record_instance_change(instance_iri)
 
     def delete_annotation_detection(self, detection_iri):
         """Deletes a detection and the attached relationships."""
@@ -512,6 +542,16 @@ class AnnotationNodesDao(object):
 
         return len(self.get_annotation_instance_for_definition(definition_iri))
 
+    @validate_result_nodes
+    def get_annotation_instance_flat(
+        self, instance_iri: str
+    ) -> AnnotationInstanceNodeFlat | None:
+        matches = self.ps.repo_match(
+            model=AnnotationInstanceNodeFlat, primary_value=instance_iri
+        )
+
+        return matches.first()
+
     @validate_result_nodes
     def get_annotation_instances(self, only_active_scanned_instances: bool = False):
         matches = self.ps.repo_match(model=AnnotationInstanceNodeFlat)
@@ -0,0 +1,35 @@
+from typing import Dict
+
+from util.metrics import Histogram
+
+
+class ConnectionMetrics:
+    """
+    Hot-path counters of one runtime connection, updated by the connection and its timeseries inputs.
+    Plain attributes without locks: all updates of one connection happen in the shared event loop thread
+    """
+
+    __slots__ = [
+        "messages_received",
+        "readings",
+        "timestamp_fallbacks",
+        "handler_latency",
+    ]
+
+    def __init__(self) -> None:
+        # Messages / notifications / read results received from the source
+        self.messages_received = 0
+        # Readings handled by the inputs (one message might contain readings for several inputs)
+        self.readings = 0
+        # Readings without valid timestamp, for which the receive time was used
+        self.timestamp_fallbacks = 0
+        # Time for converting a reading and calling all handlers of the input (in s)
+        self.handler_latency = Histogram()
+
+    def to_dict(self) -> Dict:
+        return {
+            "messages_received": self.messages_received,
+            "readings": self.readings,
+            "timestamp_fallbacks": self.timestamp_fallbacks,
+            "handler_latency": self.handler_latency.to_dict(),
+        }
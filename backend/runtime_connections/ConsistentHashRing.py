@@ -0,0 +1,45 @@
+import bisect
+import hashlib
+from typing import Generic, Iterable, List, Tuple, TypeVar
+
+# Points per member on the ring. More points: more even distribution of the keys
+VIRTUAL_NODES_PER_MEMBER = 64
+
+T = TypeVar("T")
+
+
+def _hash(key: str) -> int:
+    # Stable across processes (unlike the built-in hash, which is salted per process)
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing(Generic[T]):
+    """
+    Maps keys (e.g. connection IRIs) to members (e.g. ingestion shards) via consistent hashing:
+    when a member is added or removed, only the keys of that member move, all other keys stay where they are.
+    Immutable: a new ring is built when the members change.
+    """
+
+    def __init__(
+        self,
+        members: Iterable[T],
+        virtual_nodes: int = VIRTUAL_NODES_PER_MEMBER,
+    ):
+        self.members: List[T] = sorted(set(members))
+        points: List[Tuple[int, T]] = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(virtual_nodes)
+        )
+        self._hashes = [point_hash for point_hash, _ in points]
+        self._points_members = [member for _, member in points]
+
+    def get_member(self, key: str) -> T | None:
+        """
+        :param key:
+        :return: the member responsible for the key. None, if the ring is empty
+        """
+        if len(self._hashes) == 0:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._points_members[index]
@@ -0,0 +1,225 @@
+import json
+import multiprocessing
+import os
+import time
+from multiprocessing.process import BaseProcess
+from threading import Thread
+from typing import Dict, List
+
+from backend.runtime_connections.RuntimeConnectionContainer import (
+    RuntimeConnectionContainer,
+)
+from backend.specialized_databases.timeseries.TimeseriesWriteSpool import (
+    set_spool_owner,
+)
+from util.inter_process_cache import memcache
+from util.log import logger
+
+# Number of shards (int). Refreshed by the supervisor, so that it expires when not sharded anymore
+SHARD_COUNT_KEY = "ingestion_shard_count"
+# Ids of the shards currently taking part in the ingestion (json list)
+SHARD_MEMBERS_KEY = "ingestion_shard_members"
+# Health report of one shard (json dict), suffixed by the shard id
+SHARD_HEALTH_KEY_PREFIX = "ingestion_shard_health_"
+ACTIVE_CONNECTIONS_COUNT_KEY = "active_runtime_connections_count"
+
+SHARD_REFRESH_INTERVAL = 5  # interval of the shards polling for graph and membership changes (in s)
+SUPERVISOR_MONITOR_INTERVAL = 5  # interval of the supervisor checking the shards (in s)
+# Shards not reporting for that long are considered hung: removed from the ring and restarted (in s)
+SHARD_HEARTBEAT_TIMEOUT = 30
+SHARD_HEALTH_EXPIRE = 5 * SHARD_HEARTBEAT_TIMEOUT  # (in s)
+
+
+def _get_shard_members() -> List[int] | None:
+    members = memcache.get(SHARD_MEMBERS_KEY)
+    return json.loads(members) if members is not None else None
+
+
+def _get_shard_health(shard_id: int) -> Dict | None:
+    health = memcache.get(f"{SHARD_HEALTH_KEY_PREFIX}{shard_id}")
+    return json.loads(health) if health is not None else None
+
+
+def _report_shard_health(shard_id: int):
+    container: RuntimeConnectionContainer = RuntimeConnectionContainer.instance()
+    health = {
+        "shard_id": shard_id,
+        "pid": os.getpid(),
+        "heartbeat": time.time(),
+        "connections": len(container.connections),
+        "active_connections": container.get_active_connections_count(),
+        "timeseries_inputs": len(container.get_all_inputs()),
+        "readings": container.get_compression_statistics(),
+    }
+    memcache.set(
+        f"{SHARD_HEALTH_KEY_PREFIX}{shard_id}",
+        json.dumps(health),
+        expire=SHARD_HEALTH_EXPIRE,
+    )
+    container.publish_metrics(get_shard_metrics_publisher(shard_id))
+
+
+def get_shard_metrics_publisher(shard_id: int) -> str:
+    return f"shard_{shard_id}"
+
+
+def run_ingestion_shard(shard_id: int):
+    """
+    Entry point of one ingestion process: runs the runtime connections (and their persistence handlers) mapped to
+    the shard, follows graph and membership changes and reports its health
+    :param shard_id:
+    :return:
+    """
+    logger.info(f"Starting ingestion shard {shard_id} (pid {os.getpid()})...")
+    # Every shard spools to its own directory. A restarted shard replays the readings of its predecessor
+    set_spool_owner(get_shard_metrics_publisher(shard_id))
+    container: RuntimeConnectionContainer = RuntimeConnectionContainer.instance()
+    # Not assigned anything, until the supervisor added the shard to the members
+    shard_members: List[int] = []
+
+    while True:
+        # pylint: disable=W0703
+        try:
+            members = _get_shard_members()
+            if members is not None:
+                shard_members = members
+            container.assign_shard(shard_id, shard_members)
+            container.apply_graph_changes()
+            _report_shard_health(shard_id)
+        except Exception as exc:
+            logger.info(f"Ingestion shard {shard_id} failed: {exc}. Retrying...")
+
+        time.sleep(SHARD_REFRESH_INTERVAL)
+
+
+class IngestionSupervisor:
+    """
+    Runs the timeseries ingestion (runtime connections and persistence) in dedicated processes instead of the API
+    workers, so that it scales across cores independently of the REST workers.
+    Runtime connections are partitioned across the shards by consistent hashing on their iri.
+    The supervisor maintains the active shards (members of the hash ring): shards that died or stopped reporting are
+    removed (their connections move to the other shards) and restarted. They rejoin, when reporting again.
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        IngestionSupervisor.__instance = self
+
+        # Spawned instead of forked, as the parent already runs threads and holds connections
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, BaseProcess] = {}
+        self._members: List[int] = []
+        self._shard_count = 0
+        self._monitor_thread = None
+
+    def start(self, shard_count: int):
+        logger.info(f"Starting {shard_count} ingestion shards...")
+        self._shard_count = shard_count
+        self._set_members([])
+        for shard_id in range(shard_count):
+            self._start_shard(shard_id)
+
+        self._monitor_thread = Thread(target=self._monitor_loop, daemon=True)
+        self._monitor_thread.start()
+
+    def _start_shard(self, shard_id: int):
+        process = self._context.Process(
+            target=run_ingestion_shard,
+            args=(shard_id,),
+            name=f"ingestion_shard_{shard_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[shard_id] = process
+
+    def _set_members(self, members: List[int]):
+        self._members = sorted(members)
+        memcache.set(
+            SHARD_MEMBERS_KEY, json.dumps(self._members), expire=SHARD_HEALTH_EXPIRE
+        )
+        memcache.set(SHARD_COUNT_KEY, self._shard_count, expire=SHARD_HEALTH_EXPIRE)
+
+    def _is_reporting(self, shard_id: int) -> bool:
+        health = _get_shard_health(shard_id)
+        return (
+            health is not None
+            and health["pid"] == self._processes[shard_id].pid
+            and time.time() - health["heartbeat"] < SHARD_HEARTBEAT_TIMEOUT
+        )
+
+    def _monitor_loop(self):
+        while True:
+            time.sleep(SUPERVISOR_MONITOR_INTERVAL)
+
+            # pylint: disable=W0703
+            try:
+                self._check_shards()
+            except Exception as exc:
+                logger.info(f"Checking the ingestion shards failed: {exc}")
+
+    def _check_shards(self):
+        members = []
+        for shard_id, process in list(self._processes.items()):
+            if not process.is_alive():
+                logger.info(
+                    f"Ingestion shard {shard_id} died (exit code {process.exitcode}). Restarting..."
+                )
+                self._start_shard(shard_id)
+            elif self._is_reporting(shard_id):
+                members.append(shard_id)
+            elif shard_id in self._members:
+                # Stopped reporting, while being responsible for connections
+                logger.info(f"Ingestion shard {shard_id} hung. Restarting...")
+                process.kill()
+                process.join()
+                self._start_shard(shard_id)
+
+        if members != self._members:
+            logger.info(f"Rebalancing ingestion: active shards {members}")
+        # Always written, so that it is restored after the cache was restarted
+        self._set_members(members)
+
+        memcache.set(
+            ACTIVE_CONNECTIONS_COUNT_KEY,
+            sum(
+                health["active_connections"]
+                for health in get_ingestion_shards_health()
+                if health["healthy"]
+            ),
+        )
+
+
+def get_ingestion_shards_health() -> List[Dict]:
+    """
+    Can be called from every process (e.g. the API workers)
+    :return: latest health report of each shard, with the info, whether it is an active member of the ring
+    """
+    shard_count = memcache.get(SHARD_COUNT_KEY)
+    if shard_count is None:
+        # Ingestion not sharded
+        return []
+    members = _get_shard_members() or []
+
+    shards_health = []
+    for shard_id in range(int(shard_count)):
+        health = _get_shard_health(shard_id)
+        if health is None:
+            health = {"shard_id": shard_id}
+        health["member"] = shard_id in members
+        health["healthy"] = (
+            health["member"]
+            and "heartbeat" in health
+            and time.time() - health["heartbeat"] < SHARD_HEARTBEAT_TIMEOUT
+        )
+        shards_health.append(health)
+    return shards_health
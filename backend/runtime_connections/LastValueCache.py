@@ -0,0 +1,117 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import Dict, List, Tuple
+
+from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+from util.inter_process_cache import memcache
+from util.log import logger
+
+HANDLER_ID = "last_value_cache"
+KEY_PREFIX = "last_value_"
+FLUSH_INTERVAL = 0.5  # interval for publishing the collected last values (in s)
+# Values of inputs that stopped delivering are removed after that time (in s)
+LAST_VALUE_EXPIRE = 24 * 60 * 60
+
+
+def _get_key(iri: str) -> str:
+    # Memcache keys are limited to 250 characters without whitespace, IRIs are not
+    return KEY_PREFIX + hashlib.md5(iri.encode("utf-8")).hexdigest()
+
+
+class LastValueCache:
+    """
+    Publishes the last reading of every timeseries input to the inter-process cache, so that all processes (e.g. the
+    API workers) can read current values without querying the timeseries database.
+    Readings are collected in memory (only the newest one per input) and published in one batch per flush interval.
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        LastValueCache.__instance = self
+
+        # iri -> (reading time, value) not yet published
+        self._pending: Dict[str, Tuple[datetime, float | int | bool | str]] = dict()
+        self._lock = Lock()
+        self._flush_thread = None
+        # Readings, that could not be published (e.g. values not serializable as json)
+        self.skipped_count = 0
+
+    def register_input(self, ts_input: TimeseriesInput):
+        """
+        Publishes the readings of the input from now on. Starts publishing, if not yet running
+        :param ts_input:
+        :return:
+        """
+        ts_input.register_handler(handler_method=self.put, handler_id=HANDLER_ID)
+
+        if self._flush_thread is None:
+            self._flush_thread = Thread(target=self._flush_loop, daemon=True)
+            self._flush_thread.start()
+
+    def put(self, iri: str, value, reading_time: datetime | None):
+        if reading_time is None:
+            # Database time for the persisted reading: the receive time is closest
+            reading_time = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending[iri] = reading_time, value
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+
+            # pylint: disable=W0703
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.info(f"Publishing the last values failed: {exc}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, dict()
+        if len(pending) == 0:
+            return
+
+        # Serialized one by one, so that one invalid reading does not prevent publishing the others
+        entries: Dict[str, str] = dict()
+        for iri, (reading_time, value) in pending.items():
+            try:
+                entries[_get_key(iri)] = json.dumps(
+                    {"time": reading_time.isoformat(), "value": value}
+                )
+            except (TypeError, ValueError, AttributeError) as exc:
+                if self.skipped_count == 0:
+                    logger.info(
+                        f"Last value of {iri} could not be published: {exc}. "
+                        f"Skipping such readings from now on."
+                    )
+                self.skipped_count += 1
+
+        if len(entries) > 0:
+            memcache.set_many(entries, expire=LAST_VALUE_EXPIRE)
+
+    def get_latest(self, iris: List[str]) -> Dict[str, Dict | None]:
+        """
+        Can be called from every process
+        :param iris: iris of the timeseries inputs
+        :return: iri -> {"time": iso-format, "value": value} (None, if no reading is available)
+        """
+        entries = memcache.get_many([_get_key(iri) for iri in iris])
+
+        latest: Dict[str, Dict | None] = {}
+        for iri in iris:
+            entry = entries.get(_get_key(iri))
+            latest[iri] = json.loads(entry) if entry is not None else None
+        return latest
@@ -5,6 +5,7 @@ from backend.exceptions.EnvironmentalVariableNotFoundError import (
 )
 
 from graph_domain.main_digital_twin.RuntimeConnectionNode import RuntimeConnectionNode
+from backend.runtime_connections.ConnectionMetrics import ConnectionMetrics
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
 from util.environment_and_configuration import (
     get_environment_variable,
@@ -27,12 +28,24 @@ class RuntimeConnection(abc.ABC):
         port_environment_variable,
         user_environment_variable,
         key_environment_variable,
+        sampling_interval_ms=None,
+        timestamp_format=None,
+        wildcard_min_siblings=None,
+        only_changes=None,
     ) -> None:
         super().__init__()
 
         self.active = False
 
         self.iri = iri
+        # Default sampling interval for polling-based connections (None: connection specific default)
+        self.sampling_interval_ms = sampling_interval_ms
+        # Format of the timestamps in messages for message-based connections (None: connection specific default)
+        self.timestamp_format = timestamp_format
+        # Min. number of sibling topics subscribed by a wildcard for message-based connections (None: never)
+        self.wildcard_min_siblings = wildcard_min_siblings
+        # Whether only changed values are reported for polling-based connections (None: connection specific default)
+        self.only_changes = only_changes
         try:
             self.host = get_environment_variable(
                 key=host_environment_variable, optional=False
@@ -61,6 +74,8 @@ class RuntimeConnection(abc.ABC):
             raise exc
 
         self.timeseries_inputs: Dict[str, TimeseriesInput] = dict()
+        # Shared with the inputs of the connection
+        self.metrics = ConnectionMetrics()
 
     @classmethod
     def from_runtime_connection_node(cls, node: RuntimeConnectionNode):
@@ -71,6 +86,10 @@ class RuntimeConnection(abc.ABC):
                 port_environment_variable=node.port_environment_variable,
                 user_environment_variable=node.user_environment_variable,
                 key_environment_variable=node.key_environment_variable,
+                sampling_interval_ms=node.sampling_interval_ms,
+                timestamp_format=node.timestamp_format,
+                wildcard_min_siblings=node.wildcard_min_siblings,
+                only_changes=node.only_changes,
             )
         except EnvironmentalVariableNotFoundError as exc:
             raise exc
@@ -1,6 +1,14 @@
+import json
+import os
 from threading import Thread
 import time
 from typing import Dict, List
+from backend.knowledge_graph.GraphChangeLog import (
+    FULL_REFRESH_INTERVAL,
+    INITIAL_CURSOR,
+    GraphChangeCursor,
+    GraphChangeLog,
+)
 from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
 from graph_domain.main_digital_twin.RuntimeConnectionNode import (
     RuntimeConnectionNode,
@@ -9,8 +17,11 @@ from graph_domain.main_digital_twin.RuntimeConnectionNode import (
 from util.inter_process_cache import memcache
 from graph_domain.main_digital_twin.TimeseriesNode import (
     TimeseriesNodeDeep,
+    TimeseriesValueTypes,
 )
 from backend.runtime_connections.RuntimeConnection import RuntimeConnection
+from backend.runtime_connections.ConsistentHashRing import ConsistentHashRing
+from backend.runtime_connections.LastValueCache import LastValueCache
 from backend.exceptions.EnvironmentalVariableNotFoundError import (
     EnvironmentalVariableNotFoundError,
 )
@@ -26,6 +37,9 @@ from backend.runtime_connections.opcua.OpcuaTimeseriesInput import OpcuaTimeseri
 from backend.specialized_databases.DatabasePersistenceServiceContainer import (
     DatabasePersistenceServiceContainer,
 )
+from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
+    TimeseriesPersistenceService,
+)
 from backend.specialized_databases.timeseries.influx_db.InfluxDbPersistenceService import (
     InfluxDbPersistenceService,
 )
@@ -42,6 +56,21 @@ RT_INPUT_MAPPING = {
     RuntimeConnectionTypes.OPC_UA.value: OpcuaTimeseriesInput,
 }
 
+# Value types for which rollups (pre-aggregated min / max / mean...) and running statistics are maintained
+NUMERIC_VALUE_TYPES = [
+    TimeseriesValueTypes.DECIMAL.value,
+    TimeseriesValueTypes.INT.value,
+]
+
+# Ingestion metrics snapshot of one process (json), suffixed by the publisher (see publish_metrics)
+METRICS_KEY_PREFIX = "ingestion_metrics_"
+# Publisher name of the process running all connections (not sharded)
+MAIN_METRICS_PUBLISHER = "main"
+# Snapshots of processes that stopped publishing are removed after that time (in s)
+METRICS_EXPIRE = 60
+# Interval of checking the inputs for readings held back by the compression, that are due to be stored (in s)
+IDLE_READINGS_FLUSH_INTERVAL = 5
+
 
 class RuntimeConnectionContainer:
     """
@@ -63,23 +92,94 @@ class RuntimeConnectionContainer:
         RuntimeConnectionContainer.__instance = self
 
         self.connections: Dict[str, RuntimeConnection] = {}
+        # Registry of all inputs of all connections: input-iri -> input / owning connection
+        self._ts_inputs: Dict[str, TimeseriesInput] = {}
+        self._ts_input_connections: Dict[str, RuntimeConnection] = {}
         self._active_connections_status_thread = None
+        self._idle_readings_flush_thread = None
+        self._graph_change_cursor: GraphChangeCursor = INITIAL_CURSOR
+        self._last_full_refresh = 0.0
+        # Sharded ingestion: id of the shard run by this process and the ring of all active shards.
+        # None: all connections are handled by this process
+        self._shard_id: int | None = None
+        self._shard_ring: ConsistentHashRing[int] | None = None
 
     def start_active_connections_status_thread(self):
         self._active_connections_status_thread = Thread(
-            target=self._active_connections_write_to_cache_loop
+            target=self._active_connections_write_to_cache_loop, daemon=True
         )
         self._active_connections_status_thread.start()
 
+    def assign_shard(self, shard_id: int, shard_members: List[int]):
+        """
+        Restricts this container to the connections mapped to the shard by consistent hashing on the connection iri.
+        Rebalances (refreshing all inputs and connections), if the active shards changed: only the connections of
+        added or removed shards move.
+        :param shard_id: shard run by this process
+        :param shard_members: ids of all active shards
+        :return:
+        """
+        if (
+            self._shard_id == shard_id
+            and self._shard_ring is not None
+            and self._shard_ring.members == sorted(set(shard_members))
+        ):
+            return
+
+        self._shard_id = shard_id
+        self._shard_ring = ConsistentHashRing(shard_members)
+        logger.info(
+            f"Ingestion shard {shard_id}: active shards changed to {self._shard_ring.members}. Rebalancing..."
+        )
+        # Covers the graph changes since the last poll as well
+        cursor, _ = GraphChangeLog.instance().get_changes_since(
+            self._graph_change_cursor
+        )
+        self.refresh_connection_inputs_and_handlers()
+        self._graph_change_cursor = cursor
+
+    def is_assigned(self, connection_iri: str) -> bool:
+        """
+        :param connection_iri:
+        :return: whether the runtime connection is handled by this process
+        """
+        return (
+            self._shard_ring is None
+            or self._shard_ring.get_member(connection_iri) == self._shard_id
+        )
+
+    def apply_graph_changes(self):
+        """Polls the graph change log and only refreshes the inputs and connections, if required.
+        Timeseries inputs and runtime connections are only changed by bulk changes (imports, restores...), which
+        require a full refresh. Refreshes fully every FULL_REFRESH_INTERVAL as well, for changes not in the log."""
+        cursor, changes = GraphChangeLog.instance().get_changes_since(
+            self._graph_change_cursor
+        )
+        if (
+            changes is None
+            or time.monotonic() - self._last_full_refresh >= FULL_REFRESH_INTERVAL
+        ):
+            logger.info("Refreshing all time-series inputs and runtime connections...")
+            self.refresh_connection_inputs_and_handlers()
+
+        # Only after successfully applying, so that the changes are retried otherwise
+        self._graph_change_cursor = cursor
+
     def refresh_connection_inputs_and_handlers(self):
         """Refreshes the inputs and handlers, creating new ones if available in the graph, or deleting old ones.
 
         Args:
             timeseries_nodes_deep (List[TimeseriesNodeDeep]): _description_
         """
+        self._last_full_refresh = time.monotonic()
 
         timeseries_nodes_dao: TimeseriesNodesDao = TimeseriesNodesDao.instance()
-        updated_ts_nodes_deep = timeseries_nodes_dao.get_all_timeseries_nodes_deep()
+        # Only the connections of this shard (all, if not sharded)
+        updated_ts_nodes_deep = [
+            ts_node
+            for ts_node in timeseries_nodes_dao.get_all_timeseries_nodes_deep()
+            if self.is_assigned(ts_node.runtime_connection.iri)
+        ]
 
         #
         # Check if ts inputs or connections have been removed:
@@ -99,33 +199,22 @@ class RuntimeConnectionContainer:
         for con in removed_connections:
             # Whole connection was removed!
             # Unregister all inputs and the connection
-            con.disconnect()
-            self.connections.pop(con.iri)
+            self.remove_runtime_connection(con.iri)
             del con
 
-        removed_inputs = []
-        for con in self.connections.values():
-            removed_inputs.extend(
-                [
-                    (ts_input, con)
-                    for ts_input in con.timeseries_inputs.values()
-                    if ts_input.iri not in updated_ts_input_iri_list
-                ]
-            )
-
-        ts_input: TimeseriesInput
-        con: RuntimeConnection
-        for (ts_input, con) in removed_inputs:
-            con.remove_ts_input(ts_input.iri)
+        removed_input_iris = [
+            iri
+            for iri in self._ts_inputs.keys()
+            if iri not in updated_ts_input_iri_list
+        ]
+        for iri in removed_input_iris:
+            self.remove_ts_input(iri)
 
         #
         # Initialize new ts inputs and connections
         #
-        old_ts_connection_iris = [con.iri for con in self.connections.values()]
-        old_ts_input_iris = set()
-        for con in self.connections.values():
-            for ts in con.timeseries_inputs.values():
-                old_ts_input_iris.add(ts.iri)
+        old_ts_connection_iris = set(self.connections.keys())
+        old_ts_input_iris = set(self._ts_inputs.keys())
 
         # Prepare nodes to avoid redundand connections:
         # Get current connection nodes
@@ -174,14 +263,32 @@ class RuntimeConnectionContainer:
                 )
             )
 
+            # Buffered variant, so that the connections are not blocked by the database
+            # Compressed: only the readings passing the deadband / swinging door filters of the input are stored
             ts_input.register_handler(
-                handler_method=ts_service.write_measurement, handler_id=ts_service.iri
+                handler_method=ts_service.write_measurement_buffered,
+                handler_id=ts_service.iri,
+                compressed=True,
             )
+            # Rollups and statistics cover all received readings (not only stored ones)
+            if ts_input.value_type in NUMERIC_VALUE_TYPES:
+                ts_input.register_handler(
+                    handler_method=ts_service.aggregate_rollups,
+                    handler_id=f"{ts_service.iri}_rollups",
+                )
+                ts_input.register_handler(
+                    handler_method=ts_service.track_statistics,
+                    handler_id=f"{ts_service.iri}_statistics",
+                )
+
+            # Current values for all processes, without querying the database
+            LastValueCache.instance().register_input(ts_input)
 
             if not new_connection:
-                self.connections.get(ts_node.runtime_connection.iri).timeseries_inputs[
-                    ts_node.iri
-                ] = ts_input
+                self.add_ts_input(
+                    connection=self.connections.get(ts_node.runtime_connection.iri),
+                    ts_input=ts_input,
+                )
 
         # Add new connections
         rt_con_node: RuntimeConnectionNode
@@ -198,9 +305,10 @@ class RuntimeConnectionContainer:
                 self.connections[rt_con_node.iri] = rt_connection
 
                 # Link the inputs to its connections:
-                rt_connection.timeseries_inputs = new_ts_inputs_per_connection.get(
+                for ts_input in new_ts_inputs_per_connection.get(
                     rt_con_node.iri
-                )
+                ).values():
+                    self.add_ts_input(connection=rt_connection, ts_input=ts_input)
                 # Start the connection
 
                 rt_connection.start_connection()
@@ -214,6 +322,71 @@ class RuntimeConnectionContainer:
 
     def register_runtime_connection(self, iri: str, connection: RuntimeConnection):
         self.connections[iri] = connection
+        for ts_input in connection.timeseries_inputs.values():
+            ts_input.metrics = connection.metrics
+            self._ts_inputs[ts_input.iri] = ts_input
+            self._ts_input_connections[ts_input.iri] = connection
+            if ts_input.has_held_readings():
+                self._start_idle_readings_flush_thread()
+
+    def remove_runtime_connection(self, iri: str):
+        """
+        Disconnects the connection and unregisters it together with all its inputs
+        :param iri:
+        :return:
+        """
+        connection = self.connections.pop(iri, None)
+        if connection is None:
+            return
+        for ts_input_iri in list(connection.timeseries_inputs.keys()):
+            self._ts_inputs.pop(ts_input_iri, None)
+            self._ts_input_connections.pop(ts_input_iri, None)
+        connection.disconnect()
+
+    def add_ts_input(self, connection: RuntimeConnection, ts_input: TimeseriesInput):
+        """
+        Adds the input to the connection and registers it
+        :param connection:
+        :param ts_input:
+        :return:
+        """
+        ts_input.metrics = connection.metrics
+        connection.add_ts_input(ts_input)
+        self._ts_inputs[ts_input.iri] = ts_input
+        self._ts_input_connections[ts_input.iri] = connection
+        if ts_input.has_held_readings():
+            self._start_idle_readings_flush_thread()
+
+    def _start_idle_readings_flush_thread(self):
+        # Lazy start, only needed if any input uses the swinging door compression
+        if self._idle_readings_flush_thread is None:
+            self._idle_readings_flush_thread = Thread(
+                target=self._idle_readings_flush_loop, daemon=True
+            )
+            self._idle_readings_flush_thread.start()
+
+    def _idle_readings_flush_loop(self):
+        while True:
+            time.sleep(IDLE_READINGS_FLUSH_INTERVAL)
+            for ts_input in list(self._ts_inputs.values()):
+                # pylint: disable=W0703
+                try:
+                    ts_input.flush_idle_readings()
+                except Exception as exc:
+                    logger.info(
+                        f"Flushing held readings of {ts_input.iri} failed: {exc}"
+                    )
+
+    def remove_ts_input(self, iri: str):
+        """
+        Removes the input from its connection and unregisters it
+        :param iri:
+        :return:
+        """
+        self._ts_inputs.pop(iri, None)
+        connection = self._ts_input_connections.pop(iri, None)
+        if connection is not None:
+            connection.remove_ts_input(iri)
 
     def get_all_inputs(self) -> List[TimeseriesInput]:
         """
@@ -226,12 +399,75 @@ class RuntimeConnectionContainer:
 
         return inputs
 
-    def get_timeseries_input_by_iri(self, iri: str):
-        ts_input_list = [
-            ts_input for ts_input in self.get_all_inputs() if ts_input.iri == iri
-        ]
-        if len(ts_input_list) > 0:
-            return ts_input_list[0]
+    def get_timeseries_input_by_iri(self, iri: str) -> TimeseriesInput | None:
+        return self._ts_inputs.get(iri)
+
+    def get_runtime_connection_by_input_iri(self, iri: str) -> RuntimeConnection | None:
+        """
+        :param iri: iri of the timeseries input
+        :return: the connection providing the input
+        """
+        return self._ts_input_connections.get(iri)
+
+    def get_compression_statistics(self) -> Dict[str, int]:
+        """
+        :return: Counters of received, stored and suppressed readings, summed over all inputs with compression
+        """
+        statistics: Dict[str, int] = dict()
+        for ts_input in self._ts_inputs.values():
+            input_statistics = ts_input.get_compression_statistics()
+            if input_statistics is None:
+                continue
+            for key, count in input_statistics.items():
+                statistics[key] = statistics.get(key, 0) + count
+        return statistics
+
+    def get_metrics_snapshot(self) -> Dict:
+        """
+        :return: Hot-path metrics of the connections (per connection iri) and of the timeseries persistence (per
+        database iri) of this process
+        """
+        connections = {}
+        for iri, connection in self.connections.items():
+            compression: Dict[str, int] = dict()
+            for ts_input in connection.timeseries_inputs.values():
+                input_statistics = ts_input.get_compression_statistics()
+                if input_statistics is None:
+                    continue
+                for key, count in input_statistics.items():
+                    compression[key] = compression.get(key, 0) + count
+
+            connections[iri] = {
+                **connection.metrics.to_dict(),
+                "active": int(connection.is_active()),
+                "timeseries_inputs": len(connection.timeseries_inputs),
+                "compression": compression,
+            }
+
+        databases = {}
+        db_services = DatabasePersistenceServiceContainer.instance().services
+        for iri, service in db_services.items():
+            if isinstance(service, TimeseriesPersistenceService):
+                databases[iri] = {
+                    "write": service.get_write_statistics(),
+                    "write_latency": service.get_write_latency(),
+                    "rollups": service.get_rollup_statistics(),
+                }
+
+        return {"pid": os.getpid(), "connections": connections, "databases": databases}
+
+    def publish_metrics(self, publisher: str):
+        """
+        Publishes the metrics snapshot of this process to the inter-process cache, where the API aggregates the
+        snapshots of all ingestion processes
+        :param publisher: name of the process (MAIN_METRICS_PUBLISHER or the shard)
+        :return:
+        """
+        memcache.set(
+            f"{METRICS_KEY_PREFIX}{publisher}",
+            json.dumps(self.get_metrics_snapshot()),
+            expire=METRICS_EXPIRE,
+        )
 
     def get_active_connections_count(self) -> int:
 
@@ -239,8 +475,14 @@ class RuntimeConnectionContainer:
 
     def _active_connections_write_to_cache_loop(self):
         while True:
-            memcache.set(
-                "active_runtime_connections_count", self.get_active_connections_count()
-            )
+            # pylint: disable=W0703
+            try:
+                memcache.set(
+                    "active_runtime_connections_count",
+                    self.get_active_connections_count(),
+                )
+                self.publish_metrics(MAIN_METRICS_PUBLISHER)
+            except Exception as exc:
+                logger.info(f"Publishing the runtime connections status failed: {exc}")
 
             time.sleep(3)
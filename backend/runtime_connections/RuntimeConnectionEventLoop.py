@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+from threading import Thread, current_thread
+
+from util.log import logger
+
+
+class RuntimeConnectionEventLoop:
+    """
+    Single asyncio event loop shared by all runtime connections (OPCUA, MQTT, ...) of this process.
+    Runs in one dedicated thread, so that the count of threads does not grow with the count of connections.
+    Started lazily, so that processes without runtime connections (e.g. API workers) do not start it.
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        RuntimeConnectionEventLoop.__instance = self
+
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = Thread(
+            target=self._run_loop, name="runtime-connections-event-loop", daemon=True
+        )
+        self._loop_thread.start()
+
+    def _run_loop(self):
+        logger.info("Starting the event loop for runtime connections...")
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def create_task(self, coro) -> concurrent.futures.Future:
+        """
+        Schedules the coroutine on the shared loop. Can be called from any thread
+        :param coro:
+        :return: future to wait for the result from other threads
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float | None = None):
+        """
+        Runs the coroutine on the shared loop and waits for its result.
+        Must not be called from within the loop itself!
+        :param coro:
+        :param timeout: in s
+        :return: the result of the coroutine
+        """
+        return self.create_task(coro).result(timeout)
+
+    def is_loop_thread(self) -> bool:
+        return current_thread() is self._loop_thread
+
+    def call_soon(self, callback, *args):
+        """
+        Calls the (non-blocking) callback from within the loop. Can be called from any thread.
+        Called directly, if already running in the loop thread
+        :param callback:
+        :param args:
+        :return:
+        """
+        if self.is_loop_thread():
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
@@ -0,0 +1,226 @@
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+NUMERIC_VALUE_TYPES = [
+    TimeseriesValueTypes.DECIMAL.value,
+    TimeseriesValueTypes.INT.value,
+]
+
+# Swinging door: a held reading is stored, if no further reading was received for that time (in s), so that the last
+# segment of a series going silent is not lost. The heartbeat interval is used instead, if shorter
+IDLE_TIMEOUT = 60
+
+
+class TimeseriesCompressionFilter:
+    """
+    Ingestion-time compression of one time series, deciding which readings are persisted:
+    - Deadband (absolute and / or percent of the last stored value): readings closer to the last stored value are
+      suppressed (numeric series only)
+    - Change-only: readings equal to the last stored value are suppressed (intended for boolean and string series)
+    - Swinging door: readings are suppressed as long as all of them lie within a corridor of the given deviation
+      around the line from the last stored reading (numeric series only). When a reading leaves the corridor, the
+      reading before it is stored, so that linear interpolation between stored readings stays within the deviation.
+    - Max. heartbeat: a reading is stored at least once per interval, even if suppressed otherwise
+    A reading held back by the swinging door is stored, when the heartbeat is due or the series went idle (see
+    flush_idle).
+    """
+
+    def __init__(
+        self,
+        value_type: str,
+        deadband_absolute: float | None = None,
+        deadband_percent: float | None = None,
+        change_only: bool = False,
+        swinging_door_deviation: float | None = None,
+        max_heartbeat_ms: int | None = None,
+    ) -> None:
+        numeric = value_type in NUMERIC_VALUE_TYPES
+        self.deadband_absolute = deadband_absolute if numeric else None
+        self.deadband_percent = deadband_percent if numeric else None
+        self.change_only = change_only
+        self.swinging_door_deviation = swinging_door_deviation if numeric else None
+        # Corridor half-width: the stored line deviates from the best line through the corridor by up to that much
+        # as well, so that the interpolation error stays within the deviation
+        self._swinging_door_corridor = (
+            self.swinging_door_deviation / 2
+            if self.swinging_door_deviation is not None
+            else None
+        )
+        self.max_heartbeat = (
+            max_heartbeat_ms / 1000 if max_heartbeat_ms is not None else None
+        )
+        self.idle_timeout = (
+            min(IDLE_TIMEOUT, self.max_heartbeat)
+            if self.max_heartbeat is not None
+            else IDLE_TIMEOUT
+        )
+
+        # Last stored reading: (reading time, time in s, value)
+        self._stored: Tuple[datetime | None, float, float | int | bool | str] = None
+        # Swinging door: last received, but not yet stored reading
+        self._held: Tuple[datetime | None, float, float | int] = None
+        # Receive time of the last reading (monotonic, in s)
+        self._last_received = 0.0
+        # Readings are processed by the connection, idle readings flushed by another thread
+        self._lock = Lock()
+        self._upper_slope = float("-inf")
+        self._lower_slope = float("inf")
+
+        # Statistics
+        self.received_count = 0
+        self.stored_count = 0
+        self.suppressed_deadband_count = 0
+        self.suppressed_unchanged_count = 0
+        self.suppressed_swinging_door_count = 0
+
+    @classmethod
+    def is_configured(
+        cls,
+        deadband_absolute: float | None = None,
+        deadband_percent: float | None = None,
+        change_only: bool = False,
+        swinging_door_deviation: float | None = None,
+        max_heartbeat_ms: int | None = None,
+    ) -> bool:
+        """
+        :return: whether any of the filters is active. Heartbeat only is not a filter
+        """
+        return (
+            deadband_absolute is not None
+            or deadband_percent is not None
+            or change_only
+            or swinging_door_deviation is not None
+        )
+
+    def _store(
+        self, reading_time: datetime | None, t: float, value
+    ) -> Tuple[datetime | None, float | int | bool | str]:
+        self._stored = (reading_time, t, value)
+        self._held = None
+        self._upper_slope = float("-inf")
+        self._lower_slope = float("inf")
+        self.stored_count += 1
+        return reading_time, value
+
+    def process(
+        self, reading_time: datetime | None, value: float | int | bool | str
+    ) -> List[Tuple[datetime | None, float | int | bool | str]]:
+        """
+        :param reading_time: None, if the database time shall be used
+        :param value: already converted to the value type of the series
+        :return: readings to be persisted (none, the given one, or a previously held one)
+        """
+        with self._lock:
+            self.received_count += 1
+            self._last_received = time.monotonic()
+            return self._process(reading_time, value)
+
+    def flush_idle(self) -> List[Tuple[datetime | None, float | int | bool | str]]:
+        """
+        Stores the reading held back by the swinging door, if no reading was received for the idle timeout
+        :return: readings to be persisted (none or the held one)
+        """
+        with self._lock:
+            if (
+                self._held is None
+                or time.monotonic() - self._last_received < self.idle_timeout
+            ):
+                return []
+            held_time, held_t, held_value = self._held
+            return [self._store(held_time, held_t, held_value)]
+
+    def _process(
+        self, reading_time: datetime | None, value: float | int | bool | str
+    ) -> List[Tuple[datetime | None, float | int | bool | str]]:
+        t = reading_time.timestamp() if reading_time is not None else time.time()
+
+        if self._stored is None:
+            return [self._store(reading_time, t, value)]
+
+        _, stored_t, stored_value = self._stored
+
+        if self.max_heartbeat is not None and t - stored_t >= self.max_heartbeat:
+            # The held reading ends the previous segment, the new one starts the next
+            stored = []
+            if self._held is not None:
+                held_time, held_t, held_value = self._held
+                stored.append(self._store(held_time, held_t, held_value))
+            stored.append(self._store(reading_time, t, value))
+            return stored
+
+        if self.change_only and value == stored_value:
+            self.suppressed_unchanged_count += 1
+            return []
+
+        if self.deadband_absolute is not None or self.deadband_percent is not None:
+            difference = abs(value - stored_value)
+            if (
+                self.deadband_absolute is not None
+                and difference <= self.deadband_absolute
+            ) or (
+                self.deadband_percent is not None
+                and difference <= abs(stored_value) * self.deadband_percent / 100
+            ):
+                self.suppressed_deadband_count += 1
+                return []
+
+        if self.swinging_door_deviation is None:
+            return [self._store(reading_time, t, value)]
+
+        return self._process_swinging_door(reading_time, t, value)
+
+    def _process_swinging_door(
+        self, reading_time: datetime | None, t: float, value: float | int
+    ) -> List[Tuple[datetime | None, float | int | bool | str]]:
+        _, stored_t, stored_value = self._stored
+        elapsed = t - stored_t
+        if elapsed <= 0:
+            # Out of order or same timestamp: no slope can be calculated
+            return [self._store(reading_time, t, value)]
+
+        upper_slope = max(
+            self._upper_slope,
+            (value - stored_value - self._swinging_door_corridor) / elapsed,
+        )
+        lower_slope = min(
+            self._lower_slope,
+            (value - stored_value + self._swinging_door_corridor) / elapsed,
+        )
+
+        if upper_slope <= lower_slope:
+            # Still within the corridor: hold the reading, the previously held one is not needed anymore
+            if self._held is not None:
+                self.suppressed_swinging_door_count += 1
+            # Stored later: the receive time is kept, if the database time would be used otherwise
+            self._held = (
+                reading_time
+                if reading_time is not None
+                else datetime.fromtimestamp(t, tz=timezone.utc),
+                t,
+                value,
+            )
+            self._upper_slope = upper_slope
+            self._lower_slope = lower_slope
+            return []
+
+        if self._held is None:
+            return [self._store(reading_time, t, value)]
+
+        # Door closed: store the held reading and start a new corridor from there
+        held_time, held_t, held_value = self._held
+        stored = [self._store(held_time, held_t, held_value)]
+        stored.extend(self._process_swinging_door(reading_time, t, value))
+        return stored
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {
+            "received": self.received_count,
+            "stored": self.stored_count,
+            "suppressed_deadband": self.suppressed_deadband_count,
+            "suppressed_unchanged": self.suppressed_unchanged_count,
+            "suppressed_swinging_door": self.suppressed_swinging_door_count,
+        }
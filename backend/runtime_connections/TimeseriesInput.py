@@ -1,25 +1,75 @@
 import abc
-from ctypes.wintypes import BOOL
+import time
 from datetime import datetime
-from math import floor
 from typing import Tuple, Dict
 
-from graph_domain.main_digital_twin.TimeseriesNode import (
-    TimeseriesNodeFlat,
-    TimeseriesValueTypes,
+from backend.runtime_connections.ConnectionMetrics import ConnectionMetrics
+from backend.runtime_connections.TimeseriesCompressionFilter import (
+    TimeseriesCompressionFilter,
 )
+from backend.runtime_connections.value_conversion import (
+    get_batch_value_converter,
+    get_value_converter,
+)
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesNodeFlat
 
 
 class TimeseriesInput(abc.ABC):
     def __init__(
-        self, iri: str, connection_topic: str, connection_keyword: str, value_type: str
+        self,
+        iri: str,
+        connection_topic: str,
+        connection_keyword: str,
+        value_type: str,
+        sampling_interval_ms: int | None = None,
+        deadband_absolute: float | None = None,
+        deadband_percent: float | None = None,
+        change_only: bool | None = None,
+        swinging_door_deviation: float | None = None,
+        max_heartbeat_ms: int | None = None,
     ):
         self._last_reading: Tuple[datetime, float | int | bool | str] = None
         self._handlers: Dict[str, callable] = dict()
+        # Handlers only receiving the readings passing the compression filter (e.g. persistence)
+        self._compressed_handlers: Dict[str, callable] = dict()
+        # Replaced by the metrics of the connection, when added to one
+        self.metrics = ConnectionMetrics()
         self.iri = iri
         self.connection_topic = connection_topic
         self.connection_keyword = connection_keyword
+        # Also resolves the value converters
         self.value_type = value_type
+        # None: use the sampling interval of the connection
+        self.sampling_interval_ms = sampling_interval_ms
+
+        self._compression_filter: TimeseriesCompressionFilter | None = (
+            TimeseriesCompressionFilter(
+                value_type=value_type,
+                deadband_absolute=deadband_absolute,
+                deadband_percent=deadband_percent,
+                change_only=bool(change_only),
+                swinging_door_deviation=swinging_door_deviation,
+                max_heartbeat_ms=max_heartbeat_ms,
+            )
+            if TimeseriesCompressionFilter.is_configured(
+                deadband_absolute=deadband_absolute,
+                deadband_percent=deadband_percent,
+                change_only=bool(change_only),
+                swinging_door_deviation=swinging_door_deviation,
+            )
+            else None
+        )
+
+    @property
+    def value_type(self) -> str:
+        return self._value_type
+
+    @value_type.setter
+    def value_type(self, value_type: str):
+        self._value_type = value_type
+        # Resolved once, instead of checking the type for every reading
+        self.convert_value = get_value_converter(value_type)
+        self.convert_values = get_batch_value_converter(value_type)
 
     @classmethod
     def from_timeseries_node(cls, node: TimeseriesNodeFlat):
@@ -28,6 +78,12 @@ class TimeseriesInput(abc.ABC):
             connection_topic=node.connection_topic,
             connection_keyword=node.connection_keyword,
             value_type=node.value_type,
+            sampling_interval_ms=node.sampling_interval_ms,
+            deadband_absolute=node.deadband_absolute,
+            deadband_percent=node.deadband_percent,
+            change_only=node.change_only,
+            swinging_door_deviation=node.swinging_door_deviation,
+            max_heartbeat_ms=node.max_heartbeat_ms,
         )
 
     def get_most_current(self) -> Tuple[datetime, int | float | bool | str]:
@@ -36,17 +92,55 @@ class TimeseriesInput(abc.ABC):
         """
         return self._last_reading
 
-    def register_handler(self, handler_method, handler_id: str) -> None:
+    def register_handler(
+        self, handler_method, handler_id: str, compressed: bool = False
+    ) -> None:
         """
         Registers a given handler method to be called whenever a reading is being received
         :param handler_method: Callable taking three arguments: id_uri: str, value: Any,
         reading_time: datetime.
+        :param compressed: if True, the handler only receives the readings passing the compression filter of the
+        input (intended for persistence)
         :return: None
         """
-        self._handlers[handler_id] = handler_method
+        if compressed:
+            self._compressed_handlers[handler_id] = handler_method
+        else:
+            self._handlers[handler_id] = handler_method
 
     def remove_handler(self, handler_id: str):
-        self._handlers.pop(handler_id)
+        if handler_id in self._compressed_handlers:
+            self._compressed_handlers.pop(handler_id)
+        else:
+            self._handlers.pop(handler_id)
+
+    def get_compression_statistics(self) -> Dict[str, int] | None:
+        """
+        :return: Counters of received, stored and suppressed readings. None, if no compression is configured
+        """
+        if self._compression_filter is None:
+            return None
+        return self._compression_filter.get_statistics()
+
+    def has_held_readings(self) -> bool:
+        """
+        :return: whether the compression filter may hold back readings, which need to be flushed when idle
+        """
+        return (
+            self._compression_filter is not None
+            and self._compression_filter.swinging_door_deviation is not None
+        )
+
+    def flush_idle_readings(self):
+        """
+        Passes the reading held back by the compression filter to the compressed handlers, if the input went idle
+        :return:
+        """
+        if self._compression_filter is None:
+            return
+        for stored_time, stored_value in self._compression_filter.flush_idle():
+            for handler in self._compressed_handlers.values():
+                handler(self.iri, stored_value, stored_time)
 
     def handle_reading(self, reading_time, reading_value):
         """
@@ -55,27 +149,25 @@ class TimeseriesInput(abc.ABC):
         :param reading_value:
         :return:
         """
-        if self.value_type == TimeseriesValueTypes.STRING.value:
-            reading_value = str(reading_value)
-        elif self.value_type == TimeseriesValueTypes.DECIMAL.value:
-            reading_value = float(reading_value)
-        elif self.value_type == TimeseriesValueTypes.INT.value:
-            reading_value = floor(float(reading_value))
-        elif self.value_type == TimeseriesValueTypes.BOOL.value:
-            if isinstance(reading_value, bool):
-                pass
-            elif isinstance(reading_value, float):
-                reading_value = bool(reading_value)
-            elif isinstance(reading_value, str):
-                reading_value = (
-                    reading_value == "True"
-                    or reading_value == "true"
-                    or reading_value == "t"
-                )
-
-        if isinstance(reading_value, str):
-            pass
+        start = time.perf_counter()
+        reading_value = self.convert_value(reading_value)
 
         for handler in self._handlers.values():
             handler(self.iri, reading_value, reading_time)
+
+        if len(self._compressed_handlers) > 0:
+            if self._compression_filter is None:
+                for handler in self._compressed_handlers.values():
+                    handler(self.iri, reading_value, reading_time)
+            else:
+                for stored_time, stored_value in self._compression_filter.process(
+                    reading_time, reading_value
+                ):
+                    for handler in self._compressed_handlers.values():
+                        handler(self.iri, stored_value, stored_time)
+
         self._last_reading = reading_time, reading_value
+
+        metrics = self.metrics
+        metrics.readings += 1
+        metrics.handler_latency.observe(time.perf_counter() - start)
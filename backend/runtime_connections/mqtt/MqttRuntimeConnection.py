@@ -1,36 +1,156 @@
-from typing import List
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Set
 
 import paho.mqtt.client as mqtt
 from backend.runtime_connections.RuntimeConnection import RuntimeConnection
+from backend.runtime_connections.RuntimeConnectionEventLoop import (
+    RuntimeConnectionEventLoop,
+)
 
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
-from backend.runtime_connections.mqtt.MqttTimeseriesInput import MqttTimeseriesInput
+from backend.runtime_connections.mqtt.MqttTimeseriesInput import (
+    MqttTimeseriesInput,
+    parse_payload,
+)
+from backend.runtime_connections.mqtt.MqttTopicTrie import (
+    MqttTopicTrie,
+    consolidate_subscriptions,
+)
+from backend.runtime_connections.mqtt.timestamp_parsing import get_timestamp_parser
 from util.log import logger
 
+RECONNECT_DURATION = 10  # time to wait before trying to reconnect (in s)
+KEEPALIVE = 60  # (in s)
+MISC_LOOP_INTERVAL = 1  # interval for the client's housekeeping, e.g. keepalive pings (in s)
+MAX_TOPICS_PER_SUBSCRIBE = 200  # topics per SUBSCRIBE packet
+
 
 class MqttRuntimeConnection(RuntimeConnection):
     """
     Connection to one MQTT broker. One or several timeseries inputs can be available via one connection over different
     topics.
+    The client socket is served by the event loop shared by all runtime connections (no network thread per
+    connection).
     """
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+        self.thread_stop = False
         self.mqtt_client = mqtt.Client()
+        self._event_loop = RuntimeConnectionEventLoop.instance()
+        self._connection_task = None
+        self._disconnected: asyncio.Event | None = None
+
+        self._timestamp_parser = get_timestamp_parser(self.timestamp_format)
+
+        # Topic filter -> inputs listening to that topic. Replaced as a whole, so that the
+        # event loop always sees a consistent index
+        self._topic_index: MqttTopicTrie[MqttTimeseriesInput] = MqttTopicTrie()
+        # Topic filters currently subscribed at the broker (possibly consolidated to wildcards)
+        self._subscriptions: Set[str] = set()
+
+    def _rebuild_topic_index(self):
+        topic_index: MqttTopicTrie[MqttTimeseriesInput] = MqttTopicTrie()
+        timeseries_input: MqttTimeseriesInput
+        for timeseries_input in self.timeseries_inputs.values():
+            topic_index.add(timeseries_input.connection_topic, timeseries_input)
+        self._topic_index = topic_index
+
+    def _configured_topics(self) -> Set[str]:
+        return {
+            timeseries_input.connection_topic
+            for timeseries_input in self.timeseries_inputs.values()
+        }
+
+    def _subscribe(self, topics: List[str]):
+        """
+        Subscribes to the given topic filters, using one SUBSCRIBE packet per MAX_TOPICS_PER_SUBSCRIBE topics
+        instead of one per topic
+        """
+        for start in range(0, len(topics), MAX_TOPICS_PER_SUBSCRIBE):
+            batch = topics[start : start + MAX_TOPICS_PER_SUBSCRIBE]
+            self.mqtt_client.subscribe([(topic, 0) for topic in batch])
+        self._subscriptions.update(topics)
+
+    def _is_subscribed(self, topic: str) -> bool:
+        return topic in self._subscriptions or any(
+            mqtt.topic_matches_sub(subscription, topic)
+            for subscription in self._subscriptions
+        )
 
     # Override:
     def start_connection(self):
 
-        self.mqtt_client.on_connect_fail = self.__on_connect_fail
         self.mqtt_client.on_message = self.__on_message
         self.mqtt_client.on_disconnect = self.__on_disconnect
         self.mqtt_client.on_connect = self.__on_connect
 
-        # Async variant so that the library handles reconnecting on its own (even at startup)
-        self.mqtt_client.connect_async(host=self.host, port=self.port, keepalive=60)
+        # External event loop: the client reports its socket, which is then watched by the shared loop.
+        # Might be called from other threads (connecting, subscribing), so the loop is only modified from within
+        # the loop thread
+        self.mqtt_client.on_socket_open = self.__on_socket_open
+        self.mqtt_client.on_socket_close = self.__on_socket_close
+        self.mqtt_client.on_socket_register_write = self.__on_socket_register_write
+        self.mqtt_client.on_socket_unregister_write = (
+            self.__on_socket_unregister_write
+        )
 
-        self.mqtt_client.loop_start()
+        self._connection_task = self._event_loop.create_task(
+            self.mqtt_connection_task()
+        )
+
+    async def mqtt_connection_task(self):
+        """
+        Main MQTT task: connects and reconnects after the connection got lost
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        self._disconnected = asyncio.Event()
+        misc_task = asyncio.create_task(self.__misc_loop())
+        try:
+            while self.thread_stop == False:
+                try:
+                    self._disconnected.clear()
+                    # Connecting is blocking (DNS lookup, TCP handshake)
+                    await loop.run_in_executor(
+                        None, self.mqtt_client.connect, self.host, self.port, KEEPALIVE
+                    )
+                    await self._disconnected.wait()
+                # pylint: disable=W0703
+                except Exception as exc:
+                    self.active = False
+                    logger.info(
+                        f"MQTT connection could not be established: "
+                        f"Host: {self.host}, port: {self.port}. {exc}"
+                    )
+                if self.thread_stop == False:
+                    await asyncio.sleep(RECONNECT_DURATION)
+        finally:
+            misc_task.cancel()
+
+    async def __misc_loop(self):
+        while True:
+            self.mqtt_client.loop_misc()
+            await asyncio.sleep(MISC_LOOP_INTERVAL)
+
+    def __on_socket_open(self, client, userdata, sock):
+        self._event_loop.call_soon(
+            self._event_loop.loop.add_reader, sock.fileno(), client.loop_read
+        )
+
+    def __on_socket_close(self, client, userdata, sock):
+        # File descriptor instead of the socket, as the socket might already be closed when removing
+        self._event_loop.call_soon(self._event_loop.loop.remove_reader, sock.fileno())
+
+    def __on_socket_register_write(self, client, userdata, sock):
+        self._event_loop.call_soon(
+            self._event_loop.loop.add_writer, sock.fileno(), client.loop_write
+        )
+
+    def __on_socket_unregister_write(self, client, userdata, sock):
+        self._event_loop.call_soon(self._event_loop.loop.remove_writer, sock.fileno())
 
     def __on_connect(self, client, userdata, flags, reason_code):
         """
@@ -42,29 +162,28 @@ class MqttRuntimeConnection(RuntimeConnection):
         :param reason_code:
         :return:
         """
+        topics = self._configured_topics()
+        # Wildcards only if enabled for the connection (see RuntimeConnectionNode.wildcard_min_siblings)
+        subscriptions = consolidate_subscriptions(topics, self.wildcard_min_siblings)
         logger.info(
             "MQTT connected. "
-            f"Host: {self.host}, port: {self.port}. Subscribing to topics..."
+            f"Host: {self.host}, port: {self.port}. Subscribing to {len(topics)} topics "
+            f"with {len(subscriptions)} subscriptions..."
         )
 
-        timeseries_input: MqttTimeseriesInput
-        for timeseries_input in self.timeseries_inputs.values():
-            self.mqtt_client.subscribe(timeseries_input.connection_topic, 0)
-
-    def __on_connect_fail(self, client, userdata):
-        self.active = False
-        logger.info(
-            f"MQTT connection could not be established: "
-            f"Host: {self.host}, port: {self.port}"
-        )
+        self._subscriptions = set()
+        if len(subscriptions) > 0:
+            self._subscribe(subscriptions)
 
     def __on_disconnect(self, client, userdata, reason_code):
         self.active = False
         if reason_code != 0:
             logger.info(
                 f"Unexpected MQTT disconnection. "
-                f"Host: {self.host}, port: {self.port}. Will auto-reconnect"
+                f"Host: {self.host}, port: {self.port}. Trying to reconnect in {RECONNECT_DURATION} s ..."
             )
+        if self._disconnected is not None:
+            self._event_loop.call_soon(self._disconnected.set)
 
     def __on_message(self, client, userdata, msg):
         """
@@ -75,15 +194,50 @@ class MqttRuntimeConnection(RuntimeConnection):
         :return:
         """
         self.active = True
+        self.metrics.messages_received += 1
+        timeseries_inputs = self._topic_index.match(msg.topic)
+        if len(timeseries_inputs) == 0:
+            # Not configured topic, delivered by a consolidated wildcard subscription
+            return
+
+        # Parse only once for all inputs sharing the topic (distinguished by their keyword)
+        timestamp, parsed_json = parse_payload(msg.payload, self._timestamp_parser)
+        if timestamp is None:
+            # Fallback: receive time
+            timestamp = datetime.now(timezone.utc)
+            if self.metrics.timestamp_fallbacks == 0:
+                logger.info(
+                    f"MQTT message without valid timestamp (format: {self.timestamp_format}) on topic {msg.topic}. "
+                    f"Using the receive time instead."
+                )
+            self.metrics.timestamp_fallbacks += 1
+
         timeseries_input: MqttTimeseriesInput
-        for timeseries_input in self.timeseries_inputs.values():
-            if msg.topic == timeseries_input.connection_topic:
-                timeseries_input.handle_raw_reading(msg.payload)
+        for timeseries_input in timeseries_inputs:
+            timeseries_input.handle_parsed_reading(timestamp, parsed_json)
 
-    def disconnect(self):
-        self.mqtt_client.loop_stop()
+    async def __disconnect(self):
+        self.thread_stop = True
+        if self._connection_task is not None:
+            self._connection_task.cancel()
         self.mqtt_client.disconnect()
 
+    def disconnect(self):
+        self._event_loop.run(self.__disconnect())
+
     def add_ts_input(self, ts_input: TimeseriesInput):
         self.timeseries_inputs[ts_input.iri] = ts_input
-        self.mqtt_client.subscribe(ts_input.connection_topic, 0)
+        self._rebuild_topic_index()
+        # Might already be covered by a consolidated wildcard subscription. Subscriptions are consolidated again
+        # after the next reconnect
+        if not self._is_subscribed(ts_input.connection_topic):
+            self._subscribe([ts_input.connection_topic])
+
+    def remove_ts_input(self, iri: str):
+        topic = self.timeseries_inputs[iri].connection_topic
+        super().remove_ts_input(iri)
+        self._rebuild_topic_index()
+        # Wildcard subscriptions are kept: messages of topics no longer configured are dropped when routing
+        if topic in self._subscriptions and topic not in self._configured_topics():
+            self._subscriptions.discard(topic)
+            self.mqtt_client.unsubscribe(topic)
@@ -1,16 +1,42 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Tuple
 
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+from backend.runtime_connections.mqtt.timestamp_parsing import parse_iso_8601
 
 TIMESTAMP_JSON_KEYWORD = "ts"
 
 
+def parse_payload(
+    payload, timestamp_parser: Callable[[Any], datetime] = parse_iso_8601
+) -> Tuple[datetime | None, Dict]:
+    """
+    Decodes a MQTT message payload. Done once per message, even if multiple inputs share the topic.
+    :param payload:
+    :param timestamp_parser: parser for the timestamp format of the connection
+    :return: timestamp (UTC, None if missing or invalid) and the parsed json
+    """
+    parsed_json = json.loads(payload)
+    timestamp_value = parsed_json.get(TIMESTAMP_JSON_KEYWORD)
+    if timestamp_value is None:
+        return None, parsed_json
+    try:
+        timestamp = timestamp_parser(timestamp_value)
+    except (ValueError, TypeError, OverflowError, IndexError):
+        timestamp = None
+    return timestamp, parsed_json
+
+
 class MqttTimeseriesInput(TimeseriesInput):
     def handle_raw_reading(self, payload):
-        parsed_json = json.loads(payload)
-        timestamp_string = parsed_json.get(TIMESTAMP_JSON_KEYWORD)
-        timestamp = datetime.strptime(timestamp_string, "%Y-%m-%dT%H:%M:%S.%fZ")
+        timestamp, parsed_json = parse_payload(payload)
+        if timestamp is None:
+            # Fallback: receive time
+            timestamp = datetime.now(timezone.utc)
+        self.handle_parsed_reading(timestamp, parsed_json)
+
+    def handle_parsed_reading(self, timestamp: datetime, parsed_json: Dict):
         self.handle_reading(
             reading_time=timestamp,
             reading_value=parsed_json.get(self.connection_keyword),
@@ -0,0 +1,178 @@
+from typing import Dict, Generic, Iterable, List, TypeVar
+
+SINGLE_LEVEL_WILDCARD = "+"
+MULTI_LEVEL_WILDCARD = "#"
+LEVEL_SEPARATOR = "/"
+
+T = TypeVar("T")
+
+
+class _TrieNode(Generic[T]):
+    __slots__ = ["children", "values"]
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode[T]] = dict()
+        self.values: List[T] = []
+
+
+def is_wildcard_filter(topic_filter: str) -> bool:
+    return SINGLE_LEVEL_WILDCARD in topic_filter or MULTI_LEVEL_WILDCARD in topic_filter
+
+
+class MqttTopicTrie(Generic[T]):
+    """
+    Maps MQTT topic filters (possibly containing + and # wildcards) to values and finds all values whose filter
+    matches a received topic.
+    Filters without wildcards are looked up directly. Only the wildcard filters are stored in the trie, which is
+    walked level by level (one step per level plus the wildcard branches).
+    Not modified after building, so that it can be replaced as a whole while messages are routed.
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, List[T]] = dict()
+        self._root: _TrieNode[T] = _TrieNode()
+        self._has_wildcards = False
+
+    def add(self, topic_filter: str, value: T):
+        if not is_wildcard_filter(topic_filter):
+            self._exact.setdefault(topic_filter, []).append(value)
+            return
+
+        self._has_wildcards = True
+        node = self._root
+        for level in topic_filter.split(LEVEL_SEPARATOR):
+            child = node.children.get(level)
+            if child is None:
+                child = _TrieNode()
+                node.children[level] = child
+            node = child
+        node.values.append(value)
+
+    def filters(self) -> Iterable[str]:
+        """
+        :return: all filters without wildcards
+        """
+        return self._exact.keys()
+
+    def match(self, topic: str) -> List[T]:
+        """
+        :param topic: topic of a received message (without wildcards)
+        :return: values of all matching filters
+        """
+        exact = self._exact.get(topic)
+        if not self._has_wildcards:
+            return exact if exact is not None else []
+
+        matches: List[T] = list(exact) if exact is not None else []
+        levels = topic.split(LEVEL_SEPARATOR)
+        # Wildcards at the first level do not match topics starting with $ (e.g. $SYS)
+        self._match_node(
+            self._root, levels, 0, matches, allow_wildcards=not topic.startswith("$")
+        )
+        return matches
+
+    def _match_node(
+        self,
+        node: _TrieNode[T],
+        levels: List[str],
+        index: int,
+        matches: List[T],
+        allow_wildcards: bool = True,
+    ):
+        if allow_wildcards:
+            # "#" also matches the parent level itself (e.g. a/# matches a)
+            multi_level = node.children.get(MULTI_LEVEL_WILDCARD)
+            if multi_level is not None:
+                matches.extend(multi_level.values)
+
+        if index == len(levels):
+            matches.extend(node.values)
+            return
+
+        child = node.children.get(levels[index])
+        if child is not None:
+            self._match_node(child, levels, index + 1, matches)
+
+        if allow_wildcards:
+            single_level = node.children.get(SINGLE_LEVEL_WILDCARD)
+            if single_level is not None:
+                self._match_node(single_level, levels, index + 1, matches)
+
+
+class _SubscriptionNode:
+    __slots__ = ["children", "subscribed"]
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _SubscriptionNode] = dict()
+        # A filter ends at this level
+        self.subscribed = False
+
+
+def consolidate_subscriptions(
+    topic_filters: Iterable[str], min_siblings: int | None
+) -> List[str]:
+    """
+    Collapses topic filters into fewer wildcard subscriptions by analysing the topic tree:
+    - At least min_siblings sibling topics without deeper levels are replaced by parent/+
+    - A level at which at least min_siblings children could be collapsed to wildcards themselves is replaced by
+      parent/#
+    - Filters covered by an already existing wildcard filter on the same level are dropped
+    Wildcard subscriptions might deliver additional (not configured) topics, that have to be filtered out
+    when routing. Top-level topics are never collapsed.
+    :param topic_filters:
+    :param min_siblings: None: no topics are collapsed, only covered filters are dropped
+    :return: subscriptions covering all given filters
+    """
+    root = _SubscriptionNode()
+    for topic_filter in set(topic_filters):
+        node = root
+        for level in topic_filter.split(LEVEL_SEPARATOR):
+            child = node.children.get(level)
+            if child is None:
+                child = _SubscriptionNode()
+                node.children[level] = child
+            node = child
+        node.subscribed = True
+
+    subscriptions: List[str] = []
+    for level, child in root.children.items():
+        subscriptions.extend(_consolidate_node(child, [level], min_siblings))
+    return subscriptions
+
+
+def _consolidate_node(
+    node: _SubscriptionNode, path: List[str], min_siblings: int | None
+) -> List[str]:
+    prefix = LEVEL_SEPARATOR.join(path)
+    if MULTI_LEVEL_WILDCARD in node.children:
+        # Covers the level itself and everything below
+        return [prefix + LEVEL_SEPARATOR + MULTI_LEVEL_WILDCARD]
+
+    subscriptions: List[str] = [prefix] if node.subscribed else []
+
+    # Sibling topics without deeper levels: collapsed into prefix/+ (or covered by an existing prefix/+)
+    leaves = [level for level, child in node.children.items() if not child.children]
+    if SINGLE_LEVEL_WILDCARD in leaves or (
+        min_siblings is not None and len(leaves) >= min_siblings
+    ):
+        subscriptions.append(prefix + LEVEL_SEPARATOR + SINGLE_LEVEL_WILDCARD)
+        remaining = [level for level in node.children.keys() if level not in leaves]
+    else:
+        remaining = list(node.children.keys())
+
+    wildcard_children = 0
+    for level in remaining:
+        child_subscriptions = _consolidate_node(
+            node.children[level], path + [level], min_siblings
+        )
+        if len(child_subscriptions) == 1 and is_wildcard_filter(
+            child_subscriptions[0]
+        ):
+            wildcard_children += 1
+        subscriptions.extend(child_subscriptions)
+
+    # Many children that are collapsed themselves: whole subtree
+    if min_siblings is not None and wildcard_children >= min_siblings:
+        return [prefix + LEVEL_SEPARATOR + MULTI_LEVEL_WILDCARD]
+
+    return subscriptions
@@ -0,0 +1,93 @@
+"""
+Parsers for the timestamps contained in MQTT payloads. Resolved once per connection.
+All parsers return timezone-aware UTC datetimes and raise ValueError or TypeError for invalid timestamps.
+"""
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Callable
+
+
+class TimestampFormats(Enum):
+    # e.g. 2022-09-12T10:15:30.123Z, 2022-09-12 10:15:30+02:00 (naive timestamps are interpreted as UTC)
+    ISO_8601 = "ISO_8601"
+    # Unix epoch as number or numeric string
+    EPOCH_S = "EPOCH_S"
+    EPOCH_MS = "EPOCH_MS"
+    EPOCH_US = "EPOCH_US"
+    EPOCH_NS = "EPOCH_NS"
+
+
+# Any other format given for a connection is interpreted as strptime format
+DEFAULT_TIMESTAMP_FORMAT = TimestampFormats.ISO_8601.value
+
+EPOCH_DIVISORS = {
+    TimestampFormats.EPOCH_S.value: 1,
+    TimestampFormats.EPOCH_MS.value: 1_000,
+    TimestampFormats.EPOCH_US.value: 1_000_000,
+    TimestampFormats.EPOCH_NS.value: 1_000_000_000,
+}
+
+FRACTION_START = 19  # position of the decimal point in YYYY-MM-DDTHH:MM:SS.f
+
+
+def _to_utc(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def parse_iso_8601(value: str) -> datetime:
+    """
+    Based on datetime.fromisoformat (implemented in C), normalizing what it does not accept before python 3.11:
+    the "Z" suffix and fractions with other than 6 digits
+    """
+    if not isinstance(value, str):
+        raise TypeError(f"ISO 8601 timestamp expected, got {type(value).__name__}")
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+
+    dot = value.find(".", FRACTION_START)
+    if dot != -1:
+        end = dot + 1
+        length = len(value)
+        while end < length and value[end].isdigit():
+            end += 1
+        if end - dot - 1 != 6:
+            fraction = value[dot + 1 : end].ljust(6, "0")[:6]
+            value = value[: dot + 1] + fraction + value[end:]
+
+    return _to_utc(datetime.fromisoformat(value))
+
+
+def _epoch_parser(divisor: int) -> Callable[[Any], datetime]:
+    def parse_epoch(value: int | float | str) -> datetime:
+        if isinstance(value, str):
+            value = float(value) if "." in value else int(value)
+        # Integer division first, so that no precision is lost for large integer values
+        if isinstance(value, int):
+            seconds, remainder = divmod(value, divisor)
+            return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(
+                microsecond=remainder * 1_000_000 // divisor
+            )
+        return datetime.fromtimestamp(value / divisor, tz=timezone.utc)
+
+    return parse_epoch
+
+
+def _strptime_parser(timestamp_format: str) -> Callable[[Any], datetime]:
+    def parse_with_format(value: str) -> datetime:
+        return _to_utc(datetime.strptime(value, timestamp_format))
+
+    return parse_with_format
+
+
+def get_timestamp_parser(timestamp_format: str | None) -> Callable[[Any], datetime]:
+    """
+    :param timestamp_format: one of TimestampFormats or a strptime format. None: ISO 8601
+    :return: function parsing the timestamp value of a payload to a timezone-aware UTC datetime
+    """
+    if timestamp_format is None or timestamp_format == DEFAULT_TIMESTAMP_FORMAT:
+        return parse_iso_8601
+    if timestamp_format in EPOCH_DIVISORS:
+        return _epoch_parser(EPOCH_DIVISORS[timestamp_format])
+    return _strptime_parser(timestamp_format)
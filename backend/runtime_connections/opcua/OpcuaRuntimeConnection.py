@@ -1,10 +1,15 @@
-import threading
+import heapq
+import math
 import asyncio
 import time
-from typing import List
-import asyncua.sync
+from typing import Dict, List
+import asyncua
+from asyncua import ua
 import asyncio.exceptions
 from backend.runtime_connections.RuntimeConnection import RuntimeConnection
+from backend.runtime_connections.RuntimeConnectionEventLoop import (
+    RuntimeConnectionEventLoop,
+)
 
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
 from backend.runtime_connections.opcua.OpcuaTimeseriesInput import OpcuaTimeseriesInput
@@ -12,14 +17,27 @@ from util.log import logger
 
 RECONNECT_DURATION = 10  # time to wait before trying to reconnect (in s)
 CONNECTION_CHECK_INTERVAL = 10  # time to wait between checking the connection
-KEEPALIVE_SUBSCRIPTION_SAMPLING_RATE = 1000  # sampling rate for keepalive subscriptions
 
-# The rate in which all sensors from this connection are sampled (in ms)
+# The default rate in which the sensors are sampled (in ms), if neither the timeseries node
+# nor the runtime connection node specify a sampling interval
 SAMPLING_RATE = 500  # ms
-# TODO: integrate this into the timeseries nodes (or at least the connection nodes)!
 
-# Whether the reading handlers should be only triggered when the timeseries reading has actually changed.
-# Otherwise, a new value will be handled every period.
+# Sampling deadlines closer than this are handled with the same read request (in s)
+SCHEDULER_TICK_TOLERANCE = 0.005
+# Max. time the scheduler sleeps, so that changed inputs are picked up quickly (in s)
+SCHEDULER_MAX_SLEEP = 1
+
+# Max. count of nodes read with one request (servers usually limit the nodes per read)
+MAX_NODES_PER_READ = 1000
+
+# Subscription mode: the server samples each node with its sampling interval and queues all changes
+# until they are published. Queue size per monitored item = publishing interval / sampling interval * factor
+SUBSCRIPTION_QUEUE_SIZE_FACTOR = 2
+SUBSCRIPTION_MAX_QUEUE_SIZE = 1000
+
+# Default for connections not specifying only_changes: whether the reading handlers should be only triggered
+# when the timeseries reading has actually changed (subscription-based: the server reports changes only).
+# Otherwise, a new value will be handled every period (polling-based).
 ONLY_CHANGES = False
 
 
@@ -27,70 +45,92 @@ class OpcuaRuntimeConnection(RuntimeConnection):
     """
     Connection to one OPCUA broker. One or several timeseries inputs can be available via one connection over different
     nodes.
+    Runs as task on the event loop shared by all runtime connections (asyncio-based OPCUA client).
     """
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.thread_stop = False
-        self.sampling_rate = SAMPLING_RATE
+        self.sampling_rate = (
+            self.sampling_interval_ms
+            if self.sampling_interval_ms is not None
+            else SAMPLING_RATE
+        )
+        if self.only_changes is None:
+            self.only_changes = ONLY_CHANGES
+
+        self._opcua_client: asyncua.Client | None = None
+        # Input-iri -> node of the input
+        self._nodes: Dict[str, asyncua.Node] = dict()
+        self._event_loop = RuntimeConnectionEventLoop.instance()
+        self._connection_task = None
+
+        # Node-id -> inputs reading that node
+        self._node_index: Dict[str, List[OpcuaTimeseriesInput]] = dict()
+        # Prepared read request items per node-id
+        self._read_value_ids: Dict[str, ua.ReadValueId] = dict()
+        # Sampling interval (ms) -> node-ids sampled with that interval
+        self._nodes_per_interval: Dict[int, List[str]] = dict()
+        # Set when inputs changed: the sampling groups (polling) or the monitored items (subscription) need
+        # to be recreated
+        self._schedule_changed = True
+        # Subscription mode: client handle of the monitored item -> node-id
+        self._monitored_item_index: Dict[int, str] = dict()
+        self._subscription = None
 
-        self._opcua_client = None
-        self._nodes: List[asyncua.sync.SyncNode] = []
-        self._asyncua_treadloop = asyncua.sync.ThreadLoop()
-
-        # Separate thread, as the library does not seem to be able to start a non-blocking subscription
-        if ONLY_CHANGES:
-            self.opcua_connector_thread = threading.Thread(
-                target=self.opcua_connection_thread_subscription_based
+    # Override:
+    def start_connection(self):
+        if self.only_changes:
+            self._connection_task = self._event_loop.create_task(
+                self.opcua_connection_task_subscription_based()
             )
         else:
-            self.opcua_connector_thread = threading.Thread(
-                target=self.opcua_connection_thread_polling_based
+            self._connection_task = self._event_loop.create_task(
+                self.opcua_connection_task_polling_based()
             )
 
-    # Override:
-    def start_connection(self):
-        self.opcua_connector_thread.start()
-
-    def opcua_connection_thread_subscription_based(self):
+    async def opcua_connection_task_subscription_based(self):
         """
-        Main OPCUA thread based on the subscription API. Only samples data changes, not handling every period
-
-        TODO: currently, the subscription does not work anymore when restoring after a temporary disconnect.
-        Use the polling-based variant instead for a reliable connection!
+        Main OPCUA task based on the subscription API. Only samples data changes, not handling every period.
+        Subscriptions belong to the session, so the subscription and its monitored items are created again after
+        every reconnect.
         :return:
         """
 
-        subscription = None
-
         # Outer loop for restoring the whole connection after a timeout
         while self.thread_stop == False:
             try:
-                self.__start_connection()
-                self._opcua_client.connect()
+                await self.__start_connection()
                 self.__load_opcua_nodes()
 
-                # Create subscription (for all nodes):
-                if subscription is None:
-                    subscription = self._opcua_client.create_subscription(
-                        self.sampling_rate, handler=self
-                    )
-                    subscription.subscribe_data_change(self._nodes)
-
                 logger.info(
                     "OPCUA connection active: "
                     f"Host: {self.host}, port: {self.port}. Subscribing to nodes..."
                 )
 
+                # Create subscription (for all nodes) for the new session:
+                self._subscription = None
+                self._schedule_changed = True
+
                 self.active = True
 
                 # Continuously test the connection. Otherwise, lost connections do not seem to lead to an exception
+                last_connection_check = time.monotonic()
                 while self.thread_stop == False:
-                    time.sleep(CONNECTION_CHECK_INTERVAL)
-                    # 'i=84' is the root node that should always exist. Just for checking the connection
-                    # self.__opcua_client.get_node('i=84')
-                    self._nodes[0].read_value()
-                    # self.__nodes[0].read_data_value()
+                    if self._schedule_changed:
+                        self._schedule_changed = False
+                        await self.__create_data_change_subscription()
+
+                    await asyncio.sleep(SCHEDULER_MAX_SLEEP)
+
+                    if (
+                        time.monotonic() - last_connection_check
+                        >= CONNECTION_CHECK_INTERVAL
+                        and len(self._nodes) > 0
+                    ):
+                        last_connection_check = time.monotonic()
+                        # Reading any existing node. Just for checking the connection
+                        await next(iter(self._nodes.values())).read_value()
 
             except asyncio.exceptions.TimeoutError:
                 self.active = False
@@ -99,58 +139,34 @@ class OpcuaRuntimeConnection(RuntimeConnection):
                     f"Host: {self.host}, port: {self.port}. Trying to reconnect in {RECONNECT_DURATION} s ..."
                 )
 
-                time.sleep(RECONNECT_DURATION)
+                await asyncio.sleep(RECONNECT_DURATION)
             except Exception as exc:
                 self.active = False
                 logger.info(
                     f"Unusual exception occured at the OPC-UA connection: {exc}. \nRetrying in {RECONNECT_DURATION} s ..."
                 )
-                time.sleep(RECONNECT_DURATION)
+                await asyncio.sleep(RECONNECT_DURATION)
 
-    def opcua_connection_thread_polling_based(self):
+    async def opcua_connection_task_polling_based(self):
         """
-        Main OPCUA thread based on the subscription API. Only samples data changes, not handling every period
+        Main OPCUA task polling the nodes according to their sampling intervals.
+        All nodes due at the same time are read with one bulk read request
         :return:
         """
 
         # Outer loop for restoring the whole connection after a timeout
         while self.thread_stop == False:
             try:
-                self.__start_connection()
-                self._opcua_client.connect()
+                await self.__start_connection()
                 self.__load_opcua_nodes()
 
-                # # Create subscription to avoid asyncua.sync.ThreadLoopNotRunning exceptions:
-                subscription = self._opcua_client.create_subscription(
-                    KEEPALIVE_SUBSCRIPTION_SAMPLING_RATE, handler=self
-                )
-                # Subscribe to one existing node.
-                # This subscription keeps the connection alive, even if the actual sensor reading happens via
-                # polling
-                subscription.subscribe_data_change(self._nodes[0])
-
                 logger.info(
                     "OPCUA connection active: " f"Host: {self.host}, port: {self.port}."
                 )
 
                 # Continuously polling the sensor readings:
-                while self.thread_stop == False:
-                    node: asyncua.sync.SyncNode
-                    for node in self._nodes:
-                        val = node.read_value()
-                        data = node.read_data_value()
-
-                        self.active = True
-
-                        timeseries_input: OpcuaTimeseriesInput
-                        for timeseries_input in self.timeseries_inputs.values():
-                            timeseries_input.handle_reading_if_belonging(
-                                node_id=str(node),
-                                reading_time=data.SourceTimestamp,
-                                value=val,
-                            )
-
-                    time.sleep(self.sampling_rate / 1000)
+                self._schedule_changed = True
+                await self._polling_scheduler_loop()
 
             except asyncio.exceptions.TimeoutError:
                 self.active = False
@@ -158,68 +174,227 @@ class OpcuaRuntimeConnection(RuntimeConnection):
                     "OPCUA connection timeout."
                     f"Host: {self.host}, port: {self.port}. Trying to reconnect in {RECONNECT_DURATION} s ..."
                 )
-                time.sleep(RECONNECT_DURATION)
+                await asyncio.sleep(RECONNECT_DURATION)
             except OSError:
                 self.active = False
                 logger.info(
                     "OPCUA connection: OSError. "
                     f"Host: {self.host}, port: {self.port}. Trying to reconnect in {RECONNECT_DURATION} s ..."
                 )
-                time.sleep(RECONNECT_DURATION)
+                await asyncio.sleep(RECONNECT_DURATION)
             except Exception as exc:
                 self.active = False
                 logger.info(
                     f"Unusual exception occured at the OPC-UA connection: {exc}. \nRetrying in {RECONNECT_DURATION} s ..."
                 )
-                time.sleep(RECONNECT_DURATION)
+                await asyncio.sleep(RECONNECT_DURATION)
+
+    async def __close_client(self):
+        if self._opcua_client is not None:
+            # pylint: disable=W0703
+            try:
+                await self._opcua_client.disconnect()
+            except Exception:
+                # Connection already lost
+                pass
+            self._opcua_client = None
 
-    def __start_connection(self):
+    async def __start_connection(self):
         """
-        Try to initialize the OPC UA connection
-        Once it was started once, it can be reused even after losing the connection for some period.
-        Blocking until the connection is successfull!
+        Initializes a new OPC UA connection (session), closing the old one if existing.
         :return:
+        :raise asyncio.exceptions.TimeoutError: if the server is not reachable
         """
-        if self._opcua_client is not None:
-            self._opcua_client.disconnect()
-            del self._opcua_client
-            self._opcua_client = None
-            self._asyncua_treadloop.stop()
-            del self._asyncua_treadloop
-            self._asyncua_treadloop = asyncua.sync.ThreadLoop()
-        while self._opcua_client is None and self.thread_stop == False:
-            try:
-                self._asyncua_treadloop.start()
-                logger.info(
-                    f"Trying to connect to OPC UA: opc.tcp://{self.host}:{self.port}"
-                )
-                self._opcua_client = asyncua.sync.Client(
-                    url=f"opc.tcp://{self.host}:{self.port}",
-                    tloop=self._asyncua_treadloop,
-                )
-            except asyncio.exceptions.TimeoutError:
-                logger.info(
-                    "OPCUA connection timeout while initializing the connection. "
-                    f"Host: {self.host}, port: {self.port}. Retrying in {RECONNECT_DURATION} s ..."
-                )
-                time.sleep(RECONNECT_DURATION)
+        await self.__close_client()
+
+        logger.info(f"Trying to connect to OPC UA: opc.tcp://{self.host}:{self.port}")
+        client = asyncua.Client(url=f"opc.tcp://{self.host}:{self.port}")
+        await client.connect()
+        self._opcua_client = client
 
     def __load_opcua_nodes(self):
         """
         Loads all specified nodes with the currently active connection
         :return:
         """
-        if self._nodes is not None and len(self._nodes) > 0:
-            del self._nodes
-            self._nodes: List[asyncua.sync.SyncNode] = []
+        self._nodes = {
+            iri: self._opcua_client.get_node(timeseries_input.connection_topic)
+            for iri, timeseries_input in self.timeseries_inputs.items()
+        }
+
+        if len(self._nodes) < 1:
+            raise RuntimeError("Running OPCUA connection without nodes")
+
+        self._rebuild_node_index()
+
+    def _rebuild_node_index(self):
+        """
+        Prepares the node-id -> inputs index, the read request items and the sampling groups.
+        Replaced as a whole, so that the polling task always sees a consistent state.
+        """
+        node_index: Dict[str, List[OpcuaTimeseriesInput]] = dict()
+        node_intervals: Dict[str, int] = dict()
         timeseries_input: OpcuaTimeseriesInput
         for timeseries_input in self.timeseries_inputs.values():
-            self._nodes.append(
-                self._opcua_client.get_node(timeseries_input.connection_topic)
+            node_id = timeseries_input.connection_topic
+            node_index.setdefault(node_id, []).append(timeseries_input)
+            interval = (
+                timeseries_input.sampling_interval_ms
+                if timeseries_input.sampling_interval_ms is not None
+                else self.sampling_rate
+            )
+            # Multiple inputs for the same node: use the fastest one
+            node_intervals[node_id] = min(
+                interval, node_intervals.get(node_id, interval)
             )
 
-        if len(self._nodes) < 1:
-            raise RuntimeError("Running OPCUA connection without nodes")
+        read_value_ids: Dict[str, ua.ReadValueId] = dict()
+        for node_id in node_index.keys():
+            read_value_id = ua.ReadValueId()
+            read_value_id.NodeId = ua.NodeId.from_string(node_id)
+            read_value_id.AttributeId = ua.AttributeIds.Value
+            read_value_ids[node_id] = read_value_id
+
+        nodes_per_interval: Dict[int, List[str]] = dict()
+        for node_id, interval in node_intervals.items():
+            nodes_per_interval.setdefault(interval, []).append(node_id)
+
+        self._node_index = node_index
+        self._read_value_ids = read_value_ids
+        self._nodes_per_interval = nodes_per_interval
+        self._schedule_changed = True
+
+    async def __create_data_change_subscription(self):
+        """
+        (Re-)creates the subscription with one monitored item per node. Each item is sampled by the server
+        with the sampling interval of its node and queues the changes until the next publishing, so that fast
+        changes are not lost.
+        """
+        if self._subscription is not None:
+            await self._subscription.delete()
+            self._subscription = None
+
+        publishing_interval = self.sampling_rate
+        subscription = await self._opcua_client.create_subscription(
+            publishing_interval, handler=self
+        )
+
+        monitored_item_index: Dict[int, str] = dict()
+        requests: List[ua.MonitoredItemCreateRequest] = []
+        client_handle = 0
+        for interval, node_ids in self._nodes_per_interval.items():
+            queue_size = min(
+                SUBSCRIPTION_MAX_QUEUE_SIZE,
+                math.ceil(publishing_interval / interval)
+                * SUBSCRIPTION_QUEUE_SIZE_FACTOR,
+            )
+            for node_id in node_ids:
+                client_handle += 1
+
+                parameters = ua.MonitoringParameters()
+                parameters.ClientHandle = client_handle
+                parameters.SamplingInterval = interval
+                parameters.QueueSize = queue_size
+                parameters.DiscardOldest = True
+
+                request = ua.MonitoredItemCreateRequest()
+                request.ItemToMonitor = self._read_value_ids[node_id]
+                request.MonitoringMode = ua.MonitoringMode.Reporting
+                request.RequestedParameters = parameters
+
+                requests.append(request)
+                monitored_item_index[client_handle] = node_id
+
+        # Index before creating, as notifications might arrive before the creation returns
+        self._monitored_item_index = monitored_item_index
+
+        for i in range(0, len(requests), MAX_NODES_PER_READ):
+            results = await subscription.create_monitored_items(
+                requests[i : i + MAX_NODES_PER_READ]
+            )
+            for request, result in zip(requests[i : i + MAX_NODES_PER_READ], results):
+                if isinstance(result, ua.StatusCode):
+                    logger.info(
+                        f"OPCUA: could not monitor node {monitored_item_index.get(request.RequestedParameters.ClientHandle)}: "
+                        f"{result}"
+                    )
+
+        self._subscription = subscription
+
+    async def _polling_scheduler_loop(self):
+        """
+        Deadline-ordered scheduler: a heap holds the next sampling time for every sampling interval.
+        All intervals due at the same tick are read together with one bulk read request.
+        """
+        # (next deadline, interval in ms)
+        schedule = []
+        while self.thread_stop == False:
+            now = time.monotonic()
+
+            if self._schedule_changed:
+                self._schedule_changed = False
+                schedule = [(now, interval) for interval in self._nodes_per_interval]
+                heapq.heapify(schedule)
+
+            if len(schedule) == 0:
+                await asyncio.sleep(SCHEDULER_MAX_SLEEP)
+                continue
+
+            next_deadline = schedule[0][0]
+            if next_deadline > now + SCHEDULER_TICK_TOLERANCE:
+                await asyncio.sleep(min(next_deadline - now, SCHEDULER_MAX_SLEEP))
+                continue
+
+            due = []
+            while (
+                len(schedule) > 0 and schedule[0][0] <= now + SCHEDULER_TICK_TOLERANCE
+            ):
+                due.append(heapq.heappop(schedule))
+
+            nodes_per_interval = self._nodes_per_interval
+            node_ids = []
+            for deadline, interval in due:
+                node_ids.extend(nodes_per_interval.get(interval, []))
+                # Skip missed ticks instead of catching up, if reading took too long
+                heapq.heappush(
+                    schedule, (max(deadline + interval / 1000, now), interval)
+                )
+
+            await self._read_nodes(node_ids)
+
+    async def _read_nodes(self, node_ids: List[str]):
+        """
+        Reads the values of the given nodes with one read service call (per chunk of nodes) and hands them over to
+        the related inputs. The returned DataValue contains both the value and the source timestamp.
+        """
+        read_value_ids = self._read_value_ids
+        for i in range(0, len(node_ids), MAX_NODES_PER_READ):
+            chunk = [
+                node_id
+                for node_id in node_ids[i : i + MAX_NODES_PER_READ]
+                if node_id in read_value_ids
+            ]
+            if len(chunk) == 0:
+                continue
+            params = ua.ReadParameters()
+            params.NodesToRead = [read_value_ids[node_id] for node_id in chunk]
+
+            data_values: List[ua.DataValue] = await self._opcua_client.uaclient.read(
+                params
+            )
+
+            self.active = True
+            self.metrics.messages_received += len(data_values)
+
+            for node_id, data_value in zip(chunk, data_values):
+                if not data_value.StatusCode.is_good():
+                    continue
+                timeseries_input: OpcuaTimeseriesInput
+                for timeseries_input in self._node_index.get(node_id, []):
+                    timeseries_input.handle_reading(
+                        reading_time=data_value.SourceTimestamp,
+                        reading_value=data_value.Value.Value,
+                    )
 
     def datachange_notification(self, node: asyncua.Node, val, data):
         """
@@ -228,23 +403,35 @@ class OpcuaRuntimeConnection(RuntimeConnection):
         Class instance with event methods (see `SubHandler` base class for details).
         """
         self.active = True
-        # Handle, if subscriptions are actually used (datachange-mode):
-        if ONLY_CHANGES:
-
-            timeseries_input: OpcuaTimeseriesInput
-            for timeseries_input in self.timeseries_inputs.values():
-                timeseries_input.handle_reading_if_belonging(
-                    node_id=str(node),
-                    reading_time=data.monitored_item.Value.SourceTimestamp,
-                    value=val,
-                )
+        self.metrics.messages_received += 1
 
-    def disconnect(self):
-        self._opcua_client.disconnect()
+        node_id = self._monitored_item_index.get(data.subscription_data.client_handle)
+        timeseries_input: OpcuaTimeseriesInput
+        for timeseries_input in self._node_index.get(node_id, []):
+            timeseries_input.handle_reading(
+                reading_time=data.monitored_item.Value.SourceTimestamp,
+                reading_value=val,
+            )
+
+    async def __disconnect(self):
         self.thread_stop = True
-        self.opcua_connector_thread.join()
-        self._asyncua_treadloop.stop()
+        if self._connection_task is not None:
+            self._connection_task.cancel()
+        await self.__close_client()
+
+    def disconnect(self):
+        self._event_loop.run(self.__disconnect())
 
     def add_ts_input(self, ts_input: TimeseriesInput):
         self.timeseries_inputs[ts_input.iri] = ts_input
-        self._nodes.append(self._opcua_client.get_node(ts_input.connection_topic))
+        # If not yet connected, the node is loaded together with the others when connecting
+        if self._opcua_client is not None:
+            self._nodes[ts_input.iri] = self._opcua_client.get_node(
+                ts_input.connection_topic
+            )
+        self._rebuild_node_index()
+
+    def remove_ts_input(self, iri: str):
+        super().remove_ts_input(iri)
+        self._nodes.pop(iri, None)
+        self._rebuild_node_index()
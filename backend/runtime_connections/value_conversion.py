@@ -0,0 +1,74 @@
+"""
+Converters from raw reading values (as delivered by the runtime connections) to the value type of a time series.
+Resolved once per timeseries input, so that handling a reading does not have to check the value type every time.
+"""
+from math import floor
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+TRUE_STRINGS = frozenset(["True", "true", "t"])
+
+
+def _to_int(value) -> int:
+    if type(value) is int:
+        return value
+    return floor(float(value))
+
+
+def _to_bool(value):
+    if value is True or value is False:
+        return value
+    elif isinstance(value, float):
+        return bool(value)
+    elif isinstance(value, str):
+        return value in TRUE_STRINGS
+    # Other types (e.g. int) are kept as they are
+    return value
+
+
+def _identity(value):
+    return value
+
+
+VALUE_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    TimeseriesValueTypes.STRING.value: str,
+    TimeseriesValueTypes.DECIMAL.value: float,
+    TimeseriesValueTypes.INT.value: _to_int,
+    TimeseriesValueTypes.BOOL.value: _to_bool,
+}
+
+
+def get_value_converter(value_type: str) -> Callable[[Any], Any]:
+    """
+    :param value_type: one of TimeseriesValueTypes
+    :return: function converting one raw value to the value type. Unknown types are kept as they are
+    """
+    return VALUE_CONVERTERS.get(value_type, _identity)
+
+
+def _convert_decimals(values: Sequence) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def _convert_ints(values: Sequence) -> np.ndarray:
+    return np.floor(np.asarray(values, dtype=np.float64)).astype(np.int64)
+
+
+def get_batch_value_converter(
+    value_type: str,
+) -> Callable[[Sequence], np.ndarray | List]:
+    """
+    :param value_type: one of TimeseriesValueTypes
+    :return: function converting a list / array of raw values at once. Numeric types are converted vectorized to a
+    numpy array, the other ones to a list
+    """
+    if value_type == TimeseriesValueTypes.DECIMAL.value:
+        return _convert_decimals
+    elif value_type == TimeseriesValueTypes.INT.value:
+        return _convert_ints
+
+    converter = get_value_converter(value_type)
+    return lambda values: list(map(converter, values))
@@ -1,10 +1,38 @@
 import abc
+import os
 from datetime import datetime
+from typing import Dict, List, Tuple
 import pandas as pd
 
 from backend.specialized_databases.SpecializedDatabasePersistenceService import (
     SpecializedDatabasePersistenceService,
 )
+from backend.specialized_databases.timeseries.downsampling import (
+    DownsamplingMethods,
+)
+from backend.specialized_databases.timeseries.TimeseriesRollupAggregator import (
+    RollupRecord,
+    TimeseriesRollupAggregator,
+)
+from backend.specialized_databases.timeseries.TimeseriesRunningStatistics import (
+    RunningStatistics,
+    TimeseriesStatisticsTracker,
+)
+from backend.specialized_databases.timeseries.TimeseriesWriteBuffer import (
+    TimeseriesRecord,
+    TimeseriesWriteBuffer,
+)
+from backend.specialized_databases.timeseries.TimeseriesWriteSpool import (
+    TimeseriesWriteSpool,
+)
+from graph_domain.main_digital_twin.DatabaseConnectionNode import DatabaseConnectionNode
+from util.environment_and_configuration import (
+    ConfigGroups,
+    get_configuration,
+    get_configuration_int,
+)
+from util.file_name_utils import _replace_illegal_characters_from_iri
+from util.log import logger
 
 
 class TimeseriesPersistenceService(SpecializedDatabasePersistenceService):
@@ -12,6 +40,66 @@ class TimeseriesPersistenceService(SpecializedDatabasePersistenceService):
     Persistence service for timeseries data
     """
 
+    def __init__(
+        self,
+        write_batch_size: int | None = None,
+        write_flush_interval_ms: int | None = None,
+        write_queue_size: int | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+
+        # Readings that could not be written are buffered on disk and replayed later
+        self._write_spool = TimeseriesWriteSpool(
+            directory=os.path.join(
+                get_configuration(
+                    group=ConfigGroups.API, key="timeseries_spool_directory"
+                ),
+                _replace_illegal_characters_from_iri(self.iri),
+            ),
+            segment_size_bytes=get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_spool_segment_size_kb"
+            )
+            * 1024,
+            max_size_bytes=get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_spool_max_size_mb"
+            )
+            * 1024
+            * 1024,
+        )
+
+        self._write_buffer = TimeseriesWriteBuffer(
+            name=self.iri,
+            write_function=self.write_measurements,
+            batch_size=write_batch_size,
+            flush_interval_ms=write_flush_interval_ms,
+            queue_size=write_queue_size,
+            spool=self._write_spool,
+        )
+
+        # Pre-aggregated buckets (rollups) for reading coarse windows
+        self._rollup_aggregator = TimeseriesRollupAggregator(
+            name=self.iri, write_function=self.write_rollups
+        )
+
+        # Running statistics (count, mean, variance, min, max...) per series
+        self._statistics_tracker = TimeseriesStatisticsTracker(service=self)
+
+    @classmethod
+    def from_db_connection_node(cls, node: DatabaseConnectionNode):
+        return cls(
+            iri=node.iri,
+            database=node.database,
+            group=node.group,
+            host_environment_variable=node.host_environment_variable,
+            port_environment_variable=node.port_environment_variable,
+            user_environment_variable=node.user_environment_variable,
+            key_environment_variable=node.key_environment_variable,
+            write_batch_size=node.write_batch_size,
+            write_flush_interval_ms=node.write_flush_interval_ms,
+            write_queue_size=node.write_queue_size,
+        )
+
     @abc.abstractmethod
     def write_measurement(
         self, iri: str, value: float | bool | str, reading_time: datetime = None
@@ -27,6 +115,135 @@ class TimeseriesPersistenceService(SpecializedDatabasePersistenceService):
         """
         pass
 
+    @abc.abstractmethod
+    def write_measurements(self, records: List[TimeseriesRecord]):
+        """
+        Writes multiple readings with one request.
+        :param records: List of (iri, value, reading_time) tuples
+        :return:
+        :raise Exception: if the readings could not be written
+        """
+        pass
+
+    def write_measurement_buffered(
+        self, iri: str, value: float | bool | str, reading_time: datetime = None
+    ):
+        """
+        Adds the reading to the write buffer, from which it is written asynchronously in batches.
+        Intended as handler for timeseries inputs instead of the synchronous `write_measurement`.
+        :param id_uri:
+        :param value:
+        :param reading_time:
+        :return:
+        """
+        self._write_buffer.put(iri, value, reading_time)
+
+    @abc.abstractmethod
+    def write_rollups(self, records: List[RollupRecord]):
+        """
+        Writes closed rollup buckets. Stored separately from the raw readings.
+        :param records:
+        :return:
+        :raise Exception: if the rollups could not be written
+        """
+        pass
+
+    def aggregate_rollups(self, iri: str, value: float | int, reading_time: datetime):
+        """
+        Adds the reading to the rollup buckets of the series, which are written asynchronously when closed.
+        Intended as handler for numeric timeseries inputs, receiving all readings (not only the compressed ones).
+        :param iri:
+        :param value:
+        :param reading_time:
+        :return:
+        """
+        self._rollup_aggregator.put(iri, value, reading_time)
+
+    def get_rollup_statistics(self) -> Dict[str, int]:
+        """
+        :return: Counters of the rollup aggregation (aggregated, late, written and dropped...)
+        """
+        return self._rollup_aggregator.get_statistics()
+
+    @abc.abstractmethod
+    def write_statistics(self, statistics: Dict[str, RunningStatistics]):
+        """
+        Persists the running statistics of the given series, replacing former ones.
+        :param statistics: iri -> statistics
+        :return:
+        :raise Exception: if the statistics could not be written
+        """
+        pass
+
+    @abc.abstractmethod
+    def read_statistics(self, iris: List[str]) -> Dict[str, RunningStatistics]:
+        """
+        Reads the persisted running statistics.
+        :param iris:
+        :return: iri -> statistics (only for the series with persisted statistics)
+        :raise Exception: if the statistics could not be read
+        """
+        pass
+
+    @abc.abstractmethod
+    def compute_statistics_for_period(
+        self, iri: str, begin_time: datetime | None, end_time: datetime | None
+    ) -> RunningStatistics:
+        """
+        Computes the statistics from the stored readings (scanning the whole period).
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :return: the statistics (count 0, if there are no readings)
+        :raise Exception: if the readings could not be read
+        """
+        pass
+
+    def track_statistics(self, iri: str, value: float | int, reading_time: datetime):
+        """
+        Updates the running statistics of the series, which are persisted periodically.
+        Intended as handler for numeric timeseries inputs, receiving all readings (not only the compressed ones).
+        :param iri:
+        :param value:
+        :param reading_time:
+        :return:
+        """
+        self._statistics_tracker.put(iri, value, reading_time)
+
+    def get_statistics(self, iri: str) -> RunningStatistics | None:
+        """
+        Running statistics of the series without scanning its history: current ones, if tracked by this process,
+        persisted ones otherwise. Only falls back to computing them from the history, if none were persisted yet.
+        :param iri:
+        :return: the statistics. None, if not available (e.g. non-numeric series or database not available)
+        """
+        statistics = self._statistics_tracker.get(iri)
+        if statistics is not None:
+            return statistics
+
+        # pylint: disable=W0703
+        try:
+            statistics = self.read_statistics([iri]).get(iri)
+            if statistics is None:
+                statistics = self.compute_statistics_for_period(iri, None, None)
+        except Exception as exc:
+            logger.info(f"Time-series statistics not available for {iri}: {exc}")
+            return None
+
+        return statistics if statistics.count > 0 else None
+
+    def get_write_statistics(self) -> Dict[str, int]:
+        """
+        :return: Counters of the write buffer and spool (queue depth, written, spooled and dropped readings...)
+        """
+        return self._write_buffer.get_statistics()
+
+    def get_write_latency(self) -> Dict:
+        """
+        :return: Histogram snapshot of the batch write durations (in s)
+        """
+        return self._write_buffer.get_write_latency()
+
     @abc.abstractmethod
     def read_period_to_dataframe(
         self,
@@ -34,17 +251,83 @@ class TimeseriesPersistenceService(SpecializedDatabasePersistenceService):
         begin_time: datetime,
         end_time: datetime,
         aggregation_window_ms: int | None = None,
+        max_points: int | None = None,
+        downsampling: str = DownsamplingMethods.LTTB.value,
     ) -> pd.DataFrame:
         """
         Reads all measurements from the sensor with the given ID in the time period
         :param id_uri:
         :param begin_time:
         :param end_time:
+        :param aggregation_window_ms: if given, only the first reading per window. Served from the rollups where
+        available, if the window is a multiple of a rollup resolution
+        :param max_points: if given, the readings are downsampled to at most that many points (preserving peaks).
+        Takes precedence over aggregation_window_ms
+        :param downsampling: method used with max_points (see DownsamplingMethods)
         :return: Dataframe containing all measurements in that period
         :raise IdNotFoundException: if the id_uri is not found
         """
         pass
 
+    @abc.abstractmethod
+    def read_many_periods_to_dataframes(
+        self,
+        iris: List[str],
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int | None = None,
+    ) -> Dict[str, pd.DataFrame] | None:
+        """
+        Reads the measurements of multiple sensors in the time period at once (instead of one query per sensor)
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :param aggregation_window_ms: if given, only the first reading per window
+        :return: iri -> Dataframe containing all measurements in that period (empty, if there are none). None, if
+        the database is not available
+        """
+        pass
+
+    @abc.abstractmethod
+    def count_many_entries_for_period(
+        self,
+        iris: List[str],
+        begin_time: datetime | None,
+        end_time: datetime | None,
+    ) -> Dict[str, int] | None:
+        """
+        Counts the measurement entries of multiple sensors in the time period at once (instead of one query per
+        sensor)
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :return: iri -> number of entries (0, if there are none). None, if the database is not available
+        """
+        pass
+
+    @abc.abstractmethod
+    def read_period_adaptive(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        max_points: int,
+        downsampling: str = DownsamplingMethods.LTTB.value,
+    ) -> Tuple[pd.DataFrame, int] | None:
+        """
+        Reads the measurements in the time period at a resolution of at most max_points, together with the number
+        of readings in the period (without a separate counting pass)
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :param max_points:
+        :param downsampling: method used, if there are more readings than max_points (see DownsamplingMethods)
+        :return: the dataframe (all readings, if not more than max_points) and the number of readings. None, if
+        the database is not available
+        :raise IdNotFoundException: if the id_uri is not found
+        """
+        pass
+
     @abc.abstractmethod
     def count_entries_for_period(
         self, iri: str, begin_time: datetime, end_time: datetime
@@ -0,0 +1,435 @@
+import hashlib
+import math
+import struct
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable, Tuple
+
+import pandas as pd
+
+from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
+    TimeseriesPersistenceService,
+)
+from backend.specialized_databases.timeseries.range_cache_invalidation import (
+    get_generation,
+    get_oldest_spooled_reading,
+)
+from util.inter_process_cache import memcache
+from util.log import logger
+from util.timeseries_wire_format import decode_dataframe, encode_dataframe
+
+# Ranges ending that long before now are considered immutable (in s), unless older readings are still pending in
+# a write spool (see range_cache_invalidation). Readings arriving even later (e.g. MQTT messages with old
+# timestamps) are only visible after the cached entries expired
+IMMUTABLE_DELAY = 300
+# Cached entries are used at most that long after being cached by a process (in s)
+CACHE_ENTRY_EXPIRE = 15 * 60
+# Max. size of the cached payloads per process (in bytes)
+LOCAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Payloads up to that size are shared with the other processes (memcached items are limited to 1 MB)
+SHARED_ENTRY_MAX_BYTES = 900 * 1024
+KEY_PREFIX = "ts_range_"
+# Integer values beyond that can not be cached exactly (stored as float64)
+MAX_EXACT_INTEGER = 2**53
+
+# Ranges touching now are split into blocks aligned to the epoch: everything before the last immutable block
+# boundary is cached, only the tail is queried. The block duration is the smallest one resulting in at most
+# BLOCKS_PER_RANGE blocks, so that the keys stay the same while the range moves with the current time.
+BLOCKS_PER_RANGE = 20
+BLOCK_DURATIONS_MS = (
+    1000,
+    10 * 1000,
+    60 * 1000,
+    10 * 60 * 1000,
+    60 * 60 * 1000,
+    6 * 60 * 60 * 1000,
+    24 * 60 * 60 * 1000,
+    7 * 24 * 60 * 60 * 1000,
+    30 * 24 * 60 * 60 * 1000,
+)
+
+_COUNT_HEADER = struct.Struct("<q")
+# NumPy type string of the values (e.g. "<i8"), restored when decoding
+_DTYPE_HEADER = struct.Struct("<3s")
+
+
+def _get_block_duration_ms(duration_ms: int, aggregation_window_ms: int | None) -> int:
+    target = duration_ms / BLOCKS_PER_RANGE
+    block_ms = next(
+        (block for block in BLOCK_DURATIONS_MS if block >= target),
+        BLOCK_DURATIONS_MS[-1],
+    )
+    if aggregation_window_ms:
+        # Windows must not be split by the block boundaries
+        block_ms = math.ceil(block_ms / aggregation_window_ms) * aggregation_window_ms
+    return block_ms
+
+
+def _to_epoch_ms(date_time: datetime) -> int:
+    # Naive datetimes are local time (as in the database queries)
+    return math.floor(date_time.timestamp() * 1000)
+
+
+def _from_epoch_ms(epoch_ms: int) -> datetime:
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+
+
+def _get_range_key(
+    generation: str, iri: str, begin_ms: int, end_ms: int, aggregation: str | None
+) -> str:
+    return f"{generation}|{iri}|{begin_ms}|{end_ms}|{aggregation}"
+
+
+def _get_shared_key(key: str) -> str:
+    # Memcache keys are limited to 250 characters without whitespace, IRIs are not
+    return KEY_PREFIX + hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def _encode(df: pd.DataFrame) -> bytes | None:
+    """
+    :return: the readings in the binary time-series format, preceded by the type of the values. None, if they
+    can not be cached exactly
+    """
+    values = df["value"]
+    if (
+        len(df) > 0
+        and values.dtype.kind in "iu"
+        and values.abs().max() > MAX_EXACT_INTEGER
+    ):
+        return None
+    encoded = encode_dataframe(df)
+    if encoded is None:
+        return None
+    return _DTYPE_HEADER.pack(values.dtype.str.encode()) + encoded
+
+
+def _decode(payload: bytes) -> pd.DataFrame:
+    (dtype,) = _DTYPE_HEADER.unpack_from(payload)
+    df = decode_dataframe(payload[_DTYPE_HEADER.size :])
+    df["value"] = df["value"].astype(dtype.rstrip(b"\0").decode())
+    return df
+
+
+class TimeseriesRangeCache:
+    """
+    Caches query results of immutable (historic) ranges, keyed on the iri, the range and the aggregation.
+    Payloads are stored in the binary time-series format (epoch and values as NumPy arrays) in a byte-size bounded
+    LRU per process. Payloads up to SHARED_ENTRY_MAX_BYTES are additionally shared with the other processes (e.g.
+    API workers) via the inter-process cache.
+    Only numeric time-series are cached.
+    Entries expire after CACHE_ENTRY_EXPIRE. The keys contain the current generation, so that all entries are
+    invalidated at once when historic readings changed (see range_cache_invalidation).
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        TimeseriesRangeCache.__instance = self
+
+        # key -> (payload, time cached (monotonic))
+        self._entries: OrderedDict[str, Tuple[bytes, float]] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self._shared_failing = False
+
+    def _get_cache_state(
+        self, ts_service: TimeseriesPersistenceService
+    ) -> Tuple[str, float] | None:
+        """
+        :return: the current generation and the time (epoch in s) until which ranges are immutable. None, if that
+        can not be decided (inter-process cache not available)
+        """
+        # pylint: disable=W0703
+        try:
+            generation = get_generation()
+            oldest_spooled = get_oldest_spooled_reading(ts_service.iri)
+        except Exception as exc:
+            if not self._shared_failing:
+                logger.info(
+                    f"Reading from the shared time-series range cache failed: {exc}"
+                )
+            self._shared_failing = True
+            return None
+
+        immutable_until = time.time() - IMMUTABLE_DELAY
+        if oldest_spooled is not None:
+            immutable_until = min(immutable_until, oldest_spooled)
+        return generation, immutable_until
+
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, cached_at = entry
+                if time.monotonic() - cached_at < CACHE_ENTRY_EXPIRE:
+                    self._entries.move_to_end(key)
+                    return payload
+                self._entries.pop(key)
+                self._size -= len(payload)
+                return None
+
+        payload = None
+        # pylint: disable=W0703
+        try:
+            payload = memcache.get(_get_shared_key(key))
+            self._shared_failing = False
+        except Exception as exc:
+            if not self._shared_failing:
+                logger.info(
+                    f"Reading from the shared time-series range cache failed: {exc}"
+                )
+            self._shared_failing = True
+
+        if payload is not None:
+            self._put_local(key, payload)
+        return payload
+
+    def _put_local(self, key: str, payload: bytes):
+        if len(payload) > LOCAL_CACHE_MAX_BYTES:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[0])
+            self._entries[key] = payload, time.monotonic()
+            self._size += len(payload)
+            # Least recently used first
+            while self._size > LOCAL_CACHE_MAX_BYTES:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _put(self, key: str, payload: bytes):
+        self._put_local(key, payload)
+        if len(payload) > SHARED_ENTRY_MAX_BYTES:
+            return
+        # pylint: disable=W0703
+        try:
+            memcache.set(_get_shared_key(key), payload, expire=CACHE_ENTRY_EXPIRE)
+        except Exception as exc:
+            if not self._shared_failing:
+                logger.info(
+                    f"Writing to the shared time-series range cache failed: {exc}"
+                )
+            self._shared_failing = True
+
+    def _get_or_read_dataframe(
+        self, key: str, read_function: Callable[[], pd.DataFrame | None]
+    ) -> pd.DataFrame | None:
+        """
+        :param key: including the generation
+        """
+        payload = self._get(key)
+        if payload is not None:
+            return _decode(payload)
+
+        df = read_function()
+        if df is not None:
+            payload = _encode(df)
+            if payload is not None:
+                self._put(key, payload)
+        return df
+
+    def read_period(
+        self,
+        ts_service: TimeseriesPersistenceService,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int | None = None,
+    ) -> pd.DataFrame | None:
+        """
+        Reads the period (see read_period_to_dataframe), taking the part before the last immutable block boundary
+        from the cache. Only the remaining tail is queried.
+        With aggregation, windows are aligned to the epoch and labeled with their stop: the leading window is
+        only partially covered by an unaligned period and therefore always queried.
+        Unbounded periods are not cached.
+        :return: the readings. None, if the database is not available
+        """
+
+        def read_uncached():
+            return ts_service.read_period_to_dataframe(
+                iri=iri,
+                begin_time=begin_time,
+                end_time=end_time,
+                aggregation_window_ms=aggregation_window_ms,
+            )
+
+        if begin_time is None or end_time is None:
+            return read_uncached()
+        cache_state = self._get_cache_state(ts_service)
+        if cache_state is None:
+            return read_uncached()
+        generation, immutable_until = cache_state
+
+        begin_ms = _to_epoch_ms(begin_time)
+        end_ms = _to_epoch_ms(end_time)
+        block_ms = _get_block_duration_ms(end_ms - begin_ms, aggregation_window_ms)
+        head_start_ms = begin_ms // block_ms * block_ms
+        head_stop_ms = min(
+            math.floor(immutable_until * 1000) // block_ms * block_ms,
+            end_ms // block_ms * block_ms,
+        )
+        # Begin of the first window completely within the period
+        first_window_ms = (
+            -(-begin_ms // aggregation_window_ms) * aggregation_window_ms
+            if aggregation_window_ms
+            else begin_ms
+        )
+        if head_stop_ms <= max(head_start_ms, first_window_ms):
+            return read_uncached()
+
+        head_df = self._get_or_read_dataframe(
+            key=_get_range_key(
+                generation, iri, head_start_ms, head_stop_ms, aggregation_window_ms
+            ),
+            read_function=lambda: ts_service.read_period_to_dataframe(
+                iri=iri,
+                begin_time=_from_epoch_ms(head_start_ms),
+                end_time=_from_epoch_ms(head_stop_ms),
+                aggregation_window_ms=aggregation_window_ms,
+            ),
+        )
+        if head_df is None:
+            return None
+        if head_df.empty:
+            head_df = pd.DataFrame({"time": [], "value": []})
+        else:
+            # Aligned to the block: trim to the requested begin (to the windows starting at or after it)
+            head_df["time"] = pd.to_datetime(head_df["time"], utc=True)
+            if aggregation_window_ms:
+                head_df = head_df[
+                    head_df["time"]
+                    > pd.Timestamp(first_window_ms, unit="ms", tz="UTC")
+                ]
+            else:
+                head_df = head_df[
+                    head_df["time"] >= pd.Timestamp(begin_ms, unit="ms", tz="UTC")
+                ]
+
+        dfs = [head_df]
+        if first_window_ms > begin_ms:
+            leading_df = ts_service.read_period_to_dataframe(
+                iri=iri,
+                begin_time=begin_time,
+                end_time=_from_epoch_ms(first_window_ms),
+                aggregation_window_ms=aggregation_window_ms,
+            )
+            if leading_df is None:
+                return None
+            dfs.insert(0, leading_df)
+
+        if head_stop_ms < end_ms:
+            tail_df = ts_service.read_period_to_dataframe(
+                iri=iri,
+                begin_time=_from_epoch_ms(head_stop_ms),
+                end_time=end_time,
+                aggregation_window_ms=aggregation_window_ms,
+            )
+            if tail_df is None:
+                return None
+            dfs.append(tail_df)
+
+        dfs = [df for df in dfs if not df.empty]
+        if len(dfs) == 0:
+            return head_df.reset_index(drop=True)
+        for df in dfs:
+            df["time"] = pd.to_datetime(df["time"], utc=True)
+        return pd.concat(dfs, ignore_index=True)
+
+    def read_downsampled(
+        self,
+        ts_service: TimeseriesPersistenceService,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        max_points: int,
+        downsampling: str,
+    ) -> pd.DataFrame | None:
+        """
+        Reads the period downsampled to max_points (see read_period_to_dataframe). Cached, if the period is
+        immutable (downsampled results can not be combined from parts)
+        :return: the readings. None, if the database is not available
+        """
+
+        def read_function():
+            return ts_service.read_period_to_dataframe(
+                iri=iri,
+                begin_time=begin_time,
+                end_time=end_time,
+                max_points=max_points,
+                downsampling=downsampling,
+            )
+
+        if begin_time is None or end_time is None:
+            return read_function()
+        cache_state = self._get_cache_state(ts_service)
+        if cache_state is None or end_time.timestamp() >= cache_state[1]:
+            return read_function()
+
+        return self._get_or_read_dataframe(
+            key=_get_range_key(
+                cache_state[0],
+                iri,
+                _to_epoch_ms(begin_time),
+                _to_epoch_ms(end_time),
+                f"{downsampling}_{max_points}",
+            ),
+            read_function=read_function,
+        )
+
+    def read_adaptive(
+        self,
+        ts_service: TimeseriesPersistenceService,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        max_points: int,
+        downsampling: str,
+    ) -> Tuple[pd.DataFrame, int] | None:
+        """
+        Reads the period at a resolution of at most max_points together with the number of readings (see
+        read_period_adaptive). Cached, if the period is immutable
+        :return: the readings and their count. None, if the database is not available
+        """
+        if begin_time is None or end_time is None:
+            return ts_service.read_period_adaptive(
+                iri, begin_time, end_time, max_points, downsampling
+            )
+        cache_state = self._get_cache_state(ts_service)
+        if cache_state is None or end_time.timestamp() >= cache_state[1]:
+            return ts_service.read_period_adaptive(
+                iri, begin_time, end_time, max_points, downsampling
+            )
+
+        key = _get_range_key(
+            cache_state[0],
+            iri,
+            _to_epoch_ms(begin_time),
+            _to_epoch_ms(end_time),
+            f"adaptive_{downsampling}_{max_points}",
+        )
+        payload = self._get(key)
+        if payload is not None:
+            (count,) = _COUNT_HEADER.unpack_from(payload)
+            return _decode(payload[_COUNT_HEADER.size :]), count
+
+        result = ts_service.read_period_adaptive(
+            iri, begin_time, end_time, max_points, downsampling
+        )
+        if result is not None:
+            df, count = result
+            encoded = _encode(df)
+            if encoded is not None:
+                self._put(key, _COUNT_HEADER.pack(count) + encoded)
+        return result
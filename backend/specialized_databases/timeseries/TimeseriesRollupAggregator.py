@@ -0,0 +1,252 @@
+import time
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import Callable, Dict, List, NamedTuple
+
+from util.log import logger
+
+# Resolutions of the pre-aggregated buckets (in s)
+ROLLUP_RESOLUTIONS = (1, 60, 3600)
+
+# Interval for writing the closed buckets (in s)
+ROLLUP_FLUSH_INTERVAL = 1
+# Buckets of series that stopped delivering are closed that long after their end (in s).
+# Tolerates source clocks being slightly ahead of ours and late readings
+ROLLUP_CLOSE_DELAY = 5
+# Max. closed buckets waiting to be written (e.g. while the database is not available)
+MAX_PENDING_ROLLUPS = 200000
+
+
+class RollupRecord(NamedTuple):
+    """
+    Aggregated readings of one series in one bucket [start, start + resolution)
+    """
+
+    iri: str
+    resolution: int  # (in s)
+    start: int  # epoch (in s)
+    min: float
+    max: float
+    mean: float
+    count: int
+    first: float
+    last: float
+    # The bucket might miss readings: it is the first one of the series aggregated by this process (e.g. after a
+    # restart or after the series moved to another ingestion shard)
+    partial: bool = False
+
+
+class _Bucket:
+    __slots__ = ["start", "min", "max", "sum", "count", "first", "last", "partial"]
+
+    def __init__(self, start: int, value: float, partial: bool = False):
+        self.start = start
+        self.partial = partial
+        self.min = value
+        self.max = value
+        self.sum = value
+        self.count = 1
+        self.first = value
+        self.last = value
+
+    def add(self, value: float):
+        if value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.sum += value
+        self.count += 1
+        self.last = value
+
+    def to_record(self, iri: str, resolution: int) -> RollupRecord:
+        return RollupRecord(
+            iri=iri,
+            resolution=resolution,
+            start=self.start,
+            min=self.min,
+            max=self.max,
+            mean=self.sum / self.count,
+            count=self.count,
+            first=self.first,
+            last=self.last,
+            partial=self.partial,
+        )
+
+
+class _SeriesRollups:
+    __slots__ = ["buckets", "closed_until"]
+
+    def __init__(self):
+        # One open bucket per resolution (None before the first reading)
+        self.buckets: List[_Bucket | None] = [None] * len(ROLLUP_RESOLUTIONS)
+        # Readings before the end of the last closed bucket are ignored, as that bucket is already written
+        self.closed_until: List[int] = [0] * len(ROLLUP_RESOLUTIONS)
+
+
+def get_rollup_resolution(aggregation_window_ms: int) -> int | None:
+    """
+    :return: the coarsest rollup resolution (in s) the window can be composed of. None, if there is none
+    """
+    for resolution in reversed(ROLLUP_RESOLUTIONS):
+        if aggregation_window_ms % (resolution * 1000) == 0:
+            return resolution
+    return None
+
+
+def get_epoch_seconds(reading_time: datetime) -> float:
+    if reading_time.tzinfo is None:
+        # Naive reading times are UTC (e.g. OPC UA source timestamps)
+        reading_time = reading_time.replace(tzinfo=timezone.utc)
+    return reading_time.timestamp()
+
+
+class TimeseriesRollupAggregator:
+    """
+    Streaming aggregation of numeric readings into per-series buckets of multiple resolutions (min, max, mean,
+    count, first, last), so that coarse windows can be read from pre-aggregated data instead of the raw readings.
+    A bucket is closed, as soon as a reading of a later bucket arrives or its end is ROLLUP_CLOSE_DELAY in the
+    past. Closed buckets are handed over to the write function in batches.
+    Late readings belonging to already closed buckets are not aggregated (at any resolution).
+    The first bucket of every series and resolution is marked as partial, as the readings before the start of the
+    aggregation (e.g. aggregated by a previous process, whose open buckets are lost) are missing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write_function: Callable[[List[RollupRecord]], None],
+    ) -> None:
+        self.name = name
+        self._write_function = write_function
+
+        self._series: Dict[str, _SeriesRollups] = dict()
+        self._closed: List[RollupRecord] = []
+        self._lock = Lock()
+        self._flush_thread: Thread | None = None
+        self._thread_lock = Lock()
+        self._write_failing = False
+
+        # Statistics
+        self.aggregated_count = 0
+        self.late_count = 0
+        self.written_count = 0
+        self.dropped_count = 0
+
+    def _start_flush_thread(self):
+        with self._thread_lock:
+            if self._flush_thread is None:
+                self._flush_thread = Thread(target=self._flush_loop, daemon=True)
+                self._flush_thread.start()
+
+    def put(self, iri: str, value: float | int, reading_time: datetime):
+        """
+        Aggregates a reading. Can be directly registered as handler at a (numeric) timeseries input.
+        :param iri:
+        :param value:
+        :param reading_time:
+        :return:
+        """
+        # Lazy start, so that processes only reading from the database do not start any threads
+        if self._flush_thread is None:
+            self._start_flush_thread()
+
+        if value is None or reading_time is None:
+            return
+        epoch_seconds = get_epoch_seconds(reading_time)
+
+        with self._lock:
+            series = self._series.get(iri)
+            if series is None:
+                series = _SeriesRollups()
+                self._series[iri] = series
+
+            starts = [
+                int(epoch_seconds // resolution) * resolution
+                for resolution in ROLLUP_RESOLUTIONS
+            ]
+            # Decided once for all resolutions, so that the buckets of all resolutions contain the same readings
+            for i, start in enumerate(starts):
+                bucket = series.buckets[i]
+                if start < series.closed_until[i] or (
+                    bucket is not None and start < bucket.start
+                ):
+                    self.late_count += 1
+                    return
+
+            for i, resolution in enumerate(ROLLUP_RESOLUTIONS):
+                bucket = series.buckets[i]
+                if bucket is not None and bucket.start == starts[i]:
+                    bucket.add(value)
+                    continue
+                # First bucket of the series
+                partial = bucket is None and series.closed_until[i] == 0
+                if bucket is not None:
+                    self._closed.append(bucket.to_record(iri, resolution))
+                    series.closed_until[i] = bucket.start + resolution
+                series.buckets[i] = _Bucket(starts[i], value, partial)
+
+            self.aggregated_count += 1
+
+    def _close_expired_buckets(self):
+        """
+        Closes the buckets of series not delivering readings anymore
+        """
+        now = time.time()
+        with self._lock:
+            for iri, series in self._series.items():
+                for i, resolution in enumerate(ROLLUP_RESOLUTIONS):
+                    bucket = series.buckets[i]
+                    if (
+                        bucket is not None
+                        and bucket.start + resolution + ROLLUP_CLOSE_DELAY < now
+                    ):
+                        self._closed.append(bucket.to_record(iri, resolution))
+                        series.closed_until[i] = bucket.start + resolution
+                        series.buckets[i] = None
+
+    def flush(self):
+        """
+        Writes all closed buckets. Keeps them for the next flush, if writing failed
+        """
+        self._close_expired_buckets()
+        with self._lock:
+            records, self._closed = self._closed, []
+        if len(records) == 0:
+            return
+
+        # pylint: disable=W0703
+        try:
+            self._write_function(records)
+            self.written_count += len(records)
+            if self._write_failing:
+                logger.info(f"Writing rollups for {self.name} working again.")
+            self._write_failing = False
+        except Exception as exc:
+            if not self._write_failing:
+                logger.info(
+                    f"Writing rollups for {self.name} failed: {exc}. Retrying with the next flush."
+                )
+            self._write_failing = True
+            with self._lock:
+                self._closed = records + self._closed
+                overflow = len(self._closed) - MAX_PENDING_ROLLUPS
+                if overflow > 0:
+                    # Oldest first
+                    del self._closed[:overflow]
+                    self.dropped_count += overflow
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(ROLLUP_FLUSH_INTERVAL)
+            self.flush()
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "aggregated": self.aggregated_count,
+                "late": self.late_count,
+                "pending": len(self._closed),
+                "written": self.written_count,
+                "dropped": self.dropped_count,
+            }
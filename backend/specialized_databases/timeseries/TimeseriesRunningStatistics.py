@@ -0,0 +1,250 @@
+from __future__ import annotations
+import math
+import time
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Dict, List
+
+from backend.specialized_databases.timeseries.TimeseriesRollupAggregator import (
+    get_epoch_seconds,
+)
+from util.log import logger
+
+if TYPE_CHECKING:
+    from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
+        TimeseriesPersistenceService,
+    )
+
+# Interval for persisting the statistics of the series that received readings (in s)
+STATISTICS_PERSIST_INTERVAL = 10
+
+
+class RunningStatistics:
+    """
+    Online statistics of a series: count, mean and variance (Welford's algorithm), min, max and the time of the
+    last reading. Partial statistics (e.g. persisted ones and the ones collected since) can be merged.
+    """
+
+    __slots__ = ["count", "mean", "m2", "min", "max", "last_reading_time"]
+
+    def __init__(
+        self,
+        count: int = 0,
+        mean: float = 0.0,
+        m2: float = 0.0,
+        min: float | None = None,
+        max: float | None = None,
+        last_reading_time: float | None = None,
+    ) -> None:
+        self.count = count
+        self.mean = mean
+        # Sum of the squared differences from the mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+        # Epoch (in s)
+        self.last_reading_time = last_reading_time
+
+    def add(self, value: float, reading_time: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.last_reading_time is None or reading_time > self.last_reading_time:
+            self.last_reading_time = reading_time
+
+    def merge(self, other: RunningStatistics) -> RunningStatistics:
+        """
+        Combines the statistics of two disjoint sets of readings (Chan et al.)
+        :return: new statistics
+        """
+        if other.count == 0:
+            return self.copy()
+        if self.count == 0:
+            return other.copy()
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        return RunningStatistics(
+            count=count,
+            mean=self.mean + delta * other.count / count,
+            m2=self.m2 + other.m2 + delta * delta * self.count * other.count / count,
+            min=min(self.min, other.min),
+            max=max(self.max, other.max),
+            last_reading_time=max(self.last_reading_time, other.last_reading_time),
+        )
+
+    def copy(self) -> RunningStatistics:
+        return RunningStatistics(
+            count=self.count,
+            mean=self.mean,
+            m2=self.m2,
+            min=self.min,
+            max=self.max,
+            last_reading_time=self.last_reading_time,
+        )
+
+    @property
+    def variance(self) -> float | None:
+        """
+        Sample variance. None for less than two readings
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    def to_dict(self) -> Dict:
+        variance = self.variance
+        return {
+            "count": self.count,
+            "mean": self.mean if self.count > 0 else None,
+            "variance": variance,
+            "std": math.sqrt(variance) if variance is not None else None,
+            "min": self.min,
+            "max": self.max,
+            "last_reading_time": datetime.fromtimestamp(
+                self.last_reading_time, tz=timezone.utc
+            ).isoformat()
+            if self.last_reading_time is not None
+            else None,
+        }
+
+
+class _SeriesStatistics:
+    __slots__ = ["statistics", "seeded", "changed", "first_reading_time"]
+
+    def __init__(self, first_reading_time: datetime):
+        self.statistics = RunningStatistics()
+        # False: only contains the readings since this process started tracking the series
+        self.seeded = False
+        self.changed = False
+        self.first_reading_time = first_reading_time
+
+
+class TimeseriesStatisticsTracker:
+    """
+    Maintains the running statistics of the series in the ingestion path and persists them periodically via the
+    persistence service.
+    When a series is first seen by this process, the statistics collected so far are merged with the persisted ones
+    (or, if none exist yet, with the ones computed once from the stored history before the first reading).
+    """
+
+    def __init__(self, service: TimeseriesPersistenceService) -> None:
+        self._service = service
+        self._series: Dict[str, _SeriesStatistics] = dict()
+        self._lock = Lock()
+        self._persist_thread: Thread | None = None
+        self._thread_lock = Lock()
+        self._persist_failing = False
+
+    def _start_persist_thread(self):
+        with self._thread_lock:
+            if self._persist_thread is None:
+                self._persist_thread = Thread(target=self._persist_loop, daemon=True)
+                self._persist_thread.start()
+
+    def put(self, iri: str, value: float | int, reading_time: datetime):
+        """
+        Adds a reading. Can be directly registered as handler at a (numeric) timeseries input.
+        :param iri:
+        :param value:
+        :param reading_time:
+        :return:
+        """
+        # Lazy start, so that processes only reading from the database do not start any threads
+        if self._persist_thread is None:
+            self._start_persist_thread()
+
+        if value is None or reading_time is None:
+            return
+        epoch_seconds = get_epoch_seconds(reading_time)
+
+        with self._lock:
+            series = self._series.get(iri)
+            if series is None:
+                series = _SeriesStatistics(
+                    first_reading_time=datetime.fromtimestamp(
+                        epoch_seconds, tz=timezone.utc
+                    )
+                )
+                self._series[iri] = series
+            series.statistics.add(value, epoch_seconds)
+            series.changed = True
+
+    def get(self, iri: str) -> RunningStatistics | None:
+        """
+        :return: the current statistics, if the series is tracked by this process and seeded. None otherwise
+        """
+        with self._lock:
+            series = self._series.get(iri)
+            if series is None or not series.seeded:
+                return None
+            return series.statistics.copy()
+
+    def _seed(self, iris: List[str]):
+        """
+        Merges the statistics collected by this process with the persisted ones or the stored history
+        """
+        persisted = self._service.read_statistics(iris)
+        for iri in iris:
+            previous = persisted.get(iri)
+            if previous is None:
+                # First time: compute once from the history stored before tracking started
+                previous = self._service.compute_statistics_for_period(
+                    iri, None, self._series[iri].first_reading_time
+                )
+            with self._lock:
+                series = self._series[iri]
+                if previous is not None:
+                    series.statistics = previous.merge(series.statistics)
+                series.seeded = True
+
+    def persist(self):
+        """
+        Writes the statistics of all series that received readings since the last call
+        """
+        with self._lock:
+            unseeded_iris = [
+                iri for iri, series in self._series.items() if not series.seeded
+            ]
+        if len(unseeded_iris) > 0:
+            self._seed(unseeded_iris)
+
+        with self._lock:
+            changed: Dict[str, RunningStatistics] = dict()
+            for iri, series in self._series.items():
+                if series.changed:
+                    changed[iri] = series.statistics.copy()
+                    series.changed = False
+        if len(changed) == 0:
+            return
+
+        try:
+            self._service.write_statistics(changed)
+        except Exception:
+            with self._lock:
+                for iri in changed.keys():
+                    self._series[iri].changed = True
+            raise
+
+    def _persist_loop(self):
+        while True:
+            time.sleep(STATISTICS_PERSIST_INTERVAL)
+
+            # pylint: disable=W0703
+            try:
+                self.persist()
+                if self._persist_failing:
+                    logger.info(
+                        f"Persisting time-series statistics for {self._service.iri} working again."
+                    )
+                self._persist_failing = False
+            except Exception as exc:
+                if not self._persist_failing:
+                    logger.info(
+                        f"Persisting time-series statistics for {self._service.iri} failed: {exc}. "
+                        f"Retrying with the next interval."
+                    )
+                self._persist_failing = True
@@ -0,0 +1,349 @@
+from __future__ import annotations
+import asyncio
+import queue
+import time
+from datetime import datetime
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple
+
+from backend.specialized_databases.timeseries.range_cache_invalidation import (
+    SPOOLED_PUBLISH_INTERVAL,
+    invalidate_cached_ranges,
+    publish_oldest_spooled_reading,
+)
+from util.log import logger
+from util.metrics import Histogram
+
+if TYPE_CHECKING:
+    from backend.specialized_databases.timeseries.TimeseriesWriteSpool import (
+        TimeseriesWriteSpool,
+    )
+
+# One reading: (iri, value, reading_time)
+TimeseriesRecord = Tuple[str, float | int | bool | str, datetime | None]
+
+DEFAULT_BATCH_SIZE = 500  # max. readings per write request
+DEFAULT_FLUSH_INTERVAL_MS = 1000  # max. time a reading waits in the buffer (in ms)
+DEFAULT_QUEUE_SIZE = 50000  # max. readings held in memory
+
+# Time a producer (runtime connection thread) is blocked when the queue is full,
+# before the reading is dropped (in s). Producers running in an event loop are never blocked
+BACKPRESSURE_TIMEOUT = 0.05
+
+# Time to wait before trying to replay spooled readings after a failed write (in s)
+SPOOL_REPLAY_RETRY_INTERVAL = 10
+
+
+def _is_event_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class TimeseriesWriteBuffer:
+    """
+    Bounded in-memory buffer decoupling the runtime connection threads from the timeseries database.
+    Readings are collected and handed over to the write function in batches, either when the batch size is
+    reached or when the flush interval passed.
+    When the queue is full, producers are blocked for a short time (backpressure) before readings are dropped.
+    Producers running in an event loop (e.g. the one shared by all runtime connections) are not blocked: their
+    readings are handed over to the flush thread and spooled (if a spool is given) or dropped.
+    Dropped readings are counted instead of being silently discarded.
+    If a spool is given, batches that could not be written are persisted to disk instead of being dropped and
+    replayed as soon as writing works again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write_function: Callable[[List[TimeseriesRecord]], None],
+        batch_size: int | None = None,
+        flush_interval_ms: int | None = None,
+        queue_size: int | None = None,
+        spool: TimeseriesWriteSpool | None = None,
+    ) -> None:
+        self.name = name
+        self._write_function = write_function
+        self.batch_size = batch_size if batch_size is not None else DEFAULT_BATCH_SIZE
+        self.flush_interval_ms = (
+            flush_interval_ms
+            if flush_interval_ms is not None
+            else DEFAULT_FLUSH_INTERVAL_MS
+        )
+        self.queue_size = queue_size if queue_size is not None else DEFAULT_QUEUE_SIZE
+        self._spool = spool
+        self._last_failed_write = 0.0
+        self._last_spooled_publish = 0.0
+        # Whether readings were replayed since cached ranges were invalidated the last time
+        self._replayed = False
+
+        self._queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._flush_thread: Thread | None = None
+        self._thread_lock = Lock()
+        self._stats_lock = Lock()
+        self.thread_stop = False
+
+        # Statistics
+        self.enqueued_count = 0
+        self.written_count = 0
+        self.batches_written_count = 0
+        self.backpressure_count = 0
+        self.dropped_queue_full_count = 0
+        self.dropped_write_failed_count = 0
+        # Duration of successful batch writes (in s)
+        self.write_latency = Histogram()
+
+        # Readings not fitting into the queue, to be spooled by the flush thread
+        self._overflow: List[TimeseriesRecord] = []
+        self.overflow_spooled_count = 0
+
+        self._write_failing = False
+        self._queue_full = False
+
+    def _start_flush_thread(self):
+        with self._thread_lock:
+            if self._flush_thread is None:
+                self._flush_thread = Thread(target=self._flush_loop, daemon=True)
+                self._flush_thread.start()
+
+    def put(self, iri: str, value: float | int | bool | str, reading_time=None):
+        """
+        Adds a reading to the buffer. Can be directly registered as handler at a timeseries input.
+        Blocks for a short time, if the buffer is full, before dropping the reading. Never blocks when called
+        from within an event loop.
+        :param iri:
+        :param value:
+        :param reading_time:
+        :return:
+        """
+        # Lazy start, so that processes only reading from the database do not start any threads
+        if self._flush_thread is None:
+            self._start_flush_thread()
+
+        record = (iri, value, reading_time)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self.backpressure_count += 1
+            try:
+                if _is_event_loop_thread():
+                    # Blocking would stall all connections of the loop
+                    if self._put_overflow(record):
+                        return
+                    raise queue.Full
+                self._queue.put(record, timeout=BACKPRESSURE_TIMEOUT)
+            except queue.Full:
+                with self._stats_lock:
+                    self.dropped_queue_full_count += 1
+                if not self._queue_full:
+                    logger.info(
+                        f"Time-series write buffer full for {self.name}: Dropping readings. "
+                        f"Will notify when accepting readings again."
+                    )
+                self._queue_full = True
+                return
+
+        if self._queue_full:
+            logger.info(
+                f"Time-series write buffer for {self.name} accepting readings again. "
+                f"Dropped so far: {self.dropped_queue_full_count}"
+            )
+            self._queue_full = False
+
+        with self._stats_lock:
+            self.enqueued_count += 1
+
+    def _put_overflow(self, record: TimeseriesRecord) -> bool:
+        """
+        :return: whether the reading was accepted for spooling by the flush thread
+        """
+        if self._spool is None:
+            return False
+        with self._stats_lock:
+            if len(self._overflow) >= self.queue_size:
+                return False
+            self._overflow.append(record)
+            return True
+
+    def _spool_overflow(self):
+        with self._stats_lock:
+            overflow, self._overflow = self._overflow, []
+        if len(overflow) == 0:
+            return
+        spooled = self._spool_batch(overflow)
+        with self._stats_lock:
+            if spooled:
+                self.overflow_spooled_count += len(overflow)
+            else:
+                self.dropped_queue_full_count += len(overflow)
+
+    def _collect_batch(self) -> List[TimeseriesRecord]:
+        """
+        Waits until either the batch size is reached or the flush interval passed
+        :return: the collected readings (may be empty)
+        """
+        batch: List[TimeseriesRecord] = []
+        deadline = time.monotonic() + self.flush_interval_ms / 1000
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _spool_batch(self, batch: List[TimeseriesRecord]) -> bool:
+        """
+        :return: whether the batch was persisted to the spool
+        """
+        if self._spool is None:
+            return False
+        try:
+            self._spool.append(batch)
+            return True
+        except OSError as exc:
+            logger.info(f"Time-series spool not writable for {self.name}: {exc}")
+            return False
+
+    def _write_batch(self, batch: List[TimeseriesRecord]):
+        # pylint: disable=W0703
+        try:
+            start = time.perf_counter()
+            self._write_function(batch)
+            duration = time.perf_counter() - start
+            with self._stats_lock:
+                self.written_count += len(batch)
+                self.batches_written_count += 1
+                self.write_latency.observe(duration)
+            if self._write_failing:
+                logger.info(
+                    f"Writing of time-series readings working again for {self.name}."
+                )
+            self._write_failing = False
+        except Exception as exc:
+            # Using generic exception on purpose, since there are many different ones occuring, that
+            # all require the same handling
+            self._last_failed_write = time.monotonic()
+            spooled = self._spool_batch(batch)
+            if not spooled:
+                with self._stats_lock:
+                    self.dropped_write_failed_count += len(batch)
+            if not self._write_failing:
+                logger.info(
+                    f"Time-series readings {'spooled to disk' if spooled else 'dropped'} for {self.name}: "
+                    f"Database not available ({exc}). Will notify when successful again."
+                )
+            self._write_failing = True
+
+    def _replay_spool_if_due(self):
+        if self._spool is None or not self._spool.has_pending_replay():
+            return
+        if (
+            self._write_failing
+            and time.monotonic() - self._last_failed_write
+            < SPOOL_REPLAY_RETRY_INTERVAL
+        ):
+            return
+        # pylint: disable=W0703
+        try:
+            # One segment per cycle, so that live readings are not delayed too long
+            if self._spool.replay_oldest_segment(self._write_function) > 0:
+                self._replayed = True
+            self._write_failing = False
+        except Exception:
+            # Keep the segment for the next try
+            self._last_failed_write = time.monotonic()
+            self._write_failing = True
+
+        if self._replayed and not self._spool.has_data():
+            # Cached ranges might miss the replayed (historic) readings
+            invalidate_cached_ranges(
+                reason=f"spooled readings replayed for {self.name}"
+            )
+            self._replayed = False
+
+    def _publish_spooled_if_due(self):
+        """
+        Publishes the time of the oldest spooled reading, so that no process caches ranges, that readings are
+        still to be replayed into
+        """
+        if self._spool is None or not self._spool.has_data():
+            return
+        if time.monotonic() - self._last_spooled_publish < SPOOLED_PUBLISH_INTERVAL:
+            return
+        oldest = self._spool.get_oldest_reading_time()
+        if oldest is None:
+            return
+        # pylint: disable=W0703
+        try:
+            publish_oldest_spooled_reading(self.name, oldest)
+            self._last_spooled_publish = time.monotonic()
+        except Exception as exc:
+            logger.info(
+                f"Could not publish the spooled readings of {self.name}: {exc}"
+            )
+
+    def _flush_loop(self):
+        while not self.thread_stop:
+            batch = self._collect_batch()
+            if len(batch) > 0:
+                self._write_batch(batch)
+            self._spool_overflow()
+            self._publish_spooled_if_due()
+            self._replay_spool_if_due()
+
+    def flush(self):
+        """
+        Writes all currently buffered readings (blocking)
+        """
+        batch: List[TimeseriesRecord] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if len(batch) > 0:
+            self._write_batch(batch)
+        self._spool_overflow()
+
+    def stop(self):
+        """Stops the flush thread and writes the remaining readings"""
+        self.thread_stop = True
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+
+    def get_statistics(self) -> Dict[str, int | float]:
+        with self._stats_lock:
+            statistics = {
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self.queue_size,
+                "enqueued": self.enqueued_count,
+                "written": self.written_count,
+                "batches_written": self.batches_written_count,
+                "backpressure_events": self.backpressure_count,
+                "overflow_spooled": self.overflow_spooled_count,
+                "dropped_queue_full": self.dropped_queue_full_count,
+                "dropped_write_failed": self.dropped_write_failed_count,
+            }
+        if self._spool is not None:
+            statistics.update(self._spool.get_statistics())
+        return statistics
+
+    def get_write_latency(self) -> Dict:
+        """
+        :return: snapshot of the histogram of the batch write durations
+        """
+        with self._stats_lock:
+            return self.write_latency.to_dict()
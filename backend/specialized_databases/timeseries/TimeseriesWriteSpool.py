@@ -0,0 +1,419 @@
+from __future__ import annotations
+import fcntl
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple
+
+from util.log import logger
+
+if TYPE_CHECKING:
+    from backend.specialized_databases.timeseries.TimeseriesWriteBuffer import (
+        TimeseriesRecord,
+    )
+
+SEGMENT_FILE_SUFFIX = ".seg"
+DEFAULT_SEGMENT_SIZE_BYTES = 1024 * 1024  # 1 MB
+DEFAULT_MAX_SIZE_BYTES = 512 * 1024 * 1024  # 512 MB
+DEFAULT_REPLAY_BATCH_SIZE = 5000  # readings per write request while replaying
+
+# Every writing process spools to its own sub-directory, locked while the process runs
+MAIN_SPOOL_OWNER = "main"
+LOCK_FILE_NAME = ".lock"
+# Interval of checking for segments left by processes that no longer exist (e.g. removed shards) (in s)
+ORPHAN_CHECK_INTERVAL = 60
+
+_spool_owner = MAIN_SPOOL_OWNER
+
+
+def set_spool_owner(owner: str):
+    """
+    Sets the name of the spool sub-directories of this process. Has to be unique across the processes writing to
+    the same databases (e.g. the ingestion shards)
+    :param owner:
+    :return:
+    """
+    global _spool_owner
+    _spool_owner = owner
+
+
+def _try_lock(directory: str):
+    """
+    :return: the opened lock file, holding an exclusive lock on the directory. None, if locked by another process
+    """
+    lock_file = open(os.path.join(directory, LOCK_FILE_NAME), "a")
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except BlockingIOError:
+        lock_file.close()
+        return None
+
+
+def _get_epoch_seconds(reading_time: datetime) -> float:
+    if reading_time.tzinfo is None:
+        # Naive reading times are UTC (as when written to the database)
+        reading_time = reading_time.replace(tzinfo=timezone.utc)
+    return reading_time.timestamp()
+
+
+def _scan_segment(path: str) -> Tuple[int, float | None]:
+    """
+    :return: the count of lines (readings) and the time of the oldest reading (epoch in s)
+    """
+    count = 0
+    oldest = None
+    with open(path, "rb") as file:
+        for line in file:
+            count += 1
+            try:
+                epoch_seconds = _get_epoch_seconds(
+                    datetime.fromisoformat(json.loads(line)[2])
+                )
+            except (ValueError, IndexError, TypeError):
+                # Counted as corrupted when replaying
+                continue
+            if oldest is None or epoch_seconds < oldest:
+                oldest = epoch_seconds
+    return count, oldest
+
+
+def _list_segments(directory: str) -> List[str]:
+    return sorted(
+        [f for f in os.listdir(directory) if f.endswith(SEGMENT_FILE_SUFFIX)]
+    )
+
+
+class TimeseriesWriteSpool:
+    """
+    Append-only write-ahead spool on disk, absorbing readings while the timeseries database is not reachable.
+
+    Readings are appended as json lines to fixed-size segment files. Full segments are closed and replayed
+    (oldest first) in large batches once the database is available again. A segment is only deleted after all of
+    its readings were written, so readings might be written twice after a failed replay, which is idempotent for
+    timeseries databases (same measurement and timestamp).
+    Disk usage is bounded: if the maximum size is exceeded, the oldest segments are discarded.
+
+    Each process uses its own sub-directory (see set_spool_owner), holding an exclusive lock on it from the first
+    use on. Segments in sub-directories not locked by any process (e.g. of removed shards) are replayed as well.
+    Opened lazily, so that processes only reading from the database do not take the lock.
+
+    Not thread-safe: intended to be used only from the flush thread of the write buffer.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size_bytes: int | None = None,
+        max_size_bytes: int | None = None,
+        replay_batch_size: int | None = None,
+    ) -> None:
+        # Directory of the database, containing the sub-directories of the processes
+        self.base_directory = directory
+        # Sub-directory of this process, set when opened
+        self.directory: str | None = None
+        self._lock_file = None
+        self._last_orphan_check = 0.0
+        self.segment_size_bytes = (
+            segment_size_bytes
+            if segment_size_bytes is not None
+            else DEFAULT_SEGMENT_SIZE_BYTES
+        )
+        self.max_size_bytes = (
+            max_size_bytes if max_size_bytes is not None else DEFAULT_MAX_SIZE_BYTES
+        )
+        self.replay_batch_size = (
+            replay_batch_size
+            if replay_batch_size is not None
+            else DEFAULT_REPLAY_BATCH_SIZE
+        )
+
+        # Segment file name -> count of readings (closed and current segments)
+        self._segment_record_counts: Dict[str, int] = dict()
+        self._segment_sizes: Dict[str, int] = dict()
+        # Segment file name -> time of its oldest reading (epoch in s)
+        self._segment_oldest: Dict[str, float] = dict()
+        self._current_segment: str | None = None
+        self._current_file = None
+        self._next_segment_number = 0
+
+        # Statistics
+        self.spooled_count = 0
+        self.replayed_count = 0
+        self.dropped_disk_full_count = 0
+        self.corrupted_count = 0
+        self.last_replay_throughput = 0.0  # readings / s
+
+    def _open(self):
+        if self.directory is not None:
+            return
+        directory = os.path.join(self.base_directory, _spool_owner)
+        os.makedirs(directory, exist_ok=True)
+        lock_file = _try_lock(directory)
+        if lock_file is None:
+            # E.g. another process replaying a segment it considered orphaned
+            logger.info(f"Time-series spool {directory} locked. Waiting...")
+            lock_file = open(os.path.join(directory, LOCK_FILE_NAME), "a")
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        self._lock_file = lock_file
+        self.directory = directory
+        self._load_existing_segments()
+
+    def _load_existing_segments(self):
+        """Picks up segments left over from a previous run"""
+        segment_files = _list_segments(self.directory)
+        for segment in segment_files:
+            path = os.path.join(self.directory, segment)
+            count, oldest = _scan_segment(path)
+            self._segment_record_counts[segment] = count
+            self._segment_sizes[segment] = os.path.getsize(path)
+            if oldest is not None:
+                self._segment_oldest[segment] = oldest
+
+        if len(segment_files) > 0:
+            self._next_segment_number = (
+                int(segment_files[-1][: -len(SEGMENT_FILE_SUFFIX)]) + 1
+            )
+            logger.info(
+                f"Time-series spool {self.directory}: found {self.record_count()} readings "
+                f"from a previous run. Will be replayed when the database is available."
+            )
+
+    def _segment_path(self, segment: str) -> str:
+        return os.path.join(self.directory, segment)
+
+    def _open_new_segment(self):
+        self._current_segment = f"{self._next_segment_number:012d}{SEGMENT_FILE_SUFFIX}"
+        self._next_segment_number += 1
+        self._current_file = open(self._segment_path(self._current_segment), "ab")
+        self._segment_record_counts[self._current_segment] = 0
+        self._segment_sizes[self._current_segment] = 0
+
+    def _close_current_segment(self):
+        if self._current_file is not None:
+            self._current_file.close()
+        self._current_file = None
+        self._current_segment = None
+
+    def _drop_oldest_segments(self):
+        while (
+            self.disk_usage_bytes() > self.max_size_bytes
+            and len(self._segment_sizes) > 1
+        ):
+            oldest = min(self._segment_sizes.keys())
+            if oldest == self._current_segment:
+                break
+            dropped = self._segment_record_counts.pop(oldest)
+            self._segment_sizes.pop(oldest)
+            self._segment_oldest.pop(oldest, None)
+            os.remove(self._segment_path(oldest))
+            self.dropped_disk_full_count += dropped
+            logger.info(
+                f"Time-series spool {self.directory} full: discarded {dropped} oldest readings."
+            )
+
+    def append(self, records: List[TimeseriesRecord]):
+        """
+        Appends the readings to the current segment and persists them to disk
+        :param records:
+        :return:
+        """
+        self._open()
+        if self._current_file is None:
+            self._open_new_segment()
+
+        spooling_time = datetime.now().astimezone()
+        lines = []
+        oldest = self._segment_oldest.get(self._current_segment)
+        for iri, value, reading_time in records:
+            # Readings without timestamp would otherwise get the time of the replay
+            if reading_time is None:
+                reading_time = spooling_time
+            lines.append(
+                json.dumps([iri, value, reading_time.isoformat()]).encode() + b"\n"
+            )
+            epoch_seconds = _get_epoch_seconds(reading_time)
+            if oldest is None or epoch_seconds < oldest:
+                oldest = epoch_seconds
+        data = b"".join(lines)
+
+        self._current_file.write(data)
+        self._current_file.flush()
+        os.fsync(self._current_file.fileno())
+
+        self._segment_record_counts[self._current_segment] += len(records)
+        self._segment_sizes[self._current_segment] += len(data)
+        if oldest is not None:
+            self._segment_oldest[self._current_segment] = oldest
+        self.spooled_count += len(records)
+
+        if self._segment_sizes[self._current_segment] >= self.segment_size_bytes:
+            self._close_current_segment()
+            self._drop_oldest_segments()
+
+    def close(self):
+        """
+        Closes the current segment and releases the lock, so that the segments can be replayed by another process.
+        Opened again when used
+        """
+        self._close_current_segment()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.directory = None
+        self._segment_record_counts.clear()
+        self._segment_sizes.clear()
+        self._segment_oldest.clear()
+
+    def has_data(self) -> bool:
+        return len(self._segment_record_counts) > 0
+
+    def get_oldest_reading_time(self) -> float | None:
+        """
+        :return: time of the oldest reading still to be replayed (epoch in s). None, if there is none
+        """
+        # Copy, as it might be read from other threads
+        oldest_per_segment = list(self._segment_oldest.values())
+        return min(oldest_per_segment) if len(oldest_per_segment) > 0 else None
+
+    def has_pending_replay(self) -> bool:
+        """
+        :return: whether there are segments to be replayed: own ones or ones of processes that no longer exist
+        (checked every ORPHAN_CHECK_INTERVAL)
+        """
+        self._open()
+        if self.has_data():
+            return True
+        if time.monotonic() - self._last_orphan_check < ORPHAN_CHECK_INTERVAL:
+            return False
+        self._last_orphan_check = time.monotonic()
+        return len(self._get_orphaned_directories()) > 0
+
+    def _get_orphaned_directories(self) -> List[str]:
+        """
+        :return: sub-directories containing segments, that are not locked by any process
+        """
+        orphaned = []
+        for entry in sorted(os.listdir(self.base_directory)):
+            directory = os.path.join(self.base_directory, entry)
+            if directory == self.directory or not os.path.isdir(directory):
+                continue
+            if len(_list_segments(directory)) == 0:
+                continue
+            lock_file = _try_lock(directory)
+            if lock_file is not None:
+                lock_file.close()
+                orphaned.append(directory)
+        return orphaned
+
+    def record_count(self) -> int:
+        # Copy, as the statistics are read from other threads
+        return sum(list(self._segment_record_counts.values()))
+
+    def disk_usage_bytes(self) -> int:
+        return sum(list(self._segment_sizes.values()))
+
+    def _read_segment(self, segment: str) -> List[TimeseriesRecord]:
+        return self._read_file(self._segment_path(segment))
+
+    def _read_file(self, path: str) -> List[TimeseriesRecord]:
+        records: List[TimeseriesRecord] = []
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    iri, value, reading_time_str = json.loads(line)
+                    records.append(
+                        (iri, value, datetime.fromisoformat(reading_time_str))
+                    )
+                except ValueError:
+                    # Partially written line (e.g. crash while appending)
+                    self.corrupted_count += 1
+        return records
+
+    def replay_oldest_segment(
+        self, write_function: Callable[[List[TimeseriesRecord]], None]
+    ) -> int:
+        """
+        Writes the readings of the oldest segment using the given function and deletes the segment afterwards.
+        The current segment is closed first, if it is the only one left.
+        :param write_function:
+        :return: the count of replayed readings
+        :raise Exception: if writing failed. The segment is kept in that case
+        """
+        self._open()
+        if not self.has_data():
+            return self._replay_orphaned_segment(write_function)
+
+        oldest = min(self._segment_record_counts.keys())
+        if oldest == self._current_segment:
+            self._close_current_segment()
+
+        start_time = time.monotonic()
+        records = self._read_segment(oldest)
+        for i in range(0, len(records), self.replay_batch_size):
+            write_function(records[i : i + self.replay_batch_size])
+
+        os.remove(self._segment_path(oldest))
+        self._segment_record_counts.pop(oldest)
+        self._segment_sizes.pop(oldest)
+        self._segment_oldest.pop(oldest, None)
+
+        duration = time.monotonic() - start_time
+        self.replayed_count += len(records)
+        self.last_replay_throughput = len(records) / duration if duration > 0 else 0.0
+
+        if not self.has_data():
+            logger.info(
+                f"Time-series spool {self.directory}: replay finished. "
+                f"Replayed {self.replayed_count} readings so far."
+            )
+
+        return len(records)
+
+    def _replay_orphaned_segment(
+        self, write_function: Callable[[List[TimeseriesRecord]], None]
+    ) -> int:
+        """
+        Replays the oldest segment of the first sub-directory not locked by any process
+        :return: the count of replayed readings
+        :raise Exception: if writing failed. The segment is kept in that case
+        """
+        for directory in self._get_orphaned_directories():
+            lock_file = _try_lock(directory)
+            if lock_file is None:
+                # Owned by a running process
+                continue
+            try:
+                segments = _list_segments(directory)
+                if len(segments) == 0:
+                    continue
+                path = os.path.join(directory, segments[0])
+                records = self._read_file(path)
+                for i in range(0, len(records), self.replay_batch_size):
+                    write_function(records[i : i + self.replay_batch_size])
+                os.remove(path)
+            finally:
+                lock_file.close()
+
+            self.replayed_count += len(records)
+            logger.info(
+                f"Time-series spool {self.directory}: replayed {len(records)} readings left in {directory}."
+            )
+            # Checked again immediately, as further segments might be left
+            self._last_orphan_check = 0.0
+            return len(records)
+        return 0
+
+    def get_statistics(self) -> Dict[str, int | float]:
+        return {
+            "spool_readings": self.record_count(),
+            "spool_segments": len(self._segment_record_counts),
+            "spool_disk_usage_bytes": self.disk_usage_bytes(),
+            "spool_max_size_bytes": self.max_size_bytes,
+            "spooled": self.spooled_count,
+            "replayed": self.replayed_count,
+            "replay_throughput_per_s": self.last_replay_throughput,
+            "dropped_spool_full": self.dropped_disk_full_count,
+            "spool_corrupted": self.corrupted_count,
+        }
@@ -0,0 +1,238 @@
+"""
+Downsampling of time-series readings to a given number of points, preserving peaks (instead of taking the first
+reading per window). Readings are processed in chunks, so that the memory only depends on the number of points.
+"""
+from enum import Enum
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class DownsamplingMethods(Enum):
+    # Largest-Triangle-Three-Buckets on the min / max points per bucket (MinMaxLTTB)
+    LTTB = "LTTB"
+    # Min and max reading per time bucket
+    MIN_MAX = "MIN_MAX"
+
+
+DOWNSAMPLING_METHODS = [method.value for method in DownsamplingMethods]
+
+# LTTB: candidates preselected per output point (min and max of multiple buckets)
+LTTB_PRESELECTION_RATIO = 4
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last point and selects one point per bucket, forming the
+    largest triangle with the point selected in the previous bucket and the average of the next bucket.
+    :param x: sorted (e.g. time in s)
+    :param y:
+    :param n_out: number of points to select
+    :return: indices of the selected points (sorted)
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:n_out], dtype=np.int64)
+
+    # n_out - 2 buckets between the first and last point: [edges[i], edges[i + 1])
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    # Third point of the triangles: average of the next bucket (last point for the last bucket)
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Doubled triangle areas of all points of the bucket at once
+        areas = np.abs(
+            (x[a] - next_x[i]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (next_y[i] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def _to_float(values: np.ndarray) -> np.ndarray:
+    """
+    :return: the values as floats (bools as 0 / 1), NaN for non-numeric values
+    """
+    if values.dtype.kind in "fiub":
+        return values.astype(np.float64)
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(
+        dtype=np.float64
+    )
+
+
+def _first_per_segment(mask: np.ndarray, segment_ids: np.ndarray) -> np.ndarray:
+    """
+    :return: for every segment, the position of its first element where mask is True
+    """
+    positions = np.flatnonzero(mask)
+    _, first = np.unique(segment_ids[positions], return_index=True)
+    return positions[first]
+
+
+class StreamingDownsampler:
+    """
+    Downsamples readings given in chunks (sorted by time) to at most max_points points.
+    The period is split into equally long time buckets, keeping only the min and max reading per bucket.
+    For LTTB, LTTB_PRESELECTION_RATIO times more buckets are used and LTTB selects the final points among them.
+    As long as the readings do not exceed max_points, all of them are returned unchanged.
+    Non-numeric series (e.g. strings) are reduced to the first reading per bucket.
+    """
+
+    def __init__(self, start_ns: int, stop_ns: int, max_points: int, method: str):
+        self.max_points = max(1, max_points)
+        self.method = method
+        if method == DownsamplingMethods.LTTB.value:
+            bucket_count = self.max_points * LTTB_PRESELECTION_RATIO // 2
+        else:
+            bucket_count = self.max_points // 2
+        self._bucket_count = max(1, bucket_count)
+        self._start_ns = start_ns
+        self._span_ns = max(1, stop_ns - start_ns + 1)
+
+        self._min_values = np.full(self._bucket_count, np.inf)
+        self._min_times = np.zeros(self._bucket_count, dtype=np.int64)
+        self._max_values = np.full(self._bucket_count, -np.inf)
+        self._max_times = np.zeros(self._bucket_count, dtype=np.int64)
+        # Non-numeric readings: first per bucket
+        self._first_times = np.full(self._bucket_count, -1, dtype=np.int64)
+        self._first_values = np.empty(self._bucket_count, dtype=object)
+        # Endpoints (kept by LTTB)
+        self._first: Tuple[int, float] | None = None
+        self._last: Tuple[int, float] | None = None
+
+        # All readings, as long as they do not exceed max_points
+        self._raw_chunks: List[Tuple[np.ndarray, np.ndarray]] | None = []
+        self.count = 0
+
+    @property
+    def bucket_duration_ns(self) -> int:
+        """
+        Duration of the time buckets. Readings reduced to their min and max per window of that duration (e.g. by
+        the database) result in the same points
+        """
+        return -(-self._span_ns // self._bucket_count)
+
+    def add_chunk(self, times_ns: np.ndarray, values: np.ndarray):
+        if len(times_ns) == 0:
+            return
+        if np.any(times_ns[1:] < times_ns[:-1]):
+            order = np.argsort(times_ns, kind="stable")
+            times_ns, values = times_ns[order], values[order]
+
+        self.count += len(times_ns)
+        if self._raw_chunks is not None:
+            if self.count <= self.max_points:
+                self._raw_chunks.append((times_ns, values))
+            else:
+                self._raw_chunks = None
+
+        buckets = (
+            (times_ns - self._start_ns).astype(np.float64)
+            / self._span_ns
+            * self._bucket_count
+        ).astype(np.int64)
+        np.clip(buckets, 0, self._bucket_count - 1, out=buckets)
+
+        numeric = _to_float(values)
+        valid = ~np.isnan(numeric)
+        if not np.all(valid):
+            invalid = ~valid
+            self._add_first_per_bucket(
+                times_ns[invalid], values[invalid], buckets[invalid]
+            )
+            times_ns, numeric, buckets = (
+                times_ns[valid],
+                numeric[valid],
+                buckets[valid],
+            )
+            if len(times_ns) == 0:
+                return
+
+        if self._first is None:
+            self._first = times_ns[0], numeric[0]
+        self._last = times_ns[-1], numeric[-1]
+
+        # Consecutive readings of the same bucket form a segment (sorted by time)
+        starts = np.flatnonzero(np.append(True, buckets[1:] != buckets[:-1]))
+        lengths = np.diff(np.append(starts, len(buckets)))
+        segment_ids = np.repeat(np.arange(len(starts)), lengths)
+        segment_buckets = buckets[starts]
+
+        segment_min = np.minimum.reduceat(numeric, starts)
+        min_positions = _first_per_segment(
+            numeric == segment_min[segment_ids], segment_ids
+        )
+        better = segment_min < self._min_values[segment_buckets]
+        self._min_values[segment_buckets[better]] = segment_min[better]
+        self._min_times[segment_buckets[better]] = times_ns[min_positions[better]]
+
+        segment_max = np.maximum.reduceat(numeric, starts)
+        max_positions = _first_per_segment(
+            numeric == segment_max[segment_ids], segment_ids
+        )
+        better = segment_max > self._max_values[segment_buckets]
+        self._max_values[segment_buckets[better]] = segment_max[better]
+        self._max_times[segment_buckets[better]] = times_ns[max_positions[better]]
+
+    def _add_first_per_bucket(
+        self, times_ns: np.ndarray, values: np.ndarray, buckets: np.ndarray
+    ):
+        starts = np.flatnonzero(np.append(True, buckets[1:] != buckets[:-1]))
+        empty = self._first_times[buckets[starts]] == -1
+        self._first_times[buckets[starts[empty]]] = times_ns[starts[empty]]
+        self._first_values[buckets[starts[empty]]] = values[starts[empty]]
+
+    def get_result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: times (epoch in ns) and values of the selected points, sorted by time
+        """
+        if self._raw_chunks is not None:
+            if len(self._raw_chunks) == 0:
+                return np.array([], dtype=np.int64), np.array([])
+            return (
+                np.concatenate([times for times, _ in self._raw_chunks]),
+                np.concatenate([values for _, values in self._raw_chunks]),
+            )
+
+        filled = np.isfinite(self._min_values)
+        if not np.any(filled):
+            return self._get_first_per_bucket_result()
+
+        times = np.concatenate([self._min_times[filled], self._max_times[filled]])
+        values = np.concatenate([self._min_values[filled], self._max_values[filled]])
+        if self.method == DownsamplingMethods.LTTB.value:
+            times = np.append(times, [self._first[0], self._last[0]])
+            values = np.append(values, [self._first[1], self._last[1]])
+
+        # Sorted by time, min and max being the same reading only once
+        times, unique_positions = np.unique(times, return_index=True)
+        values = values[unique_positions]
+
+        if self.method == DownsamplingMethods.LTTB.value:
+            selected = lttb_indices(
+                ((times - times[0]) / 1e9).astype(np.float64), values, self.max_points
+            )
+            times, values = times[selected], values[selected]
+        return times, values
+
+    def _get_first_per_bucket_result(self) -> Tuple[np.ndarray, np.ndarray]:
+        filled = self._first_times != -1
+        times, values = self._first_times[filled], self._first_values[filled]
+        if len(times) > self.max_points:
+            positions = np.linspace(0, len(times) - 1, self.max_points)
+            selected = np.unique(positions.round().astype(np.int64))
+            times, values = times[selected], values[selected]
+        return times, values
@@ -1,6 +1,8 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
 from influxdb_client.client.write_api import SYNCHRONOUS
-from influxdb_client import InfluxDBClient, Point
+from influxdb_client import InfluxDBClient, Point, WritePrecision
+import numpy as np
 import pandas as pd
 from urllib3.exceptions import NewConnectionError
 import warnings
@@ -12,6 +14,26 @@ from backend.exceptions.IdNotFoundException import IdNotFoundException
 from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
     TimeseriesPersistenceService,
 )
+from backend.specialized_databases.timeseries.downsampling import (
+    DownsamplingMethods,
+    StreamingDownsampler,
+)
+from backend.specialized_databases.timeseries.influx_db.InfluxLineProtocol import (
+    LineProtocolSerializer,
+)
+from backend.specialized_databases.timeseries.range_cache_invalidation import (
+    invalidate_cached_ranges,
+)
+from backend.specialized_databases.timeseries.TimeseriesRollupAggregator import (
+    RollupRecord,
+    get_rollup_resolution,
+)
+from backend.specialized_databases.timeseries.TimeseriesRunningStatistics import (
+    RunningStatistics,
+)
+from backend.specialized_databases.timeseries.TimeseriesWriteBuffer import (
+    TimeseriesRecord,
+)
 from util.environment_and_configuration import (
     ConfigGroups,
     get_configuration,
@@ -20,10 +42,31 @@ import os
 from util.log import logger
 
 READING_FIELD_NAME = "reading"
+# Rollups are stored in one measurement per series and resolution: <iri>#rollup_<resolution>s
+ROLLUP_MEASUREMENT_SEPARATOR = "#rollup_"
+# Field of the rollups used for serving windows (as for the raw readings: first reading per window)
+ROLLUP_WINDOW_FIELD = "first"
+# Field only written (as true) for partial rollup buckets (see RollupRecord). Never written as false, so that it
+# is kept, if another process writes the same bucket
+ROLLUP_PARTIAL_FIELD = "partial"
+AGGREGATES_WRITE_BATCH_SIZE = 5000  # max. rollup or statistics points per write request
+# Running statistics of a series are stored in <iri>#statistics, one point per day (overwritten during the day)
+STATISTICS_MEASUREMENT_SUFFIX = "#statistics"
+READ_BATCH_SIZE = 100  # max. series per multi-series read request (contains() filter)
+# Value types reduced to their min and max per window when downsampling (others: first reading per window)
+DOWNSAMPLING_NUMERIC_TYPES = ["float", "int", "uint"]
 SAFETY_BACKUP_PATH = "safety_backups/influx_db/"
 DATETIME_STRF_FORMAT = "%Y_%m_%d_%H_%M_%S_%f"
 
 
+def get_rollup_measurement(iri: str, resolution: int) -> str:
+    return f"{iri}{ROLLUP_MEASUREMENT_SEPARATOR}{resolution}s"
+
+
+def get_statistics_measurement(iri: str) -> str:
+    return f"{iri}{STATISTICS_MEASUREMENT_SUFFIX}"
+
+
 class InfluxDbPersistenceService(TimeseriesPersistenceService):
     """ """
 
@@ -33,6 +76,7 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         self.bucket = self.group
 
         self._last_reading_dropped = False
+        self.dropped_readings_count = 0
 
         self.uri = self.host + ":" + self.port
 
@@ -43,10 +87,22 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             verify_ssl=self.key is not None,
         )
 
-        # Synchronous mode to allow live data processing from the database
-        # Consider batch mode if having performance issues
-        self._write_api = self._client.write_api(write_options=SYNCHRONOUS)
+        # Separate client for writing with gzip-compressed request bodies
+        # (batches of line protocol compress well, queries are not compressed)
+        self._write_client: InfluxDBClient = InfluxDBClient(
+            url=self.uri,
+            token=self.key,
+            org=self.database,
+            verify_ssl=self.key is not None,
+            enable_gzip=True,
+        )
+
+        # Synchronous mode to allow live data processing from the database.
+        # Batching is done by the write buffer (see write_measurement_buffered)
+        self._write_api = self._write_client.write_api(write_options=SYNCHRONOUS)
         self._query_api = self._client.query_api()
+        # Serializes the buffered readings without creating a Point per reading
+        self._line_protocol = LineProtocolSerializer(field_name=READING_FIELD_NAME)
 
     # override
     def write_measurement(
@@ -71,11 +127,14 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         try:
             self._write_api.write(bucket=self.bucket, record=record)
             if self._last_reading_dropped:
-                logger.info("Writing of time-series readings working again.")
+                logger.info(
+                    f"Writing of time-series readings working again. Dropped so far: {self.dropped_readings_count}"
+                )
             self._last_reading_dropped = False
         except Exception:
             # Using generic exception on purpose, since there are many different ones occuring, that
             # all require the same handling
+            self.dropped_readings_count += 1
             if not self._last_reading_dropped:
                 logger.info(
                     "Time-series reading dropped: Database not available (ReadTimeoutError). "
@@ -84,6 +143,56 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             self._last_reading_dropped = True
             # continue with new readings (drop this one)
 
+    # override
+    def write_measurements(self, records: List[TimeseriesRecord]):
+        """
+        Writes multiple readings with one request.
+        :param records: List of (iri, value, reading_time) tuples
+        :return:
+        :raise Exception: if the readings could not be written
+        """
+        body = self._line_protocol.serialize(records)
+        if len(body) == 0:
+            return
+
+        self._write_api.write(
+            bucket=self.bucket, record=body, write_precision=WritePrecision.US
+        )
+
+    # override
+    def write_rollups(self, records: List[RollupRecord]):
+        """
+        Writes closed rollup buckets, each as one point (timestamped with the bucket start) with the fields min, max,
+        mean, count, first and last.
+        :param records:
+        :return:
+        :raise Exception: if the rollups could not be written
+        """
+        for start in range(0, len(records), AGGREGATES_WRITE_BATCH_SIZE):
+            points = [
+                self._get_rollup_point(r)
+                for r in records[start : start + AGGREGATES_WRITE_BATCH_SIZE]
+            ]
+            self._write_api.write(bucket=self.bucket, record=points)
+
+    @staticmethod
+    def _get_rollup_point(record: RollupRecord) -> Point:
+        point = (
+            Point(
+                measurement_name=get_rollup_measurement(record.iri, record.resolution)
+            )
+            .field("min", float(record.min))
+            .field("max", float(record.max))
+            .field("mean", float(record.mean))
+            .field("count", record.count)
+            .field("first", float(record.first))
+            .field("last", float(record.last))
+            .time(datetime.fromtimestamp(record.start, tz=timezone.utc))
+        )
+        if record.partial:
+            point.field(ROLLUP_PARTIAL_FIELD, True)
+        return point
+
     def _timerange_query(self, begin_time: datetime | None, end_time: datetime | None):
         # Max 10 years as InfluxDB does not support unbounded queries
         datetime_min = (
@@ -95,13 +204,265 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             range_query = f"|> range(start: {begin_time.astimezone().isoformat()}, stop: {end_time.astimezone().isoformat()})"
         elif begin_time is None and end_time is not None:
             range_query = f"|> range(start: {datetime_min}, stop: {end_time.astimezone().isoformat()})"
-        elif begin_time is None and end_time is not None:
+        elif begin_time is not None and end_time is None:
             range_query = f"|> range(start: {begin_time.astimezone().isoformat()}, stop: {datetime_max})"
         else:
             range_query = f"|> range(start: {datetime_min}, stop: {datetime_max})"
 
         return range_query
 
+    def _query_windows(
+        self,
+        measurement: str,
+        field: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int,
+    ) -> pd.DataFrame:
+        """
+        :return: the first value of the field per window, labeled with the window stop
+        """
+        query = (
+            f'from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(begin_time, end_time)} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{measurement}") \n'
+            f'|> filter(fn: (r) => r["_field"] == "{field}") \n'
+            f"|> aggregateWindow(every: {aggregation_window_ms}ms, fn: first, createEmpty: false)\n"
+            f'|> keep(columns: ["_time", "_value"]) \n'
+            '|> rename(columns: {_time: "time", _value: "value"})'
+        )
+        df = self._query_api.query_data_frame(query=query)
+        if df.empty:
+            return pd.DataFrame({"time": [], "value": []})
+        # Dataframe cleanup
+        df.drop(columns=["result", "table"], axis=1, inplace=True)
+        return df
+
+    def _read_windows_from_rollups(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int,
+        resolution: int,
+    ) -> pd.DataFrame:
+        """
+        Reads the windows from the rollups of the given resolution.
+        Rollups only exist since the aggregation was started and do not contain the still open buckets. Therefore,
+        the first and last window covered by rollups (possibly only partially) and everything before and after are
+        read from the raw readings. So are the windows containing partial buckets (where the aggregation was
+        restarted).
+        """
+        rollup_df = self._query_windows(
+            get_rollup_measurement(iri, resolution),
+            ROLLUP_WINDOW_FIELD,
+            begin_time,
+            end_time,
+            aggregation_window_ms,
+        )
+        if len(rollup_df) < 3:
+            return self._query_windows(
+                iri, READING_FIELD_NAME, begin_time, end_time, aggregation_window_ms
+            )
+
+        # Windows are aligned to the epoch and labeled with their stop
+        window = pd.Timedelta(milliseconds=aggregation_window_ms)
+        first_window_stop = rollup_df["time"].iloc[0].ceil(window)
+        last_window_start = (
+            rollup_df["time"].iloc[-1] - pd.Timedelta(nanoseconds=1)
+        ).floor(window)
+
+        head_df = self._query_windows(
+            iri,
+            READING_FIELD_NAME,
+            begin_time,
+            first_window_stop.to_pydatetime(),
+            aggregation_window_ms,
+        )
+        middle_df = rollup_df[
+            (rollup_df["time"] > first_window_stop)
+            & (rollup_df["time"] <= last_window_start)
+        ]
+        tail_df = self._query_windows(
+            iri,
+            READING_FIELD_NAME,
+            last_window_start.to_pydatetime(),
+            end_time,
+            aggregation_window_ms,
+        )
+
+        partial_window_stops = {
+            (pd.Timestamp(partial_time).floor(window) + window)
+            for partial_time in self._query_partial_rollup_times(
+                iri, resolution, first_window_stop, last_window_start
+            )
+        }
+        partial_dfs = []
+        for window_stop in sorted(partial_window_stops):
+            if not first_window_stop < window_stop <= last_window_start:
+                continue
+            middle_df = middle_df[middle_df["time"] != window_stop]
+            partial_dfs.append(
+                self._query_windows(
+                    iri,
+                    READING_FIELD_NAME,
+                    (window_stop - window).to_pydatetime(),
+                    window_stop.to_pydatetime(),
+                    aggregation_window_ms,
+                )
+            )
+
+        df = pd.concat([head_df, middle_df, *partial_dfs, tail_df], ignore_index=True)
+        if len(partial_dfs) > 0:
+            df = df.sort_values("time", ignore_index=True)
+        return df
+
+    def _query_partial_rollup_times(
+        self,
+        iri: str,
+        resolution: int,
+        begin_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+    ) -> List[pd.Timestamp]:
+        """
+        :return: start times of the partial rollup buckets in the period
+        """
+        query = (
+            f'from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(begin_time.to_pydatetime(), end_time.to_pydatetime())} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{get_rollup_measurement(iri, resolution)}") \n'
+            f'|> filter(fn: (r) => r["_field"] == "{ROLLUP_PARTIAL_FIELD}") \n'
+            '|> keep(columns: ["_time"])'
+        )
+        return [
+            record.get_time()
+            for table in self._query_api.query(query=query)
+            for record in table.records
+        ]
+
+    def _read_downsampled(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        max_points: int,
+        downsampling: str,
+    ) -> Tuple[pd.DataFrame, int]:
+        """
+        Downsamples the readings to max_points. The database counts the readings and reduces them to the min and
+        max reading per bucket of the downsampling (first reading for non-numeric series) in one query, so that
+        only these candidates are transferred. The raw readings are only queried, if not more than max_points.
+        Unbounded periods are limited to the first and last reading (one additional query).
+        :return: the dataframe and the number of readings in the period
+        """
+        data_query = (
+            f'from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(begin_time, end_time)} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{iri}" and r["_field"] == "{READING_FIELD_NAME}") \n'
+        )
+        if begin_time is not None and end_time is not None:
+            start_time = begin_time.astimezone()
+            stop_time = end_time.astimezone()
+        else:
+            # Only the missing bounds (first / last are answered without scanning the readings)
+            extent_query = (
+                f"data = {data_query}"
+                'data |> first() |> yield(name: "first") \n'
+                'data |> last() |> yield(name: "last")'
+            )
+            results = dict()
+            for table in self._query_api.query(query=extent_query):
+                for record in table.records:
+                    results[record.values["result"]] = record
+            if "first" not in results or "last" not in results:
+                return pd.DataFrame({"time": [], "value": []}), 0
+            start_time = (
+                begin_time.astimezone()
+                if begin_time is not None
+                else results["first"].get_time()
+            )
+            # Stops are exclusive
+            stop_time = (
+                end_time.astimezone()
+                if end_time is not None
+                else results["last"].get_time() + timedelta(microseconds=1)
+            )
+
+        downsampler = StreamingDownsampler(
+            start_ns=int(pd.Timestamp(start_time).value),
+            stop_ns=int(pd.Timestamp(stop_time).value),
+            max_points=max_points,
+            method=downsampling,
+        )
+        # Windows aligned to the buckets of the downsampler
+        window_ns = downsampler.bucket_duration_ns
+        window = f"window(every: {window_ns}ns, offset: {int(pd.Timestamp(start_time).value) % window_ns}ns)"
+        is_numeric = " or ".join(
+            f'types.isType(v: r["_value"], type: "{value_type}")'
+            for value_type in DOWNSAMPLING_NUMERIC_TYPES
+        )
+        data_query = (
+            f'from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(start_time, stop_time)} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{iri}" and r["_field"] == "{READING_FIELD_NAME}") \n'
+        )
+        reduction_query = (
+            'import "types" \n'
+            f"data = {data_query}"
+            'data |> count() |> keep(columns: ["_value"]) |> yield(name: "count") \n'
+            f"numeric = data |> filter(fn: (r) => {is_numeric}) |> {window} \n"
+            'numeric |> min() |> group() |> keep(columns: ["_time", "_value"]) |> yield(name: "min") \n'
+            'numeric |> max() |> group() |> keep(columns: ["_time", "_value"]) |> yield(name: "max") \n'
+            f"data |> filter(fn: (r) => not ({is_numeric})) |> {window} \n"
+            '|> first() |> group() |> keep(columns: ["_time", "_value"]) |> yield(name: "first")'
+        )
+        count = 0
+        # Result name -> (time, value) of the candidates
+        candidates: Dict[str, List[Tuple[datetime, object]]] = dict()
+        for table in self._query_api.query(query=reduction_query):
+            for record in table.records:
+                if record.values["result"] == "count":
+                    count += int(record.get_value())
+                else:
+                    candidates.setdefault(record.values["result"], []).append(
+                        (record.get_time(), record.get_value())
+                    )
+        if count == 0:
+            return pd.DataFrame({"time": [], "value": []}), 0
+
+        if count <= max_points:
+            df = self._query_api.query_data_frame(
+                query=f'{data_query}|> keep(columns: ["_time", "_value"]) \n'
+                '|> rename(columns: {_time: "time", _value: "value"})'
+            )
+            if isinstance(df, list):
+                df = pd.concat(df, ignore_index=True)
+            if df.empty:
+                return pd.DataFrame({"time": [], "value": []}), 0
+            df.drop(columns=["result", "table"], axis=1, inplace=True)
+            return df, count
+
+        # One chunk sorted by time, min and max being the same reading only once
+        candidates_df = (
+            pd.DataFrame(
+                [record for records in candidates.values() for record in records],
+                columns=["time", "value"],
+            )
+            .drop_duplicates(subset="time")
+            .sort_values("time")
+        )
+        downsampler.add_chunk(
+            pd.to_datetime(candidates_df["time"], utc=True)
+            .to_numpy(dtype="datetime64[ns]")
+            .view(np.int64),
+            candidates_df["value"].to_numpy(),
+        )
+        times, values = downsampler.get_result()
+        df = pd.DataFrame(
+            {"time": pd.to_datetime(times, unit="ns", utc=True), "value": values}
+        )
+        return df, count
+
     # override
     def read_period_to_dataframe(
         self,
@@ -109,27 +470,39 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         begin_time: datetime | None,
         end_time: datetime | None,
         aggregation_window_ms: int | None = None,
+        max_points: int | None = None,
+        downsampling: str = DownsamplingMethods.LTTB.value,
     ) -> pd.DataFrame:
         """
         Reads all measurements from the sensor with the given ID in the time period
         :param id_uri:
         :param begin_time:
         :param end_time:
+        :param aggregation_window_ms: if given, only the first reading per window. Served from the rollups where
+        available, if the window is a multiple of a rollup resolution
+        :param max_points: if given, the readings are downsampled to at most that many points (preserving peaks).
+        Takes precedence over aggregation_window_ms
+        :param downsampling: method used with max_points (see DownsamplingMethods)
         :return: Dataframe containing all measurements in that period
         :raise IdNotFoundException: if the id_uri is not found
         """
-        range_query = self._timerange_query(begin_time, end_time)
+        try:
+            if isinstance(max_points, int) and max_points > 0:
+                return self._read_downsampled(
+                    iri, begin_time, end_time, max_points, downsampling
+                )[0]
+
+            if isinstance(aggregation_window_ms, int) and aggregation_window_ms != 0:
+                resolution = get_rollup_resolution(aggregation_window_ms)
+                if resolution is not None:
+                    return self._read_windows_from_rollups(
+                        iri, begin_time, end_time, aggregation_window_ms, resolution
+                    )
+                return self._query_windows(
+                    iri, READING_FIELD_NAME, begin_time, end_time, aggregation_window_ms
+                )
 
-        if isinstance(aggregation_window_ms, int) and aggregation_window_ms != 0:
-            query = (
-                f'from(bucket: "{self.bucket}") \n'
-                f"{range_query} \n"
-                f'|> filter(fn: (r) => r["_measurement"] == "{iri}") \n'
-                f"|> aggregateWindow(every: {aggregation_window_ms}ms, fn: first, createEmpty: false)\n"
-                f'|> keep(columns: ["_time", "_value"]) \n'
-                '|> rename(columns: {_time: "time", _value: "value"})'
-            )
-        else:
+            range_query = self._timerange_query(begin_time, end_time)
             query = (
                 f'from(bucket: "{self.bucket}") \n'
                 f"{range_query} \n"
@@ -139,7 +512,6 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
                 '|> rename(columns: {_time: "time", reading: "value"})'
             )
 
-        try:
             df = self._query_api.query_data_frame(query=query)
             if df.empty:
                 return pd.DataFrame({"time": [], "value": []})
@@ -159,6 +531,241 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             # Skip this ts
             return None
 
+    # override
+    def read_many_periods_to_dataframes(
+        self,
+        iris: List[str],
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int | None = None,
+    ) -> Dict[str, pd.DataFrame] | None:
+        """
+        Reads the measurements of multiple sensors in the time period with one query per READ_BATCH_SIZE series
+        (instead of one per series)
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :param aggregation_window_ms: if given, only the first reading per window (always from the raw readings)
+        :return: iri -> Dataframe containing all measurements in that period (empty, if there are none). None, if
+        the database is not available
+        """
+        aggregation_query = (
+            f"|> aggregateWindow(every: {aggregation_window_ms}ms, fn: first, createEmpty: false) \n"
+            if isinstance(aggregation_window_ms, int) and aggregation_window_ms != 0
+            else ""
+        )
+        dataframes: Dict[str, pd.DataFrame] = dict()
+        try:
+            for start in range(0, len(iris), READ_BATCH_SIZE):
+                measurements = ", ".join(
+                    f'"{iri}"' for iri in iris[start : start + READ_BATCH_SIZE]
+                )
+                query = (
+                    f'from(bucket: "{self.bucket}") \n'
+                    f"{self._timerange_query(begin_time, end_time)} \n"
+                    f'|> filter(fn: (r) => contains(value: r["_measurement"], set: [{measurements}]) and r["_field"] == "{READING_FIELD_NAME}") \n'
+                    f"{aggregation_query}"
+                    '|> keep(columns: ["_time", "_value", "_measurement"]) \n'
+                    '|> rename(columns: {_time: "time", _value: "value"})'
+                )
+                result = self._query_api.query_data_frame(query=query)
+                # One dataframe per value type, keeping the types of the series
+                for df in result if isinstance(result, list) else [result]:
+                    if df.empty:
+                        continue
+                    for iri, series_df in df.groupby("_measurement", sort=False):
+                        dataframes[iri] = series_df[["time", "value"]].reset_index(
+                            drop=True
+                        )
+        except NewConnectionError:
+            return None
+
+        for iri in iris:
+            if iri not in dataframes:
+                dataframes[iri] = pd.DataFrame({"time": [], "value": []})
+        return dataframes
+
+    # override
+    def count_many_entries_for_period(
+        self,
+        iris: List[str],
+        begin_time: datetime | None,
+        end_time: datetime | None,
+    ) -> Dict[str, int] | None:
+        """
+        Counts the measurement entries of multiple sensors in the time period with one query per READ_BATCH_SIZE
+        series (instead of one per series). Only the counts are transferred
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :return: iri -> number of entries (0, if there are none). None, if the database is not available
+        """
+        counts: Dict[str, int] = {iri: 0 for iri in iris}
+        try:
+            for start in range(0, len(iris), READ_BATCH_SIZE):
+                measurements = ", ".join(
+                    f'"{iri}"' for iri in iris[start : start + READ_BATCH_SIZE]
+                )
+                query = (
+                    f'from(bucket: "{self.bucket}") \n'
+                    f"{self._timerange_query(begin_time, end_time)} \n"
+                    f'|> filter(fn: (r) => contains(value: r["_measurement"], set: [{measurements}]) and r["_field"] == "{READING_FIELD_NAME}") \n'
+                    "|> count() \n"
+                    '|> keep(columns: ["_measurement", "_value"])'
+                )
+                for table in self._query_api.query(query=query):
+                    for record in table.records:
+                        counts[record.get_measurement()] += int(record.get_value())
+        except NewConnectionError:
+            return None
+
+        return counts
+
+    # override
+    def read_period_adaptive(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        max_points: int,
+        downsampling: str = DownsamplingMethods.LTTB.value,
+    ) -> Tuple[pd.DataFrame, int] | None:
+        """
+        Reads the measurements in the time period at a resolution of at most max_points, together with the number
+        of readings in the period. Counted and reduced by the database in one query (see _read_downsampled).
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :param max_points:
+        :param downsampling: method used, if there are more readings than max_points (see DownsamplingMethods)
+        :return: the dataframe (all readings, if not more than max_points) and the number of readings. None, if
+        the database is not available
+        :raise IdNotFoundException: if the id_uri is not found
+        """
+        try:
+            return self._read_downsampled(
+                iri, begin_time, end_time, max_points, downsampling
+            )
+        except KeyError:
+            # id_uri not found
+            raise IdNotFoundException
+        except NewConnectionError:
+            return None
+
+    # override
+    def write_statistics(self, statistics: Dict[str, RunningStatistics]):
+        """
+        Persists the running statistics of the given series, replacing former ones.
+        Written with the start of the current day as timestamp, so that the points of one day overwrite each other.
+        :param statistics: iri -> statistics
+        :return:
+        :raise Exception: if the statistics could not be written
+        """
+        point_time = datetime.now(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        points = [
+            Point(measurement_name=get_statistics_measurement(iri))
+            .field("count", s.count)
+            .field("mean", float(s.mean))
+            .field("m2", float(s.m2))
+            .field("min", float(s.min))
+            .field("max", float(s.max))
+            .field("last_reading_time", float(s.last_reading_time))
+            .time(point_time)
+            for iri, s in statistics.items()
+            if s.count > 0
+        ]
+        for start in range(0, len(points), AGGREGATES_WRITE_BATCH_SIZE):
+            self._write_api.write(
+                bucket=self.bucket,
+                record=points[start : start + AGGREGATES_WRITE_BATCH_SIZE],
+            )
+
+    # override
+    def read_statistics(self, iris: List[str]) -> Dict[str, RunningStatistics]:
+        """
+        Reads the persisted running statistics.
+        :param iris:
+        :return: iri -> statistics (only for the series with persisted statistics)
+        :raise Exception: if the statistics could not be read
+        """
+        fields_per_iri: Dict[str, Dict] = dict()
+        for start in range(0, len(iris), READ_BATCH_SIZE):
+            measurements = ", ".join(
+                f'"{get_statistics_measurement(iri)}"'
+                for iri in iris[start : start + READ_BATCH_SIZE]
+            )
+            query = (
+                f'from(bucket: "{self.bucket}") \n'
+                f"{self._timerange_query(None, None)} \n"
+                f'|> filter(fn: (r) => contains(value: r["_measurement"], set: [{measurements}])) \n'
+                "|> last()"
+            )
+            for table in self._query_api.query(query=query):
+                for record in table.records:
+                    iri = record.get_measurement()[
+                        : -len(STATISTICS_MEASUREMENT_SUFFIX)
+                    ]
+                    fields_per_iri.setdefault(iri, dict())[
+                        record.get_field()
+                    ] = record.get_value()
+
+        return {
+            iri: RunningStatistics(
+                count=int(fields["count"]),
+                mean=fields["mean"],
+                m2=fields["m2"],
+                min=fields["min"],
+                max=fields["max"],
+                last_reading_time=fields["last_reading_time"],
+            )
+            for iri, fields in fields_per_iri.items()
+            if len(fields) == 6
+        }
+
+    # override
+    def compute_statistics_for_period(
+        self, iri: str, begin_time: datetime | None, end_time: datetime | None
+    ) -> RunningStatistics:
+        """
+        Computes the statistics from the stored readings (scanning the whole period).
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :return: the statistics (count 0, if there are no readings)
+        :raise Exception: if the readings could not be read
+        """
+        query = (
+            f'data = from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(begin_time, end_time)} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{iri}" and r["_field"] == "{READING_FIELD_NAME}") \n'
+            'data |> count() |> yield(name: "count") \n'
+            'data |> mean() |> yield(name: "mean") \n'
+            'data |> stddev() |> yield(name: "stddev") \n'
+            'data |> min() |> yield(name: "min") \n'
+            'data |> max() |> yield(name: "max") \n'
+            'data |> last() |> yield(name: "last")'
+        )
+        results = dict()
+        for table in self._query_api.query(query=query):
+            for record in table.records:
+                results[record.values["result"]] = record
+
+        count = int(results["count"].get_value()) if "count" in results else 0
+        if count == 0:
+            return RunningStatistics()
+
+        stddev = results["stddev"].get_value() if "stddev" in results else None
+        return RunningStatistics(
+            count=count,
+            mean=results["mean"].get_value(),
+            m2=stddev * stddev * (count - 1) if stddev is not None else 0.0,
+            min=results["min"].get_value(),
+            max=results["max"].get_value(),
+            last_reading_time=results["last"].get_time().timestamp(),
+        )
+
     # override
     def count_entries_for_period(
         self, iri: str, begin_time: datetime, end_time: datetime
@@ -300,4 +907,5 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         subprocess.run(
             ["influx", "restore", backup_path, "--host", self.uri, "-t", self.key]
         )
+        invalidate_cached_ranges(reason=f"{self.iri} restored")
         logger.info("Finished restoring InfluxDB.")
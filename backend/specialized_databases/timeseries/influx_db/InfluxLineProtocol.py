@@ -0,0 +1,134 @@
+"""
+Direct serialization of readings to the InfluxDB line protocol, without creating a `Point` per reading.
+Produces the same lines as `Point.to_line_protocol` (timestamps in microseconds). Unlike `Point`, values of
+unsupported types are skipped instead of raising, and numpy booleans are written as booleans.
+"""
+import math
+import numbers
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from backend.specialized_databases.timeseries.TimeseriesWriteBuffer import (
+    TimeseriesRecord,
+)
+
+# Same escaping as influxdb_client
+_ESCAPE_MEASUREMENT = str.maketrans(
+    {",": r"\,", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"}
+)
+_ESCAPE_KEY = str.maketrans(
+    {",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"}
+)
+_ESCAPE_STRING = str.maketrans({"\\": "\\\\", '"': r"\""})
+
+
+def escape_measurement(measurement: str) -> str:
+    return measurement.translate(_ESCAPE_MEASUREMENT)
+
+
+def _format_float(value: float) -> str | None:
+    # Not supported by InfluxDB (skipped as by influxdb_client)
+    if math.isnan(value) or math.isinf(value):
+        return None
+    formatted = repr(value)
+    # Trailing ".0" of whole numbers trimmed as by influxdb_client (still a float field without the "i" suffix)
+    if formatted.endswith(".0"):
+        return formatted[:-2]
+    return formatted
+
+
+def _format_int(value: int) -> str:
+    return f"{value}i"
+
+
+def _format_bool(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def _format_str(value: str) -> str:
+    return f'"{value.translate(_ESCAPE_STRING)}"'
+
+
+# Resolved by the exact type of the value instead of isinstance chains
+_FIELD_FORMATTERS: Dict[type, Callable] = {
+    float: _format_float,
+    int: _format_int,
+    bool: _format_bool,
+    str: _format_str,
+}
+
+
+def _format_field_value(value) -> str | None:
+    """
+    :return: the formatted value. None for unsupported values, which are skipped (instead of being written as
+    strings, which would conflict with the field type of the series and fail the whole batch)
+    """
+    formatter = _FIELD_FORMATTERS.get(type(value))
+    if formatter is not None:
+        return formatter(value)
+    # Subclasses and numpy types (not all of them subclasses of the python types)
+    if isinstance(value, (bool, np.bool_)):
+        return _format_bool(bool(value))
+    if isinstance(value, numbers.Integral):
+        return _format_int(int(value))
+    if isinstance(value, (numbers.Real, Decimal)):
+        return _format_float(float(value))
+    if isinstance(value, str):
+        return _format_str(str(value))
+    return None
+
+
+def get_epoch_microseconds(reading_time: datetime) -> int:
+    if reading_time.tzinfo is None:
+        # Naive reading times are UTC (as interpreted by influxdb_client)
+        reading_time = reading_time.replace(tzinfo=timezone.utc)
+    return round(reading_time.timestamp() * 1_000_000)
+
+
+class LineProtocolSerializer:
+    """
+    Serializes readings of one field to line protocol in bulk. The escaped line prefix ("<measurement> <field>=")
+    is computed once per series and cached.
+    To be written with microsecond precision.
+    """
+
+    def __init__(self, field_name: str) -> None:
+        self._field_key = field_name.translate(_ESCAPE_KEY)
+        # iri -> escaped line prefix
+        self._line_prefixes: Dict[str, str] = dict()
+
+    def _get_line_prefix(self, iri: str) -> str:
+        prefix = self._line_prefixes.get(iri)
+        if prefix is None:
+            prefix = f"{escape_measurement(iri)} {self._field_key}="
+            self._line_prefixes[iri] = prefix
+        return prefix
+
+    def serialize(self, records: List[TimeseriesRecord]) -> str:
+        """
+        :param records: readings (iri, value, reading_time). Readings without time get the database time
+        :return: one line per reading. Readings with unsupported values (None, NaN, inf, other types) are skipped
+        """
+        line_prefixes = self._line_prefixes
+        formatters = _FIELD_FORMATTERS
+        lines = []
+        for iri, value, reading_time in records:
+            prefix = line_prefixes.get(iri)
+            if prefix is None:
+                prefix = self._get_line_prefix(iri)
+
+            formatter = formatters.get(type(value), _format_field_value)
+            field_value = formatter(value)
+            if field_value is None:
+                continue
+
+            if reading_time is None:
+                lines.append(prefix + field_value)
+            else:
+                lines.append(
+                    f"{prefix}{field_value} {get_epoch_microseconds(reading_time)}"
+                )
+        return "\n".join(lines)
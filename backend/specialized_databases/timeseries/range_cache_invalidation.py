@@ -0,0 +1,94 @@
+"""
+Inter-process state deciding, which cached time-series ranges (see TimeseriesRangeCache) are still valid:
+- Generation: part of every cache key. Changed when historic readings change in bulk (restore, import, replay of
+  spooled readings), so that all processes stop using the entries cached before
+- Oldest spooled reading per database: readings after it are still to be written (replayed from the spool) and
+  must not be cached yet
+Kept separate from the cache itself, so that the writing side does not depend on the reading side.
+"""
+import hashlib
+import time
+import uuid
+
+from util.inter_process_cache import memcache
+from util.log import logger
+
+GENERATION_KEY = "ts_range_generation"
+# Interval of reading the generation from the inter-process cache (in s)
+GENERATION_REFRESH_INTERVAL = 1
+
+SPOOLED_KEY_PREFIX = "ts_range_spooled_"
+# The oldest spooled reading of a database is published at most that often (in s), while readings are pending
+SPOOLED_PUBLISH_INTERVAL = 5
+# Not refreshed anymore, when the spool is empty or the process died (in s)
+SPOOLED_EXPIRE = 30
+
+_generation: str | None = None
+_generation_read = 0.0
+
+
+def _get_spooled_key(database_iri: str) -> str:
+    # Memcache keys are limited to 250 characters without whitespace, IRIs are not
+    return SPOOLED_KEY_PREFIX + hashlib.md5(database_iri.encode("utf-8")).hexdigest()
+
+
+def get_generation() -> str:
+    """
+    :return: the current generation (random, so that it is never reused after the inter-process cache restarted)
+    :raise Exception: if the inter-process cache is not available
+    """
+    global _generation, _generation_read
+    if (
+        _generation is not None
+        and time.monotonic() - _generation_read < GENERATION_REFRESH_INTERVAL
+    ):
+        return _generation
+
+    generation = memcache.get(GENERATION_KEY)
+    if generation is None:
+        # Only set, if not existing yet (another process might have been faster)
+        memcache.add(GENERATION_KEY, uuid.uuid4().hex, noreply=False)
+        generation = memcache.get(GENERATION_KEY)
+    if generation is None:
+        raise ConnectionError("Generation of the cached ranges not available")
+    _generation = generation.decode() if isinstance(generation, bytes) else generation
+    _generation_read = time.monotonic()
+    return _generation
+
+
+def invalidate_cached_ranges(reason: str):
+    """
+    Starts a new generation: ranges cached before are not used anymore by any process
+    :param reason: for logging
+    :return:
+    """
+    global _generation
+    # pylint: disable=W0703
+    try:
+        memcache.set(GENERATION_KEY, uuid.uuid4().hex)
+        _generation = None
+        logger.info(f"Invalidated the cached time-series ranges: {reason}")
+    except Exception as exc:
+        logger.info(f"Could not invalidate the cached time-series ranges: {exc}")
+
+
+def publish_oldest_spooled_reading(database_iri: str, epoch_seconds: float):
+    """
+    Called by the processes spooling readings for the database. Keeps the oldest of the readings of all processes
+    :param database_iri:
+    :param epoch_seconds: time of the oldest reading pending in the spool of the calling process
+    :return:
+    """
+    key = _get_spooled_key(database_iri)
+    current = memcache.get(key)
+    if current is None or float(current) >= epoch_seconds:
+        # Also refreshes the expiry, if this process holds the oldest one
+        memcache.set(key, repr(epoch_seconds), expire=SPOOLED_EXPIRE)
+
+
+def get_oldest_spooled_reading(database_iri: str) -> float | None:
+    """
+    :return: time of the oldest reading pending in any spool of the database (epoch in s). None, if there is none
+    """
+    oldest = memcache.get(_get_spooled_key(database_iri))
+    return float(oldest) if oldest is not None else None
@@ -0,0 +1,99 @@
+"""
+Benchmark of the InfluxDB write serialization: `Point` objects (former path) compared with the direct line protocol
+serialization, including the gzip compression of the request bodies.
+Measures the client side only (the HTTP request itself is the same for both). Batches as created by the write buffer.
+
+Usage: python benchmark_influx_line_protocol.py [--points 10000 100000 1000000] [--batch-size 500] [--series 1000]
+"""
+
+import argparse
+import gzip
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from influxdb_client import Point, WritePrecision
+
+from backend.specialized_databases.timeseries.influx_db.InfluxDbPersistenceService import (
+    READING_FIELD_NAME,
+)
+from backend.specialized_databases.timeseries.influx_db.InfluxLineProtocol import (
+    LineProtocolSerializer,
+)
+
+IRI_PREFIX = "www.sintef.no/aas_identifiers/benchmark/sensors/sensor_"
+
+
+def _records(count: int, series_count: int):
+    start_time = datetime.now(timezone.utc)
+    return [
+        (
+            f"{IRI_PREFIX}{i % series_count}",
+            random.random() * 1000,
+            start_time + timedelta(microseconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def _batches(records, batch_size: int):
+    return [
+        records[start : start + batch_size]
+        for start in range(0, len(records), batch_size)
+    ]
+
+
+def _serialize_points(batch) -> str:
+    """Former path: Point per reading, serialized by the write API"""
+    points = []
+    for iri, value, reading_time in batch:
+        point = Point(measurement_name=iri).field(field=READING_FIELD_NAME, value=value)
+        point.time(reading_time, write_precision=WritePrecision.US)
+        points.append(point)
+    return "\n".join(point.to_line_protocol() for point in points)
+
+
+def run_benchmark(point_counts, batch_size: int, series_count: int):
+    print(
+        f"{'points':>10} | {'Point':>12} | {'line protocol':>14} | {'speedup':>8} | "
+        f"{'gzip':>12} | {'body size':>10} | {'gzip size':>10}   (points/s, MB)"
+    )
+    for count in point_counts:
+        batches = _batches(_records(count, series_count), batch_size)
+
+        start = time.perf_counter()
+        point_bodies = [_serialize_points(batch) for batch in batches]
+        point_rate = count / (time.perf_counter() - start)
+
+        serializer = LineProtocolSerializer(field_name=READING_FIELD_NAME)
+        start = time.perf_counter()
+        bodies = [serializer.serialize(batch) for batch in batches]
+        line_protocol_rate = count / (time.perf_counter() - start)
+
+        if bodies != point_bodies:
+            print(f"Warning: the serialized bodies differ for {count} points")
+
+        encoded = [body.encode("utf-8") for body in bodies]
+        start = time.perf_counter()
+        compressed = [gzip.compress(body) for body in encoded]
+        gzip_rate = count / (time.perf_counter() - start)
+
+        body_size = sum(len(body) for body in encoded) / 1024 / 1024
+        gzip_size = sum(len(body) for body in compressed) / 1024 / 1024
+        print(
+            f"{count:>10,} | {point_rate:>12,.0f} | {line_protocol_rate:>14,.0f} | "
+            f"{line_protocol_rate / point_rate:>7.1f}x | {gzip_rate:>12,.0f} | "
+            f"{body_size:>10.1f} | {gzip_size:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--points", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--series", type=int, default=1000)
+    args = parser.parse_args()
+
+    run_benchmark(args.points, args.batch_size, args.series)
@@ -0,0 +1,105 @@
+"""
+Microbenchmark for the reading handling of one timeseries input.
+Measures the readings per second that one input can convert and hand over to a (no-op) handler, compared with the
+former value-type checks per reading, as well as the batch conversion.
+
+Usage: python benchmark_timeseries_input.py [--readings 200000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+from math import floor
+
+from backend.runtime_connections.opcua.OpcuaTimeseriesInput import (
+    OpcuaTimeseriesInput,
+)
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+
+def _legacy_conversion(value_type: str, reading_value):
+    """Conversion as done before the converters were resolved per input"""
+    if value_type == TimeseriesValueTypes.STRING.value:
+        reading_value = str(reading_value)
+    elif value_type == TimeseriesValueTypes.DECIMAL.value:
+        reading_value = float(reading_value)
+    elif value_type == TimeseriesValueTypes.INT.value:
+        reading_value = floor(float(reading_value))
+    elif value_type == TimeseriesValueTypes.BOOL.value:
+        if isinstance(reading_value, bool):
+            pass
+        elif isinstance(reading_value, float):
+            reading_value = bool(reading_value)
+        elif isinstance(reading_value, str):
+            reading_value = (
+                reading_value == "True"
+                or reading_value == "true"
+                or reading_value == "t"
+            )
+    return reading_value
+
+
+def _raw_values(value_type: str, count: int):
+    if value_type == TimeseriesValueTypes.BOOL.value:
+        return [random.choice([True, False, 1.0, 0.0, "true"]) for _ in range(count)]
+    if value_type == TimeseriesValueTypes.STRING.value:
+        return [random.choice(["RED", "WHITE", "BLUE", 42]) for _ in range(count)]
+    return [random.random() * 1000 for _ in range(count)]
+
+
+def _readings_per_s(count: int, start: float) -> float:
+    return count / (time.perf_counter() - start)
+
+
+def run_benchmark(count: int):
+    reading_time = datetime.now()
+
+    print(
+        f"{'value type':<10} | {'legacy conversion':>18} | {'converter':>14} | "
+        f"{'handle_reading':>14} | {'batch converter':>16}   (readings/s)"
+    )
+    for value_type in [value_type.value for value_type in TimeseriesValueTypes]:
+        raw_values = _raw_values(value_type, count)
+        ts_input = OpcuaTimeseriesInput(
+            iri="benchmark",
+            connection_topic="benchmark",
+            connection_keyword=None,
+            value_type=value_type,
+        )
+        ts_input.register_handler(
+            lambda iri, value, reading_time: None, handler_id="benchmark"
+        )
+
+        start = time.perf_counter()
+        for value in raw_values:
+            _legacy_conversion(value_type, value)
+        legacy = _readings_per_s(count, start)
+
+        convert_value = ts_input.convert_value
+        start = time.perf_counter()
+        for value in raw_values:
+            convert_value(value)
+        converter = _readings_per_s(count, start)
+
+        start = time.perf_counter()
+        for value in raw_values:
+            ts_input.handle_reading(reading_time, value)
+        handled = _readings_per_s(count, start)
+
+        start = time.perf_counter()
+        ts_input.convert_values(raw_values)
+        batch = _readings_per_s(count, start)
+
+        print(
+            f"{value_type:<10} | {legacy:>18,.0f} | {converter:>14,.0f} | "
+            f"{handled:>14,.0f} | {batch:>16,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readings", type=int, default=200000)
+    args = parser.parse_args()
+
+    run_benchmark(args.readings)
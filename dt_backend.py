@@ -21,6 +21,7 @@ from util.environment_and_configuration import (
 )
 from backend.api.api import app
 from backend.cleanup_thread import start_storage_cleanup_thread
+from backend.knowledge_graph.GraphChangeLog import GraphChangeLog, GraphChangeTypes
 from backend.knowledge_graph.KnowledgeGraphPersistenceService import (
     KnowledgeGraphPersistenceService,
 )
@@ -29,6 +30,7 @@ from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
 from backend.runtime_connections.RuntimeConnectionContainer import (
     RuntimeConnectionContainer,
 )
+from backend.runtime_connections.IngestionSupervisor import IngestionSupervisor
 from backend.specialized_databases.DatabasePersistenceServiceContainer import (
     DatabasePersistenceServiceContainer,
 )
@@ -63,6 +65,9 @@ from backend.api.rest_endpoints import db_import_export_endpoints
 # noinspection PyUnresolvedReferences
 from backend.api.rest_endpoints import aas_endpoints
 
+# noinspection PyUnresolvedReferences
+from backend.api.rest_endpoints import metrics_endpoints
+
 # noinspection PyUnresolvedReferences
 #vfrom backend.api.rest_endpoints import similarity_pipeline_endpoints
 
@@ -72,11 +77,15 @@ from init_learning_factory_from_cypher_file import (
 )
 from util.environment_and_configuration import (
     get_environment_variable,
+    get_environment_variable_bool,
     get_environment_variable_int,
 )
 
 import util.inter_process_cache as cache
 
+# Interval for polling the graph change log, refreshing the worker services if required (in s)
+WORKERS_REFRESH_INTERVAL = 5
+
 
 # #############################################################################
 # Setup sensor connections and timeseries persistence
@@ -94,6 +103,7 @@ def init_database_data_if_not_available():
         time.sleep(10)
 
         setup_knowledge_graph()
+        GraphChangeLog.instance().record_change(change_type=GraphChangeTypes.FULL)
         import_binary_data()
         # generate_alternative_cad_format()
         logger.info("Finished initilization.")
@@ -110,14 +120,30 @@ def refresh_workers():
     detectors_container.refresh_annotation_detectors()
 
 
-def refresh_workers_thread_loop():
+def refresh_workers_thread_loop(refresh_runtime_connections: bool = True):
+    """
+    Polls the graph change log. The first poll loads all worker services
+    :param refresh_runtime_connections: False, if the runtime connections are run by the ingestion shards
+    (which poll the change log themselves)
+    :return:
+    """
+    runtime_con_container: RuntimeConnectionContainer = (
+        RuntimeConnectionContainer.instance()
+    )
+    detectors_container: AnnotationDetectorContainer = (
+        AnnotationDetectorContainer.instance()
+    )
     while True:
-        time.sleep(120)
-        logger.info("Refreshing worker services...")
+        # Cheap, if nothing changed. Only the changed parts are reloaded otherwise
+        # pylint: disable=W0703
+        try:
+            if refresh_runtime_connections:
+                runtime_con_container.apply_graph_changes()
+            detectors_container.apply_graph_changes()
+        except Exception as exc:
+            logger.info(f"Refreshing worker services failed: {exc}. Retrying...")
 
-        refresh_workers()
-
-        logger.info("Done refreshing worker services.")
+        time.sleep(WORKERS_REFRESH_INTERVAL)
 
 
 # #############################################################################
@@ -148,16 +174,34 @@ if __name__ == "__main__":
     # refresh_workers()
     # logger.info("Done loading worker services.")
 
-    # Thread checking regulary, if timeseries inputs, runtime-connections and annotation detectors have been added / removed
-    # workers_refresh_thread = Thread(target=refresh_workers_thread_loop)
-    # workers_refresh_thread.start()
+    # Sharded ingestion: runtime connections and their persistence are run by dedicated processes
+    ingestion_shards = get_environment_variable_int(
+        "INGESTION_SHARDS", optional=True, default=0
+    )
+    if ingestion_shards > 0:
+        IngestionSupervisor.instance().start(shard_count=ingestion_shards)
+
+    # Worker services (annotation detectors and, if not sharded, the timeseries inputs and runtime connections)
+    # are only run by instances enabling them explicitly
+    run_worker_services = get_environment_variable_bool(
+        "RUN_WORKER_SERVICES", optional=True, default="false"
+    )
+    if run_worker_services:
+        # Thread following the graph change log: loads and refreshes the worker services
+        workers_refresh_thread = Thread(
+            target=refresh_workers_thread_loop,
+            kwargs={"refresh_runtime_connections": ingestion_shards == 0},
+            daemon=True,
+        )
+        workers_refresh_thread.start()
 
     # Start cleanup thread deleting obsolete backups:
     start_storage_cleanup_thread()
 
-    # Start getting the connectivity status for runtime connections
-    # RuntimeConnectionContainer.instance().start_active_connections_status_thread()
-    # Start getting the connectivity status for runtime connections
+    # Start getting the connectivity status and publishing the metrics of the runtime connections, if run by this
+    # process (the ingestion shards report themselves otherwise)
+    if run_worker_services and ingestion_shards == 0:
+        RuntimeConnectionContainer.instance().start_active_connections_status_thread()
 
     # AnnotationDetectorContainer.instance().start_active_detectors_status_thread()
 
@@ -0,0 +1,264 @@
+"""
+Load simulator for the ingestion pipeline, replacing the learning factory hardware.
+Creates a synthetic knowledge graph of N assets and M time series, serves the time series via a local MQTT broker
+stand-in and an in-process OPC UA server at the configured rate and waveforms and reports the end-to-end latency of
+probe series (publish -> handled by the input incl. the detector stage -> persisted in InfluxDB).
+
+To be run next to the backend (e.g. inside the backend container, sharing InfluxDB, Neo4j and memcache). The
+backend connects to FACTORY_MQTT_HOST / FACTORY_OPC_UA_HOST, which therefore have to point to this simulator.
+
+Usage: python factory_load_simulator.py [--assets 100] [--timeseries 1000] [--rate-hz 1] [--duration 60]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from threading import Thread
+from typing import List
+
+import simpy.rt
+
+from load_simulation.latency_probe import LatencyProbe
+from load_simulation.mqtt_broker import MqttBrokerStandIn
+from load_simulation.opcua_server import SimulationOpcuaServer
+from load_simulation.synthetic_graph import (
+    INFLUX_DB_BUCKET,
+    INFLUX_DB_ORG,
+    IRI_PREFIX,
+    MQTT_CONNECTION_IRI,
+    MQTT_VALUE_KEYWORD,
+    OPC_UA_CONNECTION_IRI,
+    SimulatedSeries,
+    create_synthetic_graph,
+    delete_synthetic_graph,
+    get_asset_iri_for_series,
+)
+from load_simulation.waveforms import WAVEFORM_TYPES, Waveform
+from util.log import logger
+
+MQTT_TOPIC_PREFIX = "load_simulation"
+
+
+def _create_series(
+    asset_count: int,
+    series_count: int,
+    opcua_share: float,
+    opcua_server: SimulationOpcuaServer,
+) -> List[SimulatedSeries]:
+    opcua_count = round(series_count * opcua_share)
+    series = []
+    for i in range(series_count):
+        asset_iri = get_asset_iri_for_series(i, asset_count)
+        if i < opcua_count:
+            connection_iri = OPC_UA_CONNECTION_IRI
+            topic = opcua_server.get_node_id_string(f"ts_{i}")
+            keyword = None
+        else:
+            connection_iri = MQTT_CONNECTION_IRI
+            topic = f"{MQTT_TOPIC_PREFIX}/asset_{i % asset_count}/ts_{i}"
+            keyword = MQTT_VALUE_KEYWORD
+        series.append(
+            SimulatedSeries(
+                iri=f"{IRI_PREFIX}timeseries/ts_{i}",
+                id_short=f"load_simulation_ts_{i}",
+                asset_iri=asset_iri,
+                connection_iri=connection_iri,
+                connection_topic=topic,
+                connection_keyword=keyword,
+            )
+        )
+    return series
+
+
+class FactoryLoadSimulator:
+    """
+    The sources (broker and OPC UA server) run in an asyncio event loop in a separate thread. The readings are
+    scheduled by a simpy real-time environment (one process per series) and handed over to that loop.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self._rng = random.Random(args.seed)
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = Thread(target=self._loop.run_forever, daemon=True)
+
+        self.broker = MqttBrokerStandIn(host="0.0.0.0", port=args.mqtt_port)
+        self.opcua_server = SimulationOpcuaServer(port=args.opcua_port)
+        self.series: List[SimulatedSeries] = []
+        self.probe: LatencyProbe | None = None
+        self._probe_iris = set()
+        self.published_count = 0
+
+    def _run_in_loop(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def setup(self):
+        self._loop_thread.start()
+        self._run_in_loop(self.opcua_server.init())
+
+        self.series = _create_series(
+            self.args.assets,
+            self.args.timeseries,
+            self.args.opcua_share,
+            self.opcua_server,
+        )
+        opcua_names = [
+            f"ts_{i}"
+            for i, simulated in enumerate(self.series)
+            if simulated.connection_iri == OPC_UA_CONNECTION_IRI
+        ]
+        self._run_in_loop(self.opcua_server.add_variables(opcua_names))
+        self._run_in_loop(self.opcua_server.start())
+        self._run_in_loop(self.broker.start())
+
+        if not self.args.no_graph:
+            if self.args.replace:
+                logger.info("Deleting former simulated graph nodes...")
+                delete_synthetic_graph()
+            create_synthetic_graph(self.args.assets, self.series)
+
+        probe_step = max(1, len(self.series) // max(1, self.args.probes))
+        probe_iris = [s.iri for s in self.series[::probe_step][: self.args.probes]]
+        self.probe = LatencyProbe(
+            probe_iris, influx_bucket=INFLUX_DB_BUCKET, influx_org=INFLUX_DB_ORG
+        )
+        self._probe_iris = set(probe_iris)
+
+    def _publish_mqtt(self, simulated: SimulatedSeries, value: float):
+        reading_time = datetime.now(timezone.utc)
+        payload = json.dumps(
+            {"ts": reading_time.isoformat(), MQTT_VALUE_KEYWORD: value}
+        ).encode("utf-8")
+        if simulated.iri in self._probe_iris:
+            self.probe.record_publish(simulated.iri, reading_time)
+        self.broker.publish(simulated.connection_topic, payload)
+
+    async def _write_opcua(self, name: str, simulated: SimulatedSeries, value: float):
+        reading_time = datetime.now(timezone.utc)
+        if simulated.iri in self._probe_iris:
+            self.probe.record_publish(simulated.iri, reading_time)
+        await self.opcua_server.write(name, value, reading_time)
+
+    def _emit(self, index: int, simulated: SimulatedSeries, value: float):
+        """
+        Called in the simpy thread. Hands the reading over to the event loop of the sources
+        """
+        self.published_count += 1
+        if simulated.connection_iri == MQTT_CONNECTION_IRI:
+            self._loop.call_soon_threadsafe(self._publish_mqtt, simulated, value)
+        else:
+            asyncio.run_coroutine_threadsafe(
+                self._write_opcua(f"ts_{index}", simulated, value), self._loop
+            )
+
+    def _series_process(self, env, index: int, simulated: SimulatedSeries):
+        waveform = Waveform(self._rng.choice(self.args.waveforms), self._rng)
+        interval = 1 / self.args.rate_hz
+        # Spread the readings of the series over the interval
+        yield env.timeout(self._rng.uniform(0, interval))
+        while True:
+            self._emit(index, simulated, waveform.value(env.now))
+            yield env.timeout(interval)
+
+    def run(self):
+        env = simpy.rt.RealtimeEnvironment(factor=1, strict=False)
+        for index, simulated in enumerate(self.series):
+            env.process(self._series_process(env, index, simulated))
+
+        logger.info(
+            f"Simulating {len(self.series)} time series at {self.args.rate_hz} Hz "
+            f"({len(self.series) * self.args.rate_hz:.0f} readings/s). "
+            f"Warm-up: {self.args.warmup} s, measuring: {self.args.duration} s"
+        )
+        env.run(until=self.args.warmup)
+        self.probe.start()
+        start = time.perf_counter()
+        published_before = self.published_count
+        env.run(until=self.args.warmup + self.args.duration)
+        elapsed = time.perf_counter() - start
+
+        self.probe.stop()
+        self._print_report(
+            (self.published_count - published_before) / elapsed, elapsed
+        )
+
+    def _print_report(self, achieved_rate: float, elapsed: float):
+        print(
+            f"\nSimulated {len(self.series)} time series "
+            f"({self.args.assets} assets) for {elapsed:.1f} s\n"
+            f"Readings published: {self.published_count} "
+            f"(measuring phase: {achieved_rate:,.0f}/s, "
+            f"target: {len(self.series) * self.args.rate_hz:,.0f}/s)\n"
+            f"MQTT broker: {self.broker.published_count} published, "
+            f"{self.broker.delivered_count} delivered, "
+            f"{self.broker.dropped_count} dropped (slow subscriber)\n"
+            f"OPC UA server: {self.opcua_server.written_count} values written\n"
+        )
+        print(f"End-to-end latency of {len(self.probe.probe_iris)} probe series:")
+        print(self.probe.get_report())
+
+    def shutdown(self):
+        if not self._loop_thread.is_alive():
+            return
+        self._run_in_loop(self.broker.stop())
+        self._run_in_loop(self.opcua_server.stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=100)
+    parser.add_argument("--timeseries", type=int, default=1000)
+    parser.add_argument(
+        "--opcua-share",
+        type=float,
+        default=0.2,
+        help="Share of the time series served via OPC UA (the others via MQTT)",
+    )
+    parser.add_argument(
+        "--rate-hz", type=float, default=1.0, help="Readings per second per series"
+    )
+    parser.add_argument(
+        "--waveforms",
+        nargs="+",
+        choices=WAVEFORM_TYPES,
+        default=WAVEFORM_TYPES,
+        help="Waveforms randomly assigned to the series",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=60, help="Measuring time (in s)"
+    )
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=30,
+        help="Time for the backend to load the graph and connect (in s)",
+    )
+    parser.add_argument(
+        "--probes", type=int, default=20, help="Series used for measuring latencies"
+    )
+    parser.add_argument("--mqtt-port", type=int, default=1883)
+    parser.add_argument("--opcua-port", type=int, default=4840)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--no-graph",
+        action="store_true",
+        help="Do not create the knowledge graph (e.g. already created by a former run)",
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Delete all nodes of former simulations before creating the graph",
+    )
+    args = parser.parse_args()
+
+    simulator = FactoryLoadSimulator(args)
+    try:
+        simulator.setup()
+        simulator.run()
+    finally:
+        simulator.shutdown()
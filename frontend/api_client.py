@@ -12,6 +12,13 @@ from util.environment_and_configuration import (
     get_configuration,
     get_environment_variable,
 )
+from util.timeseries_wire_format import (
+    AGGREGATION_MAX_POINTS_HEADER,
+    AGGREGATION_METHOD_HEADER,
+    COUNT_HEADER,
+    TIMESERIES_MEDIA_TYPE,
+    decode_dataframe,
+)
 
 API_URI = (
     get_environment_variable("FAST_API_HOST")
@@ -54,15 +61,101 @@ def get_json(relative_path: str, retries: int = -1, timeout: int = 30, **kwargs)
                 _handle_request_exception(i)
 
 
+def _get_timeseries_response(
+    relative_path: str, retries: int = -1, timeout: int = 30, **kwargs
+):
+    """
+    Get request to the specified time-series endpoint, accepting the binary format
+    :param relative_path:
+    :param retries: how often to retry if the call failed. Negative numbners mean (about) unlimited.
+    :return: the response (binary or JSON)
+    """
+    range_limit = retries + 1 if retries >= 0 else 999999999999999999999999
+    for i in range(range_limit):
+        try:
+            return requests.get(
+                API_URI + relative_path,
+                params=kwargs,
+                headers={"Accept": f"{TIMESERIES_MEDIA_TYPE}, application/json"},
+                timeout=timeout,
+            )
+        except ReqExc:
+            if i < retries:
+                _handle_request_exception(i)
+
+
+def _is_binary_timeseries(response: requests.Response) -> bool:
+    return response.headers.get("content-type", "").startswith(TIMESERIES_MEDIA_TYPE)
+
+
+def _response_json(response: requests.Response):
+    resp_dict = response.json()
+    if isinstance(resp_dict, str):
+        # Sometimes, the json is still represented as string instead of dict
+        resp_dict = json.loads(resp_dict)
+    return resp_dict
+
+
+def _decode_binary_dataframe(response: requests.Response):
+    df = decode_dataframe(response.content)
+    df["time"] = df["time"].dt.tz_convert(
+        get_configuration(group=ConfigGroups.FRONTEND, key="timezone")
+    )
+    return df
+
+
 def get_dataframe(relative_path: str, **kwargs):
     """
-    Get request to the specified api endpoint. Deserializes to dataframe
+    Get request to the specified api endpoint. Deserializes to dataframe.
+    Numeric readings are transferred in the binary format (see util.timeseries_wire_format), others as JSON
     :param relative_path:
     :param retries: how often to retry if the call failed. Negative numbners mean (about) unlimited.
     :return:
     """
-    df_dict = get_json(relative_path=relative_path, **kwargs)
+    response = _get_timeseries_response(relative_path=relative_path, **kwargs)
+    if _is_binary_timeseries(response):
+        return _decode_binary_dataframe(response)
+
+    return json_to_dataframe(_response_json(response))
 
+
+def get_adaptive_range(relative_path: str, **kwargs) -> Dict | None:
+    """
+    Get request to the adaptive range endpoint. Deserializes the readings to dataframe
+    :param relative_path:
+    :param retries: how often to retry if the call failed. Negative numbners mean (about) unlimited.
+    :return: {"count", "aggregation", "data": dataframe} or None, if the database is not available
+    """
+    response = _get_timeseries_response(relative_path=relative_path, **kwargs)
+    if response is None:
+        return None
+
+    if _is_binary_timeseries(response):
+        method = response.headers.get(AGGREGATION_METHOD_HEADER)
+        return {
+            "count": int(response.headers[COUNT_HEADER]),
+            "aggregation": {
+                "method": method,
+                "max_points": int(response.headers[AGGREGATION_MAX_POINTS_HEADER]),
+            }
+            if method is not None
+            else None,
+            "data": _decode_binary_dataframe(response),
+        }
+
+    result = _response_json(response)
+    if result is None:
+        return None
+    result["data"] = json_to_dataframe(result["data"])
+    return result
+
+
+def json_to_dataframe(df_dict: Dict):
+    """
+    Deserializes a dataframe with the columns "time" and "value" (e.g. embedded in a larger response)
+    :param df_dict: dataframe serialized to JSON (iso dates), parsed to dict
+    :return:
+    """
     df = pd.DataFrame.from_dict(df_dict)
 
     # Convert string timestamp to actual tz data type
@@ -284,45 +284,21 @@ def update_timeseries_graph(
             tzinfo=selector_tz,
         )
 
-    # API call for the count of readings
-    readings_count_string = api_client.get_json(
-        relative_path="/timeseries/entries_count",
+    # API call for the readings at a resolution decided by the backend (including the count of readings)
+    adaptive_range = api_client.get_adaptive_range(
+        relative_path="/timeseries/adaptive_range",
         iri=selected_el.iri,
         duration=duration.total_seconds(),
         date_time_str=date_time.isoformat(),
+        max_points=int(TIMESERIES_MAX_DISPLAYED_ENTRIES),
     )
-    if readings_count_string is None:
+    if adaptive_range is None:
         # DB not available?
         return fig, "Database could not be reached.", None
 
-    readings_count = int(readings_count_string)
-
-    # Filtering to avoid loading to large readings datasets
-    if readings_count > TIMESERIES_MAX_DISPLAYED_ENTRIES:
-        if duration.total_seconds() > timedelta(days=2).total_seconds():
-            # More than two days -> use hourly aggregation
-            aggregation_window_s = timedelta(hours=1).total_seconds()
-        elif duration.total_seconds() > timedelta(hours=6).total_seconds():
-            aggregation_window_s = timedelta(minutes=10).total_seconds()
-        elif duration.total_seconds() > timedelta(hours=2).total_seconds():
-            aggregation_window_s = timedelta(minutes=1).total_seconds()
-        elif duration.total_seconds() > timedelta(minutes=10).total_seconds():
-            aggregation_window_s = timedelta(seconds=1).total_seconds()
-        else:
-            aggregation_window_s = timedelta(milliseconds=100).total_seconds()
-
-        aggregation_window_ms = int(aggregation_window_s * 1000)
-    else:
-        aggregation_window_ms = None
-
-    # API call for the readings
-    data = api_client.get_dataframe(
-        relative_path="/timeseries/range",
-        iri=selected_el.iri,
-        duration=duration.total_seconds(),
-        date_time_str=date_time.isoformat(),
-        aggregation_window_ms=aggregation_window_ms,
-    )
+    readings_count = int(adaptive_range["count"])
+    aggregation = adaptive_range["aggregation"]
+    data = adaptive_range["data"]
 
     fig.add_trace(
         trace={
@@ -370,11 +346,11 @@ def update_timeseries_graph(
         html.Div(
             [
                 html.Div("Aggregated view! ", style={"font-weight": "bold"}),
-                f"Only showing first readings per {timedelta(milliseconds=aggregation_window_ms)} (h:m:s).",
+                f"Only showing {len(data)} readings, downsampled preserving peaks ({aggregation['method']}).",
             ],
             style={"padding-top": "5px"},
         )
-        if aggregation_window_ms is not None
+        if aggregation is not None
         else ""
     )
 
@@ -53,6 +53,14 @@ class DatabaseConnectionNode(BaseNode):
     # Group / bucket in which the connections lay
     group: str | None = Property()  # may be none
 
+    # Buffered writing (only for timeseries databases). Defaults are used if not given:
+    # Max. count of readings per write request
+    write_batch_size: int | None = Property(default=None)
+    # Max. time a reading is buffered before being written (in ms)
+    write_flush_interval_ms: int | None = Property(default=None)
+    # Max. count of readings held in memory before readings are dropped
+    write_queue_size: int | None = Property(default=None)
+
     def validate_metamodel_conformance(self):
         """
         Used to validate if the current node (self) and its child elements is conformant to the defined metamodel.
@@ -49,6 +49,23 @@ class RuntimeConnectionNode(BaseNode):
     # Type of connection
     type: str = Property()
 
+    # Default interval in which the timeseries of this connection are sampled (in ms, only for polling-based
+    # connections). Optional: a global default is used if not given
+    sampling_interval_ms: int | None = Property(default=None)
+
+    # Format of the timestamps contained in the messages (only for message-based connections, e.g. MQTT):
+    # ISO_8601, EPOCH_S, EPOCH_MS, EPOCH_US, EPOCH_NS or a strptime format. Optional: ISO 8601 if not given
+    timestamp_format: str | None = Property(default=None)
+
+    # Number of configured sibling topics from which on they are subscribed by one wildcard subscription (only for
+    # MQTT). Only sensible, if the configured topics cover most of their topic level at the broker, as not
+    # configured topics are received and discarded as well. Optional: no wildcard consolidation if not given
+    wildcard_min_siblings: int | None = Property(default=None)
+
+    # Whether only changed values are reported (subscription-based) instead of sampling every interval
+    # (polling-based). Only for OPC UA. Optional: polling-based if not given
+    only_changes: bool | None = Property(default=None)
+
     # Info: the actual host, port and if required passwords are not provided by the context-graph but via environmental variables instead
 
     def validate_metamodel_conformance(self):
@@ -71,3 +88,14 @@ class RuntimeConnectionNode(BaseNode):
             raise GraphNotConformantToMetamodelError(
                 self, f"Unrecognized connection type."
             )
+
+        if self.sampling_interval_ms is not None and self.sampling_interval_ms <= 0:
+            raise GraphNotConformantToMetamodelError(
+                self, f"Invalid sampling interval: {self.sampling_interval_ms}"
+            )
+
+        if self.wildcard_min_siblings is not None and self.wildcard_min_siblings < 2:
+            raise GraphNotConformantToMetamodelError(
+                self,
+                f"Invalid min. number of siblings for wildcards: {self.wildcard_min_siblings}",
+            )
@@ -55,6 +55,21 @@ class TimeseriesNodeFlat(BaseNode):
     # Type of the value stored per time
     value_type: str = Property(default=TimeseriesValueTypes.DECIMAL.value)
 
+    # Interval in which the value is sampled (in ms, only for polling-based connections).
+    # Optional: the interval of the runtime connection is used if not given
+    sampling_interval_ms: int | None = Property(default=None)
+
+    # Ingestion-time compression (optional): readings are only persisted, if they differ from the last persisted one
+    # by more than the deadband (absolute or percent of the last value, numeric series only)...
+    deadband_absolute: float | None = Property(default=None)
+    deadband_percent: float | None = Property(default=None)
+    # ... if they changed at all (intended for boolean and string series)...
+    change_only: bool | None = Property(default=None)
+    # ... or if they leave the swinging door corridor with that deviation (numeric series only).
+    swinging_door_deviation: float | None = Property(default=None)
+    # Max. time without persisting a reading (in ms), even if suppressed by the filters above
+    max_heartbeat_ms: int | None = Property(default=None)
+
     # Extracted features
     _feature_dict: str | None = Property(key="feature_dict")
     _reduced_feature_list: str | None = Property(key="reduced_feature_list")
@@ -92,6 +107,27 @@ class TimeseriesNodeFlat(BaseNode):
         if self.connection_topic is None:
             raise GraphNotConformantToMetamodelError(self, f"Missing connection topic")
 
+        if self.sampling_interval_ms is not None and self.sampling_interval_ms <= 0:
+            raise GraphNotConformantToMetamodelError(
+                self, f"Invalid sampling interval: {self.sampling_interval_ms}"
+            )
+
+        for compression_property in [
+            "deadband_absolute",
+            "deadband_percent",
+            "swinging_door_deviation",
+        ]:
+            value = getattr(self, compression_property)
+            if value is not None and value < 0:
+                raise GraphNotConformantToMetamodelError(
+                    self, f"Invalid {compression_property}: {value}"
+                )
+
+        if self.max_heartbeat_ms is not None and self.max_heartbeat_ms <= 0:
+            raise GraphNotConformantToMetamodelError(
+                self, f"Invalid max. heartbeat interval: {self.max_heartbeat_ms}"
+            )
+
 
 @dataclass
 @dataclass_json
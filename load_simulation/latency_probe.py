@@ -0,0 +1,163 @@
+"""
+Measures the end-to-end latency of selected (probe) time series: from publishing a reading at the simulated source
+until it is visible at the different stages of the ingestion pipeline.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List
+
+from influxdb_client import InfluxDBClient
+
+from backend.runtime_connections.LastValueCache import LastValueCache
+from backend.specialized_databases.timeseries.influx_db.InfluxDbPersistenceService import (
+    READING_FIELD_NAME,
+)
+from util.environment_and_configuration import get_environment_variable
+from util.log import logger
+
+# Handled by all registered handlers of the input (the detectors receive the reading at the same stage). Includes
+# the flush interval of the last value cache
+STAGE_HANDLED = "handled (last value cache)"
+STAGE_PERSISTED = "persisted (InfluxDB)"
+STAGES = [STAGE_HANDLED, STAGE_PERSISTED]
+
+POLL_INTERVAL = 0.05  # (in s)
+# Publish times remembered per probe series for matching the observed readings
+MAX_PENDING_PUBLISHES = 10_000
+PERCENTILES = [50, 95, 99]
+
+
+def _reading_key(reading_time: datetime) -> int:
+    # Microseconds: resolution preserved by MQTT (ISO 8601), OPC UA and InfluxDB
+    if reading_time.tzinfo is None:
+        # OPC UA source timestamps are naive UTC
+        reading_time = reading_time.replace(tzinfo=timezone.utc)
+    return round(reading_time.timestamp() * 1_000_000)
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    # Nearest-rank method
+    index = max(0, int(len(sorted_values) * percentile / 100 + 0.5) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class LatencyProbe:
+    """
+    Only the newest reading of a series is observed per poll, so the latencies are sampled (at most one per poll and
+    series). Observed latencies include up to one poll interval.
+    """
+
+    def __init__(self, probe_iris: List[str], influx_bucket: str, influx_org: str):
+        self.probe_iris = probe_iris
+        self._influx_bucket = influx_bucket
+
+        # iri -> reading key -> publish time (perf_counter)
+        self._publishes: Dict[str, OrderedDict[int, float]] = {
+            iri: OrderedDict() for iri in probe_iris
+        }
+        self._lock = Lock()
+        # stage -> iri -> newest observed reading key
+        self._observed: Dict[str, Dict[str, int]] = {stage: {} for stage in STAGES}
+        self._latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self._stop_event = Event()
+        self._threads: List[Thread] = []
+
+        self._influx_client = InfluxDBClient(
+            url=get_environment_variable("INFLUX_DB_HOST")
+            + ":"
+            + get_environment_variable("INFLUX_DB_PORT"),
+            token=get_environment_variable("INFLUX_DB_TOKEN", optional=True),
+            org=influx_org,
+        )
+        self._query_api = self._influx_client.query_api()
+
+    def record_publish(self, iri: str, reading_time: datetime):
+        """
+        Called when the simulated source publishes a reading of a probe series
+        """
+        publishes = self._publishes[iri]
+        with self._lock:
+            publishes[_reading_key(reading_time)] = time.perf_counter()
+            if len(publishes) > MAX_PENDING_PUBLISHES:
+                publishes.popitem(last=False)
+
+    def _observe(self, stage: str, iri: str, reading_time: datetime):
+        key = _reading_key(reading_time)
+        if self._observed[stage].get(iri) == key:
+            return
+        self._observed[stage][iri] = key
+
+        with self._lock:
+            publish_time = self._publishes[iri].get(key)
+        if publish_time is not None:
+            self._latencies[stage].append(time.perf_counter() - publish_time)
+
+    def _poll_handled(self):
+        latest_readings = LastValueCache.instance().get_latest(self.probe_iris)
+        for iri, latest in latest_readings.items():
+            if latest is not None:
+                self._observe(
+                    STAGE_HANDLED, iri, datetime.fromisoformat(latest["time"])
+                )
+
+    def _poll_persisted(self):
+        measurement_filter = " or ".join(
+            f'r["_measurement"] == "{iri}"' for iri in self.probe_iris
+        )
+        query = (
+            f'from(bucket:"{self._influx_bucket}")'
+            f"|> range(start: -1m) "
+            f'|> filter(fn: (r) => r["_field"] == "{READING_FIELD_NAME}") '
+            f"|> filter(fn: (r) => {measurement_filter}) "
+            f"|> last()"
+        )
+        for table in self._query_api.query(query=query):
+            for record in table.records:
+                self._observe(
+                    STAGE_PERSISTED, record.get_measurement(), record.get_time()
+                )
+
+    def _poll_loop(self, poll_method: Callable):
+        while not self._stop_event.is_set():
+            # pylint: disable=W0703
+            try:
+                poll_method()
+            except Exception as exc:
+                logger.info(f"Latency probe polling failed: {exc}")
+            self._stop_event.wait(POLL_INTERVAL)
+
+    def start(self):
+        if len(self.probe_iris) == 0:
+            return
+        for poll_method in [self._poll_handled, self._poll_persisted]:
+            thread = Thread(target=self._poll_loop, args=(poll_method,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        self._influx_client.close()
+
+    def get_report(self) -> str:
+        """
+        :return: table with count, percentiles and max. of the latencies per stage (in ms)
+        """
+        header = f"{'stage':<28} | {'samples':>8} | " + " | ".join(
+            f"{'p' + str(percentile):>8}" for percentile in PERCENTILES
+        )
+        lines = [header + f" | {'max':>8}   (ms)", "-" * (len(header) + 16)]
+        for stage in STAGES:
+            latencies = sorted(self._latencies[stage])
+            if len(latencies) == 0:
+                lines.append(f"{stage:<28} | {0:>8} | no readings observed")
+                continue
+            values = [_percentile(latencies, p) for p in PERCENTILES] + [latencies[-1]]
+            lines.append(
+                f"{stage:<28} | {len(latencies):>8} | "
+                + " | ".join(f"{value * 1000:>8.1f}" for value in values)
+            )
+        return "\n".join(lines)
@@ -0,0 +1,181 @@
+"""
+Minimal MQTT 3.1.1 broker for load tests without an external broker.
+Supports what the runtime connections need: CONNECT, SUBSCRIBE / UNSUBSCRIBE with wildcards, PUBLISH with QoS 0 and 1
+(delivered with QoS 0), PINGREQ and DISCONNECT. No authentication, retained messages or persistent sessions.
+"""
+import asyncio
+import struct
+from typing import List, Set
+
+from backend.runtime_connections.mqtt.MqttTopicTrie import MqttTopicTrie
+from util.log import logger
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+# Messages for a subscriber are dropped, while that much is waiting to be sent to it (in bytes)
+MAX_PENDING_BYTES_PER_SUBSCRIBER = 16 * 1024 * 1024
+
+
+def _encode_remaining_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length > 0:
+            byte |= 0x80
+        encoded.append(byte)
+        if length == 0:
+            return bytes(encoded)
+
+
+def _encode_string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    return struct.pack("!H", len(encoded)) + encoded
+
+
+def _decode_string(data: bytes, position: int):
+    (length,) = struct.unpack_from("!H", data, position)
+    start = position + 2
+    return data[start : start + length].decode("utf-8"), start + length
+
+
+def _packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    return (
+        bytes([packet_type << 4 | flags]) + _encode_remaining_length(len(body)) + body
+    )
+
+
+class _ClientSession:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.subscriptions: Set[str] = set()
+
+
+class MqttBrokerStandIn:
+    """
+    Runs in the event loop it was started in. publish() has to be called from that loop
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._server: asyncio.AbstractServer | None = None
+        self._sessions: List[_ClientSession] = []
+        self._subscribers: MqttTopicTrie[_ClientSession] = MqttTopicTrie()
+
+        # Statistics
+        self.published_count = 0
+        self.delivered_count = 0
+        self.dropped_count = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port
+        )
+        logger.info(f"MQTT broker stand-in listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        for session in list(self._sessions):
+            session.writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _rebuild_subscribers(self):
+        subscribers: MqttTopicTrie[_ClientSession] = MqttTopicTrie()
+        for session in self._sessions:
+            for topic_filter in session.subscriptions:
+                subscribers.add(topic_filter, session)
+        self._subscribers = subscribers
+
+    def publish(self, topic: str, payload: bytes):
+        """
+        Delivers the message to all subscribers of matching topic filters (QoS 0)
+        """
+        self.published_count += 1
+        sessions = self._subscribers.match(topic)
+        if len(sessions) == 0:
+            return
+
+        packet = _packet(PUBLISH, 0, _encode_string(topic) + payload)
+        # Overlapping filters of one client: delivered only once
+        for session in set(sessions):
+            transport = session.writer.transport
+            if transport.get_write_buffer_size() > MAX_PENDING_BYTES_PER_SUBSCRIBER:
+                self.dropped_count += 1
+                continue
+            session.writer.write(packet)
+            self.delivered_count += 1
+
+    async def _read_packet(self, reader: asyncio.StreamReader):
+        header = await reader.readexactly(1)
+        length = 0
+        multiplier = 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            if byte & 0x80 == 0:
+                break
+            multiplier *= 128
+        body = await reader.readexactly(length) if length > 0 else b""
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        session = _ClientSession(writer)
+        self._sessions.append(session)
+        try:
+            while True:
+                packet_type, flags, body = await self._read_packet(reader)
+
+                if packet_type == CONNECT:
+                    # Session present: 0, return code: accepted
+                    writer.write(_packet(CONNACK, 0, b"\x00\x00"))
+                elif packet_type == PUBLISH:
+                    qos = (flags >> 1) & 0x03
+                    topic, position = _decode_string(body, 0)
+                    if qos > 0:
+                        packet_id = body[position : position + 2]
+                        position += 2
+                        writer.write(_packet(PUBACK, 0, packet_id))
+                    self.publish(topic, body[position:])
+                elif packet_type == SUBSCRIBE:
+                    packet_id = body[0:2]
+                    position = 2
+                    granted = bytearray()
+                    while position < len(body):
+                        topic_filter, position = _decode_string(body, position)
+                        position += 1  # requested QoS
+                        session.subscriptions.add(topic_filter)
+                        granted.append(0)
+                    self._rebuild_subscribers()
+                    writer.write(_packet(SUBACK, 0, packet_id + bytes(granted)))
+                elif packet_type == UNSUBSCRIBE:
+                    packet_id = body[0:2]
+                    position = 2
+                    while position < len(body):
+                        topic_filter, position = _decode_string(body, position)
+                        session.subscriptions.discard(topic_filter)
+                    self._rebuild_subscribers()
+                    writer.write(_packet(UNSUBACK, 0, packet_id))
+                elif packet_type == PINGREQ:
+                    writer.write(_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.remove(session)
+            self._rebuild_subscribers()
+            writer.close()
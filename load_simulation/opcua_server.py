@@ -0,0 +1,72 @@
+"""
+In-process OPC UA server exposing one variable per simulated time series
+"""
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from asyncua import Server, ua
+
+from util.log import logger
+
+NAMESPACE_URI = "http://www.sintef.no/sindit/load_simulation"
+OBJECT_NAME = "LoadSimulation"
+
+
+class SimulationOpcuaServer:
+    def __init__(self, port: int):
+        self.port = port
+        self._server = Server()
+        self.namespace_index: int | None = None
+        self._variables: Dict[str, ua.NodeId] = dict()
+
+        # Statistics
+        self.written_count = 0
+
+    async def init(self):
+        """
+        Initializes the server and registers the namespace (required before creating the variables)
+        """
+        await self._server.init()
+        self._server.set_endpoint(f"opc.tcp://0.0.0.0:{self.port}")
+        self._server.set_server_name("SINDIT load simulation")
+        self.namespace_index = await self._server.register_namespace(NAMESPACE_URI)
+
+    def get_node_id_string(self, name: str) -> str:
+        """
+        :return: node id as used as connection topic of the timeseries nodes
+        """
+        return f"ns={self.namespace_index};s={name}"
+
+    async def add_variables(self, names: List[str]):
+        simulation_object = await self._server.nodes.objects.add_object(
+            self.namespace_index, OBJECT_NAME
+        )
+        for name in names:
+            variable = await simulation_object.add_variable(
+                ua.NodeId(name, self.namespace_index), name, 0.0
+            )
+            self._variables[name] = variable.nodeid
+
+    async def start(self):
+        await self._server.start()
+        logger.info(f"OPC UA server listening on port {self.port}")
+
+    async def stop(self):
+        await self._server.stop()
+
+    async def write(self, name: str, value: float, source_time: datetime):
+        """
+        Writes the value with the given source timestamp (notifying subscribed clients)
+        """
+        if source_time.tzinfo is not None:
+            # OPC UA timestamps are handled as naive UTC datetimes by asyncua
+            source_time = source_time.astimezone(timezone.utc).replace(tzinfo=None)
+        await self._server.write_attribute_value(
+            self._variables[name],
+            ua.DataValue(
+                ua.Variant(value, ua.VariantType.Double),
+                SourceTimestamp=source_time,
+                ServerTimestamp=source_time,
+            ),
+        )
+        self.written_count += 1
@@ -0,0 +1,163 @@
+"""
+Generates a synthetic knowledge graph (assets, time series and their connections) for load tests
+"""
+from dataclasses import dataclass
+from typing import Dict, List
+
+from backend.knowledge_graph.GraphChangeLog import GraphChangeLog, GraphChangeTypes
+from backend.knowledge_graph.KnowledgeGraphPersistenceService import (
+    KnowledgeGraphPersistenceService,
+)
+from graph_domain.factory_graph_types import NodeTypes, RelationshipTypes
+from graph_domain.main_digital_twin.DatabaseConnectionNode import (
+    DatabaseConnectionTypes,
+)
+from graph_domain.main_digital_twin.RuntimeConnectionNode import RuntimeConnectionTypes
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+from util.log import logger
+
+IRI_PREFIX = "www.sintef.no/aas_identifiers/load_simulation/"
+DB_CONNECTION_IRI = IRI_PREFIX + "databases/influx_db"
+MQTT_CONNECTION_IRI = IRI_PREFIX + "connections/mqtt"
+OPC_UA_CONNECTION_IRI = IRI_PREFIX + "connections/opc_ua"
+
+# Organization and bucket of the timeseries database
+INFLUX_DB_ORG = "sindit"
+INFLUX_DB_BUCKET = "sindit"
+
+# JSON key of the value in the MQTT payloads
+MQTT_VALUE_KEYWORD = "value"
+
+# Time series created per query
+CREATE_CHUNK_SIZE = 1000
+
+
+@dataclass
+class SimulatedSeries:
+    iri: str
+    id_short: str
+    asset_iri: str
+    connection_iri: str
+    # MQTT topic or OPC UA node id
+    connection_topic: str
+    connection_keyword: str | None
+
+
+def _asset_iri(index: int) -> str:
+    return f"{IRI_PREFIX}assets/asset_{index}"
+
+
+def get_asset_nodes(asset_count: int) -> List[Dict]:
+    return [
+        {
+            "iri": _asset_iri(i),
+            "id_short": f"load_simulation_asset_{i}",
+            "caption": f"Simulated asset {i}",
+            "description": "Generated by the factory load simulator",
+        }
+        for i in range(asset_count)
+    ]
+
+
+def get_asset_iri_for_series(series_index: int, asset_count: int) -> str:
+    return _asset_iri(series_index % asset_count)
+
+
+def delete_synthetic_graph():
+    """
+    Removes all nodes created by former simulations
+    """
+    KnowledgeGraphPersistenceService.instance().graph.run(
+        "MATCH (n) WHERE n.iri STARTS WITH $prefix DETACH DELETE n",
+        prefix=IRI_PREFIX,
+    )
+
+
+def create_synthetic_graph(asset_count: int, series: List[SimulatedSeries]):
+    """
+    Creates the assets, the time series and their database and runtime connections. The connections use the same
+    environment variables as the learning factory (FACTORY_MQTT_HOST, FACTORY_OPC_UA_HOST...), so that the backend
+    connects to the simulator without further configuration.
+    Notifies the backend workers via the graph change log.
+    :param asset_count:
+    :param series:
+    :return:
+    """
+    graph = KnowledgeGraphPersistenceService.instance().graph
+
+    logger.info("Creating the connection nodes...")
+    db_label = NodeTypes.DATABASE_CONNECTION.value
+    connection_label = NodeTypes.RUNTIME_CONNECTION.value
+    graph.run(
+        f"MERGE (db:{db_label} {{iri: $db.iri}}) SET db += $db "
+        f"MERGE (mqtt:{connection_label} {{iri: $mqtt.iri}}) SET mqtt += $mqtt "
+        f"MERGE (opcua:{connection_label} {{iri: $opcua.iri}}) SET opcua += $opcua",
+        db={
+            "iri": DB_CONNECTION_IRI,
+            "id_short": "load_simulation_influx_db",
+            "caption": "Load simulation InfluxDB connection",
+            "type": DatabaseConnectionTypes.INFLUX_DB.value,
+            "host_environment_variable": "INFLUX_DB_HOST",
+            "port_environment_variable": "INFLUX_DB_PORT",
+            "key_environment_variable": "INFLUX_DB_TOKEN",
+            "database": INFLUX_DB_ORG,
+            "group": INFLUX_DB_BUCKET,
+        },
+        mqtt={
+            "iri": MQTT_CONNECTION_IRI,
+            "id_short": "load_simulation_mqtt",
+            "caption": "Load simulation MQTT connection",
+            "type": RuntimeConnectionTypes.MQTT.value,
+            "host_environment_variable": "FACTORY_MQTT_HOST",
+            "port_environment_variable": "FACTORY_MQTT_PORT",
+        },
+        opcua={
+            "iri": OPC_UA_CONNECTION_IRI,
+            "id_short": "load_simulation_opc_ua",
+            "caption": "Load simulation OPC UA connection",
+            "type": RuntimeConnectionTypes.OPC_UA.value,
+            "host_environment_variable": "FACTORY_OPC_UA_HOST",
+            "port_environment_variable": "FACTORY_OPC_UA_PORT",
+        },
+    )
+
+    logger.info(f"Creating {asset_count} assets...")
+    graph.run(
+        f"UNWIND $assets AS asset "
+        f"MERGE (a:{NodeTypes.ASSET.value} {{iri: asset.iri}}) SET a += asset",
+        assets=get_asset_nodes(asset_count),
+    )
+
+    logger.info(f"Creating {len(series)} time series...")
+    for start in range(0, len(series), CREATE_CHUNK_SIZE):
+        rows = [
+            {
+                "asset_iri": simulated.asset_iri,
+                "connection_iri": simulated.connection_iri,
+                "properties": {
+                    "iri": simulated.iri,
+                    "id_short": simulated.id_short,
+                    "caption": simulated.id_short,
+                    "description": "Generated by the factory load simulator",
+                    "connection_topic": simulated.connection_topic,
+                    "connection_keyword": simulated.connection_keyword,
+                    "value_type": TimeseriesValueTypes.DECIMAL.value,
+                },
+            }
+            for simulated in series[start : start + CREATE_CHUNK_SIZE]
+        ]
+        graph.run(
+            f"MATCH (db:{db_label} {{iri: $db_iri}}) "
+            f"UNWIND $rows AS row "
+            f"MATCH (a:{NodeTypes.ASSET.value} {{iri: row.asset_iri}}) "
+            f"MATCH (c:{connection_label} {{iri: row.connection_iri}}) "
+            f"MERGE (t:{NodeTypes.TIMESERIES_INPUT.value} {{iri: row.properties.iri}}) "
+            f"SET t += row.properties "
+            f"MERGE (a)-[:{RelationshipTypes.HAS_TIMESERIES.value}]->(t) "
+            f"MERGE (t)-[:{RelationshipTypes.RUNTIME_ACCESS.value}]->(c) "
+            f"MERGE (t)-[:{RelationshipTypes.TIMESERIES_DB_ACCESS.value}]->(db)",
+            db_iri=DB_CONNECTION_IRI,
+            rows=rows,
+        )
+
+    GraphChangeLog.instance().record_change(change_type=GraphChangeTypes.FULL)
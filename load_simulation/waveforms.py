@@ -0,0 +1,50 @@
+"""
+Synthetic signal shapes for the simulated time series
+"""
+import math
+import random
+from enum import Enum
+
+
+class WaveformTypes(Enum):
+    SINE = "SINE"
+    SQUARE = "SQUARE"
+    SAWTOOTH = "SAWTOOTH"
+    RANDOM_WALK = "RANDOM_WALK"
+    NOISE = "NOISE"
+
+
+WAVEFORM_TYPES = [waveform.value for waveform in WaveformTypes]
+
+
+class Waveform:
+    """
+    One signal with random amplitude, period, offset and phase. Evaluated at a time in seconds
+    """
+
+    def __init__(self, waveform_type: str, rng: random.Random):
+        self.waveform_type = waveform_type
+        self.amplitude = rng.uniform(1, 100)
+        self.offset = rng.uniform(-50, 50)
+        self.period = rng.uniform(5, 120)  # (in s)
+        self.phase = rng.uniform(0, 1)
+        self.noise = self.amplitude * 0.01
+        self._rng = rng
+        self._walk_value = self.offset
+
+    def value(self, t: float) -> float:
+        cycle = (t / self.period + self.phase) % 1
+
+        if self.waveform_type == WaveformTypes.SINE.value:
+            value = self.offset + self.amplitude * math.sin(2 * math.pi * cycle)
+        elif self.waveform_type == WaveformTypes.SQUARE.value:
+            value = self.offset + (self.amplitude if cycle < 0.5 else -self.amplitude)
+        elif self.waveform_type == WaveformTypes.SAWTOOTH.value:
+            value = self.offset + self.amplitude * (2 * cycle - 1)
+        elif self.waveform_type == WaveformTypes.RANDOM_WALK.value:
+            self._walk_value += self._rng.gauss(0, self.amplitude * 0.02)
+            return self._walk_value
+        else:
+            return self.offset + self._rng.gauss(0, self.amplitude)
+
+        return value + self._rng.gauss(0, self.noise)
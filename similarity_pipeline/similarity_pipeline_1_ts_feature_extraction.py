@@ -19,6 +19,16 @@ from similarity_pipeline.similarity_pipeline_status_manager import (
 )
 from util.log import logger
 
+# Time-series whose readings are loaded at once (one batch read per database)
+FEATURE_EXTRACTION_BATCH_SIZE = 100
+# Time-series with more readings in the comparison range are skipped
+FEATURE_EXTRACTION_MAX_ENTRIES = 10000
+SUPPORTED_VALUE_TYPES = [
+    TimeseriesValueTypes.DECIMAL.value,
+    TimeseriesValueTypes.INT.value,
+    TimeseriesValueTypes.BOOL.value,
+]
+
 
 # #############################################################################
 # Timeseries feature extraction
@@ -64,48 +74,60 @@ def similarity_pipeline_1_ts_feature_extraction():
     i = 1
     pipeline_start_datetime = datetime.now()
     logger.info(f"Timeseries analysis started at {pipeline_start_datetime}")
+    ts_entry_counts: Dict[str, int] = dict()
+    ts_range_dfs: Dict[str, pd.DataFrame] = dict()
     timeseries_node: TimeseriesNodeFlat
-    for timeseries_node in timeseries_nodes:
+    for node_index, timeseries_node in enumerate(timeseries_nodes):
+        if node_index % FEATURE_EXTRACTION_BATCH_SIZE == 0:
+            # Next batch of supported time-series, instead of one count and range query per series: counted first,
+            # so that only the readings of series not exceeding FEATURE_EXTRACTION_MAX_ENTRIES are loaded
+            batch_iris = [
+                node.iri
+                for node in timeseries_nodes[
+                    node_index : node_index + FEATURE_EXTRACTION_BATCH_SIZE
+                ]
+                if node.value_type in SUPPORTED_VALUE_TYPES
+            ]
+            ts_entry_counts = timeseries_endpoints.get_timeseries_batch_entries_count(
+                iris=batch_iris,
+                date_time=comparison_end_date_time,
+                duration=comparison_duration,
+            )
+            ts_range_dfs = timeseries_endpoints.get_timeseries_batch_range(
+                iris=[
+                    iri
+                    for iri in batch_iris
+                    if ts_entry_counts[iri] <= FEATURE_EXTRACTION_MAX_ENTRIES
+                ],
+                date_time=comparison_end_date_time,
+                duration=comparison_duration,
+                aggregation_window_ms=None,  # raw values
+            )
+
         pipeline_single_node_start_datetime = datetime.now()
 
         logger.info(
             f"\n\nAnalyzing timeseries {i} of {len(timeseries_nodes)}: {timeseries_node.id_short}"
         )
-        # Note that this can result in very large ranges, if enough data is present!
-        ts_entry_count = timeseries_endpoints.get_timeseries_entries_count(
-            iri=timeseries_node.iri,
-            date_time=comparison_end_date_time,
-            duration=comparison_duration,
-        )
+        ts_range_df = ts_range_dfs.get(timeseries_node.iri)
+        ts_entry_count = ts_entry_counts.get(timeseries_node.iri, 0)
         logger.info(f"Total entry count: {ts_entry_count}")
 
-        if ts_entry_count > 10000:
+        if ts_entry_count > FEATURE_EXTRACTION_MAX_ENTRIES:
             logger.warning(
-                f"Skipped extracting features for {timeseries_node.caption} because it has over 10000 entries."
+                f"Skipped extracting features for {timeseries_node.caption} because it has over {FEATURE_EXTRACTION_MAX_ENTRIES} entries."
             )
             continue
 
         # Separate datatypes: Decimal and Integer is the standard, bool to int (0 and 1) and string time-series are ignored
-        if timeseries_node.value_type in [
-            TimeseriesValueTypes.DECIMAL.value,
-            TimeseriesValueTypes.INT.value,
-            TimeseriesValueTypes.BOOL.value,
-        ]:
-            logger.info("Loading dataframe...")
-            ts_range_df = timeseries_endpoints.get_timeseries_range(
-                iri=timeseries_node.iri,
-                date_time=comparison_end_date_time,
-                duration=comparison_duration,
-                aggregation_window_ms=None,  # raw values
-            )
-
+        if timeseries_node.value_type in SUPPORTED_VALUE_TYPES:
             # Add id row that is required by tsfresh
             ts_range_df.insert(loc=0, column="id", value=0)
 
             if timeseries_node.value_type == TimeseriesValueTypes.BOOL.value:
                 ts_range_df["value"] = ts_range_df["value"].map({True: 1, False: 0})
 
-            logger.info("Finished loading dataframe. Extracting features...")
+            logger.info("Extracting features...")
             extracted_features: pd.DataFrame = extract_features(
                 ts_range_df, column_id="id", column_sort="time", column_value="value"
             )
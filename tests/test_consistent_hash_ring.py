@@ -0,0 +1,56 @@
+from collections import Counter
+
+from backend.runtime_connections.ConsistentHashRing import ConsistentHashRing
+
+KEYS = [f"http://www.sintef.no/aas_identifiers/connection_{i}" for i in range(2000)]
+
+
+def _assignment(ring: ConsistentHashRing) -> dict:
+    return {key: ring.get_member(key) for key in KEYS}
+
+
+def test_empty_ring():
+    ring = ConsistentHashRing([])
+    assert ring.members == []
+    assert ring.get_member("key") is None
+
+
+def test_members_are_sorted_and_unique():
+    assert ConsistentHashRing([2, 0, 1, 2]).members == [0, 1, 2]
+
+
+def test_mapping_is_stable():
+    # Independent of the order of the members and of the process (no salted hash)
+    assert _assignment(ConsistentHashRing([0, 1, 2])) == _assignment(
+        ConsistentHashRing([2, 1, 0])
+    )
+
+
+def test_single_member_gets_all_keys():
+    ring = ConsistentHashRing(["shard"])
+    assert set(_assignment(ring).values()) == {"shard"}
+
+
+def test_keys_are_distributed():
+    counts = Counter(_assignment(ConsistentHashRing(range(4))).values())
+    assert set(counts.keys()) == {0, 1, 2, 3}
+    for count in counts.values():
+        assert count > len(KEYS) / 4 / 2
+
+
+def test_only_keys_of_a_removed_member_move():
+    before = _assignment(ConsistentHashRing(range(4)))
+    after = _assignment(ConsistentHashRing([0, 1, 3]))
+    for key in KEYS:
+        if before[key] != 2:
+            assert after[key] == before[key]
+        else:
+            assert after[key] != 2
+
+
+def test_only_keys_of_an_added_member_move():
+    before = _assignment(ConsistentHashRing(range(3)))
+    after = _assignment(ConsistentHashRing(range(4)))
+    moved = [key for key in KEYS if after[key] != before[key]]
+    assert len(moved) > 0
+    assert all(after[key] == 3 for key in moved)
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from backend.specialized_databases.timeseries.downsampling import (
+    DownsamplingMethods,
+    StreamingDownsampler,
+    lttb_indices,
+)
+
+LTTB = DownsamplingMethods.LTTB.value
+MIN_MAX = DownsamplingMethods.MIN_MAX.value
+
+START_NS = 1_660_910_400 * 1_000_000_000
+STEP_NS = 1_000_000_000
+
+
+def _series(count: int):
+    times = START_NS + np.arange(count, dtype=np.int64) * STEP_NS
+    # Deterministic noise with a few spikes
+    values = np.sin(np.arange(count) / 50) + ((np.arange(count) * 7919) % 13) / 100
+    values[count // 3] = 10.0
+    values[2 * count // 3] = -10.0
+    return times, values
+
+
+def _downsample(times, values, max_points, method, chunk_size=1000):
+    downsampler = StreamingDownsampler(times.min(), times.max(), max_points, method)
+    for start in range(0, len(times), chunk_size):
+        downsampler.add_chunk(
+            times[start : start + chunk_size], values[start : start + chunk_size]
+        )
+    return downsampler
+
+
+def test_lttb_indices_keeps_endpoints():
+    x = np.arange(100, dtype=np.float64)
+    y = np.sin(x)
+    selected = lttb_indices(x, y, 10)
+    assert len(selected) == 10
+    assert selected[0] == 0 and selected[-1] == 99
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_lttb_indices_selects_peaks():
+    x = np.arange(100, dtype=np.float64)
+    y = np.zeros(100)
+    y[42] = 5.0
+    assert 42 in lttb_indices(x, y, 5)
+
+
+def test_lttb_indices_small_inputs():
+    x = np.arange(5, dtype=np.float64)
+    assert list(lttb_indices(x, x, 10)) == [0, 1, 2, 3, 4]
+    assert list(lttb_indices(x, x, 2)) == [0, 4]
+    assert list(lttb_indices(x, x, 1)) == [0]
+
+
+@pytest.mark.parametrize("method", [LTTB, MIN_MAX])
+def test_readings_below_max_points_are_returned_unchanged(method):
+    times, values = _series(50)
+    downsampler = _downsample(times, values, 100, method, chunk_size=7)
+    result_times, result_values = downsampler.get_result()
+    assert np.array_equal(result_times, times)
+    assert np.array_equal(result_values, values)
+    assert downsampler.count == 50
+
+
+@pytest.mark.parametrize("method", [LTTB, MIN_MAX])
+def test_downsampling_preserves_peaks(method):
+    times, values = _series(10_000)
+    downsampler = _downsample(times, values, 100, method)
+    result_times, result_values = downsampler.get_result()
+
+    assert downsampler.count == 10_000
+    assert 0 < len(result_times) <= 100
+    assert np.all(np.diff(result_times) > 0)
+    assert result_values.max() == 10.0 and result_values.min() == -10.0
+    # Only actual readings
+    positions = (result_times - START_NS) // STEP_NS
+    assert np.array_equal(values[positions], result_values)
+
+
+def test_lttb_keeps_endpoints():
+    times, values = _series(10_000)
+    result_times, _ = _downsample(times, values, 100, LTTB).get_result()
+    assert result_times[0] == times[0] and result_times[-1] == times[-1]
+
+
+def test_result_is_independent_of_chunking():
+    times, values = _series(5_000)
+    expected = _downsample(times, values, 64, MIN_MAX, chunk_size=5_000).get_result()
+    for chunk_size in [1, 333, 1024]:
+        result = _downsample(times, values, 64, MIN_MAX, chunk_size).get_result()
+        assert np.array_equal(result[0], expected[0])
+        assert np.array_equal(result[1], expected[1])
+
+
+def test_unsorted_chunks_are_sorted():
+    times, values = _series(2_000)
+    order = np.random.default_rng(0).permutation(len(times))
+    result = _downsample(times[order], values[order], 50, MIN_MAX).get_result()
+    expected = _downsample(times, values, 50, MIN_MAX).get_result()
+    assert np.array_equal(result[0], expected[0])
+    assert np.array_equal(result[1], expected[1])
+
+
+def test_non_numeric_series_keep_the_first_reading_per_bucket():
+    times = START_NS + np.arange(1_000, dtype=np.int64) * STEP_NS
+    values = np.array([f"state_{i}" for i in range(1_000)], dtype=object)
+    result_times, result_values = _downsample(times, values, 10, MIN_MAX).get_result()
+    assert 0 < len(result_times) <= 10
+    assert result_times[0] == times[0] and result_values[0] == "state_0"
+    assert np.all(np.diff(result_times) > 0)
+
+
+def test_bucket_duration_covers_the_period():
+    downsampler = StreamingDownsampler(START_NS, START_NS + 999, 10, MIN_MAX)
+    # 5 buckets for 1000 ns
+    assert downsampler.bucket_duration_ns == 200
+    downsampler = StreamingDownsampler(START_NS, START_NS + 1000, 10, MIN_MAX)
+    assert downsampler.bucket_duration_ns * 5 >= 1001
+
+
+def test_empty_result():
+    downsampler = StreamingDownsampler(START_NS, START_NS + STEP_NS, 10, LTTB)
+    times, values = downsampler.get_result()
+    assert len(times) == 0 and len(values) == 0
+    assert downsampler.count == 0
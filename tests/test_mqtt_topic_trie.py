@@ -0,0 +1,112 @@
+from backend.runtime_connections.mqtt.MqttTopicTrie import (
+    MqttTopicTrie,
+    consolidate_subscriptions,
+)
+
+
+def _trie(*topic_filters: str) -> MqttTopicTrie[str]:
+    trie = MqttTopicTrie()
+    for topic_filter in topic_filters:
+        trie.add(topic_filter, topic_filter)
+    return trie
+
+
+def test_match_exact_filters():
+    trie = _trie("plant/line1/temperature", "plant/line1/pressure")
+    assert trie.match("plant/line1/temperature") == ["plant/line1/temperature"]
+    assert trie.match("plant/line1") == []
+    assert trie.match("plant/line2/temperature") == []
+    assert set(trie.filters()) == {"plant/line1/temperature", "plant/line1/pressure"}
+
+
+def test_match_keeps_all_values_of_a_filter():
+    trie = MqttTopicTrie()
+    trie.add("plant/line1/temperature", 1)
+    trie.add("plant/line1/temperature", 2)
+    trie.add("plant/+/temperature", 3)
+    assert sorted(trie.match("plant/line1/temperature")) == [1, 2, 3]
+
+
+def test_match_single_level_wildcard():
+    trie = _trie("plant/+/temperature", "+/line1/+")
+    assert sorted(trie.match("plant/line1/temperature")) == [
+        "+/line1/+",
+        "plant/+/temperature",
+    ]
+    assert trie.match("plant/line2/temperature") == ["plant/+/temperature"]
+    # Exactly one level
+    assert trie.match("plant/line1/a/temperature") == []
+    assert trie.match("plant/temperature") == []
+
+
+def test_match_multi_level_wildcard():
+    trie = _trie("plant/#")
+    assert trie.match("plant/line1/temperature") == ["plant/#"]
+    assert trie.match("plant/line1") == ["plant/#"]
+    # Also matches the parent level
+    assert trie.match("plant") == ["plant/#"]
+    assert trie.match("other/line1") == []
+
+    assert _trie("#").match("plant/line1") == ["#"]
+
+
+def test_match_does_not_match_system_topics_with_first_level_wildcards():
+    trie = _trie("#", "+/broker/clients", "$SYS/#")
+    assert trie.match("$SYS/broker/clients") == ["$SYS/#"]
+    assert sorted(trie.match("plant/broker/clients")) == ["#", "+/broker/clients"]
+
+
+def test_consolidate_without_min_siblings_keeps_filters():
+    topic_filters = ["plant/line1/temperature", "plant/line1/pressure", "plant/line2"]
+    assert sorted(consolidate_subscriptions(topic_filters, None)) == sorted(
+        topic_filters
+    )
+    # Duplicates
+    assert consolidate_subscriptions(["a/b", "a/b"], None) == ["a/b"]
+
+
+def test_consolidate_drops_filters_covered_by_wildcards():
+    assert sorted(
+        consolidate_subscriptions(
+            ["plant/line1/temperature", "plant/line1/+", "plant/line2/pressure"], None
+        )
+    ) == ["plant/line1/+", "plant/line2/pressure"]
+    assert consolidate_subscriptions(
+        ["plant/line1/temperature", "plant/#", "plant/line2"], None
+    ) == ["plant/#"]
+
+
+def test_consolidate_collapses_sibling_leaves():
+    topic_filters = [f"plant/line1/sensor{i}" for i in range(3)] + ["plant/line2/a"]
+    assert sorted(consolidate_subscriptions(topic_filters, 3)) == [
+        "plant/line1/+",
+        "plant/line2/a",
+    ]
+    assert sorted(consolidate_subscriptions(topic_filters, 4)) == sorted(
+        topic_filters
+    )
+
+
+def test_consolidate_collapses_subtrees():
+    topic_filters = [
+        f"plant/line{line}/sensor{i}" for line in range(2) for i in range(2)
+    ]
+    # Each line collapsed to plant/lineX/+, both lines then to plant/#
+    assert consolidate_subscriptions(topic_filters, 2) == ["plant/#"]
+
+
+def test_consolidate_never_collapses_top_level_topics():
+    topic_filters = ["a", "b", "c"]
+    assert sorted(consolidate_subscriptions(topic_filters, 2)) == topic_filters
+
+
+def test_consolidated_subscriptions_cover_all_filters():
+    topic_filters = [
+        f"site{site}/line{line}/sensor{i}"
+        for site in range(3)
+        for line in range(site + 1)
+        for i in range(site + 2)
+    ] + ["site0/line0", "site1/status"]
+    subscriptions = _trie(*consolidate_subscriptions(topic_filters, 3))
+    for topic_filter in topic_filters:
+        assert subscriptions.match(topic_filter), topic_filter
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.runtime_connections import TimeseriesCompressionFilter as filter_module
+from backend.runtime_connections.TimeseriesCompressionFilter import (
+    TimeseriesCompressionFilter,
+)
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+START_TIME = datetime(2022, 8, 19, 12, 0, tzinfo=timezone.utc)
+DECIMAL = TimeseriesValueTypes.DECIMAL.value
+
+
+def _at(seconds: float) -> datetime:
+    return START_TIME + timedelta(seconds=seconds)
+
+
+def _process_all(compression_filter, values):
+    """
+    :param values: one value per second
+    :return: stored (second, value)
+    """
+    stored = []
+    for i, value in enumerate(values):
+        for reading_time, stored_value in compression_filter.process(_at(i), value):
+            stored.append(((reading_time - START_TIME).total_seconds(), stored_value))
+    return stored
+
+
+def test_first_reading_is_always_stored():
+    compression_filter = TimeseriesCompressionFilter(DECIMAL, deadband_absolute=100)
+    assert compression_filter.process(_at(0), 1.0) == [(_at(0), 1.0)]
+
+
+def test_deadband_absolute():
+    compression_filter = TimeseriesCompressionFilter(DECIMAL, deadband_absolute=0.5)
+    stored = _process_all(compression_filter, [10.0, 10.3, 10.5, 10.6, 10.2, 11.2])
+    # Compared to the last stored value, not to the last received one
+    assert stored == [(0, 10.0), (3, 10.6), (5, 11.2)]
+    assert compression_filter.suppressed_deadband_count == 3
+
+
+def test_deadband_percent():
+    compression_filter = TimeseriesCompressionFilter(DECIMAL, deadband_percent=10)
+    stored = _process_all(compression_filter, [100.0, 109.0, 111.0, 101.0, 99.0])
+    assert stored == [(0, 100.0), (2, 111.0), (4, 99.0)]
+
+
+def test_deadband_is_ignored_for_non_numeric_series():
+    compression_filter = TimeseriesCompressionFilter(
+        TimeseriesValueTypes.STRING.value, deadband_absolute=1
+    )
+    stored = _process_all(compression_filter, ["a", "b"])
+    assert stored == [(0, "a"), (1, "b")]
+
+
+def test_change_only():
+    compression_filter = TimeseriesCompressionFilter(
+        TimeseriesValueTypes.BOOL.value, change_only=True
+    )
+    stored = _process_all(compression_filter, [True, True, False, False, True])
+    assert stored == [(0, True), (2, False), (4, True)]
+    assert compression_filter.suppressed_unchanged_count == 2
+
+
+def test_swinging_door_stores_only_the_ends_of_a_line():
+    compression_filter = TimeseriesCompressionFilter(
+        DECIMAL, swinging_door_deviation=0.1
+    )
+    ramp = [float(i) for i in range(10)]
+    stored = _process_all(compression_filter, ramp + [0.0])
+    # The last reading of the ramp is stored when the next one leaves the corridor,
+    # which is then held itself
+    assert stored == [(0, 0.0), (9, 9.0)]
+    assert compression_filter.suppressed_swinging_door_count == 8
+
+
+def test_swinging_door_interpolation_stays_within_the_deviation():
+    deviation = 0.5
+    compression_filter = TimeseriesCompressionFilter(
+        DECIMAL, swinging_door_deviation=deviation
+    )
+    # Deterministic, noisy series
+    values = [((i * 7919) % 23) / 10 + i * 0.05 for i in range(300)]
+    stored = _process_all(compression_filter, values)
+    assert len(stored) < len(values)
+
+    # Interpolating between the stored readings reproduces all readings up to the last stored one
+    for (t0, v0), (t1, v1) in zip(stored, stored[1:]):
+        for t in range(int(t0) + 1, int(t1)):
+            interpolated = v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+            assert abs(interpolated - values[t]) <= deviation + 1e-9
+
+
+def test_heartbeat_stores_suppressed_readings():
+    compression_filter = TimeseriesCompressionFilter(
+        DECIMAL, deadband_absolute=10, max_heartbeat_ms=3000
+    )
+    stored = _process_all(compression_filter, [1.0] * 8)
+    assert stored == [(0, 1.0), (3, 1.0), (6, 1.0)]
+
+
+def test_heartbeat_stores_the_held_reading_first():
+    compression_filter = TimeseriesCompressionFilter(
+        DECIMAL, swinging_door_deviation=1, max_heartbeat_ms=5000
+    )
+    stored = _process_all(compression_filter, [1.0] * 6)
+    assert stored == [(0, 1.0), (4, 1.0), (5, 1.0)]
+
+
+def test_flush_idle_stores_the_held_reading(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(filter_module.time, "monotonic", lambda: now[0])
+    compression_filter = TimeseriesCompressionFilter(
+        DECIMAL, swinging_door_deviation=1
+    )
+    _process_all(compression_filter, [1.0, 1.0, 1.0])
+
+    assert compression_filter.flush_idle() == []
+    now[0] += filter_module.IDLE_TIMEOUT
+    assert compression_filter.flush_idle() == [(_at(2), 1.0)]
+    # Only once
+    assert compression_filter.flush_idle() == []
+
+
+def test_held_reading_without_time_keeps_the_receive_time():
+    compression_filter = TimeseriesCompressionFilter(
+        DECIMAL, swinging_door_deviation=1, max_heartbeat_ms=60 * 60 * 1000
+    )
+    compression_filter.process(None, 1.0)
+    compression_filter.process(None, 1.0)
+    compression_filter.idle_timeout = 0
+    [(reading_time, value)] = compression_filter.flush_idle()
+    assert reading_time is not None and reading_time.tzinfo is not None
+    assert value == 1.0
+
+
+def test_statistics():
+    compression_filter = TimeseriesCompressionFilter(DECIMAL, deadband_absolute=1)
+    _process_all(compression_filter, [1.0, 1.5, 3.0])
+    assert compression_filter.get_statistics() == {
+        "received": 3,
+        "stored": 2,
+        "suppressed_deadband": 1,
+        "suppressed_unchanged": 0,
+        "suppressed_swinging_door": 0,
+    }
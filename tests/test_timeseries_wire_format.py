@@ -0,0 +1,76 @@
+import struct
+
+import numpy as np
+import pandas as pd
+
+from util.timeseries_wire_format import (
+    TIMESERIES_MEDIA_TYPE,
+    accepts_binary,
+    decode_dataframe,
+    encode_dataframe,
+)
+
+
+def _dataframe(values) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "time": pd.date_range(
+                "2022-08-19T12:00:00.123456789Z",
+                periods=len(values),
+                freq="1500ms",
+            ),
+            "value": values,
+        }
+    )
+
+
+def test_round_trip():
+    df = _dataframe([1.5, -2.25, np.nan, 1e300])
+    decoded = decode_dataframe(encode_dataframe(df))
+    # Nanosecond precision and UTC
+    assert decoded["time"].equals(df["time"].dt.tz_convert("UTC"))
+    np.testing.assert_array_equal(decoded["value"], df["value"])
+
+
+def test_round_trip_of_integers():
+    df = _dataframe([1, 2, 3])
+    decoded = decode_dataframe(encode_dataframe(df))
+    assert list(decoded["value"]) == [1.0, 2.0, 3.0]
+
+
+def test_round_trip_converts_other_timezones_to_utc():
+    df = _dataframe([1.0, 2.0])
+    df["time"] = df["time"].dt.tz_convert("Europe/Oslo")
+    decoded = decode_dataframe(encode_dataframe(df))
+    assert list(decoded["time"]) == list(df["time"])
+    assert str(decoded["time"].dt.tz) == "UTC"
+
+
+def test_empty_dataframe():
+    df = pd.DataFrame(
+        {"time": pd.to_datetime([], utc=True), "value": np.array([], dtype=object)}
+    )
+    content = encode_dataframe(df)
+    assert content == struct.pack("<Q", 0)
+    assert len(decode_dataframe(content)) == 0
+
+
+def test_layout():
+    df = _dataframe([1.0, 2.0])
+    content = encode_dataframe(df)
+    assert len(content) == 8 + 2 * 8 + 2 * 8
+    (count,) = struct.unpack_from("<Q", content)
+    assert count == 2
+    assert struct.unpack_from("<2d", content, 8 + 2 * 8) == (1.0, 2.0)
+
+
+def test_non_numeric_values_are_not_encoded():
+    assert encode_dataframe(_dataframe(["a", "b"])) is None
+    assert encode_dataframe(_dataframe([True, False])) is None
+
+
+def test_accepts_binary():
+    assert accepts_binary(TIMESERIES_MEDIA_TYPE)
+    assert accepts_binary(f"{TIMESERIES_MEDIA_TYPE}, application/json;q=0.5")
+    assert not accepts_binary("application/json")
+    assert not accepts_binary(None)
@@ -0,0 +1,164 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.specialized_databases.timeseries import (
+    TimeseriesWriteSpool as spool_module,
+)
+from backend.specialized_databases.timeseries.TimeseriesWriteSpool import (
+    TimeseriesWriteSpool,
+    set_spool_owner,
+)
+
+START_TIME = datetime(2022, 8, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def _records(count: int, offset: int = 0):
+    return [
+        (f"iri_{i % 3}", float(i), START_TIME + timedelta(seconds=i))
+        for i in range(offset, offset + count)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def main_owner():
+    set_spool_owner(spool_module.MAIN_SPOOL_OWNER)
+    yield
+    set_spool_owner(spool_module.MAIN_SPOOL_OWNER)
+
+
+def test_replays_segments_oldest_first(tmp_path):
+    spool = TimeseriesWriteSpool(str(tmp_path), segment_size_bytes=200)
+    for batch in range(5):
+        spool.append(_records(3, offset=batch * 3))
+    assert spool.record_count() == 15
+
+    written = []
+    while spool.has_data():
+        assert spool.replay_oldest_segment(written.extend) > 0
+
+    assert [value for _, value, _ in written] == [float(i) for i in range(15)]
+    assert written[0] == ("iri_0", 0.0, START_TIME)
+    assert spool.record_count() == 0
+    assert spool.replayed_count == 15
+    assert not any(
+        name.endswith(spool_module.SEGMENT_FILE_SUFFIX)
+        for name in os.listdir(spool.directory)
+    )
+
+
+def test_failed_replay_keeps_the_segment(tmp_path):
+    spool = TimeseriesWriteSpool(str(tmp_path))
+    spool.append(_records(4))
+
+    def failing_write(_):
+        raise ConnectionError("database not available")
+
+    with pytest.raises(ConnectionError):
+        spool.replay_oldest_segment(failing_write)
+    assert spool.record_count() == 4
+
+    written = []
+    spool.replay_oldest_segment(written.extend)
+    assert len(written) == 4
+
+
+def test_replays_in_batches(tmp_path):
+    spool = TimeseriesWriteSpool(str(tmp_path), replay_batch_size=3)
+    spool.append(_records(7))
+
+    batches = []
+    spool.replay_oldest_segment(batches.append)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+
+def test_drops_oldest_segments_when_full(tmp_path):
+    spool = TimeseriesWriteSpool(
+        str(tmp_path), segment_size_bytes=100, max_size_bytes=300
+    )
+    for batch in range(20):
+        spool.append(_records(2, offset=batch * 2))
+
+    assert spool.disk_usage_bytes() <= 300 + 100
+    assert spool.dropped_disk_full_count > 0
+    assert spool.record_count() + spool.dropped_disk_full_count == 40
+
+    written = []
+    while spool.has_data():
+        spool.replay_oldest_segment(written.extend)
+    # The newest readings are kept
+    assert written[-1][1] == 39.0
+    assert written[0][1] == float(spool.dropped_disk_full_count)
+
+
+def test_reading_without_time_gets_the_spooling_time(tmp_path):
+    spool = TimeseriesWriteSpool(str(tmp_path))
+    before = datetime.now(timezone.utc)
+    spool.append([("iri", 1, None)])
+
+    written = []
+    spool.replay_oldest_segment(written.extend)
+    assert written[0][2] >= before - timedelta(seconds=1)
+
+
+def test_tracks_the_oldest_pending_reading(tmp_path):
+    spool = TimeseriesWriteSpool(str(tmp_path), segment_size_bytes=100)
+    assert spool.get_oldest_reading_time() is None
+
+    spool.append(_records(2, offset=10))
+    spool.append(_records(2, offset=0))
+    # Naive times are UTC
+    spool.append([("iri", 1.0, datetime(2022, 8, 19, 13, 0))])
+    assert spool.get_oldest_reading_time() == START_TIME.timestamp()
+
+    while spool.has_data():
+        spool.replay_oldest_segment(lambda records: None)
+    assert spool.get_oldest_reading_time() is None
+
+
+def test_picks_up_segments_of_a_previous_run(tmp_path):
+    spool = TimeseriesWriteSpool(str(tmp_path))
+    spool.append(_records(5))
+    spool.close()
+
+    restarted = TimeseriesWriteSpool(str(tmp_path))
+    written = []
+    restarted.replay_oldest_segment(written.extend)
+    assert len(written) == 5
+    assert restarted.get_oldest_reading_time() is None
+
+
+def test_replays_segments_of_other_stopped_processes(tmp_path):
+    set_spool_owner("shard_0")
+    stopped = TimeseriesWriteSpool(str(tmp_path))
+    stopped.append(_records(3))
+    stopped.close()
+
+    set_spool_owner("shard_1")
+    spool = TimeseriesWriteSpool(str(tmp_path))
+    assert spool.has_pending_replay()
+
+    written = []
+    assert spool.replay_oldest_segment(written.extend) == 3
+    assert len(written) == 3
+    assert spool.replay_oldest_segment(written.extend) == 0
+
+
+def test_ignores_partially_written_lines(tmp_path):
+    spool = TimeseriesWriteSpool(str(tmp_path))
+    spool.append(_records(2))
+    segment = [
+        name
+        for name in os.listdir(spool.directory)
+        if name.endswith(spool_module.SEGMENT_FILE_SUFFIX)
+    ][0]
+    with open(os.path.join(spool.directory, segment), "ab") as file:
+        file.write(b'["iri", 1.0, "2022-08')
+
+    spool.close()
+    restarted = TimeseriesWriteSpool(str(tmp_path))
+    written = []
+    restarted.replay_oldest_segment(written.extend)
+    assert len(written) == 2
+    assert restarted.corrupted_count == 1
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.runtime_connections.mqtt.timestamp_parsing import (
+    TimestampFormats,
+    get_timestamp_parser,
+    parse_iso_8601,
+)
+
+EXPECTED = datetime(2022, 9, 12, 10, 15, 30, 123000, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2022-09-12T10:15:30.123Z",
+        "2022-09-12T10:15:30.123z",
+        "2022-09-12T10:15:30.123+00:00",
+        "2022-09-12T12:15:30.123+02:00",
+        "2022-09-12 10:15:30.123",
+        "2022-09-12T10:15:30.123000Z",
+        "2022-09-12T10:15:30.123000999Z",
+    ],
+)
+def test_parse_iso_8601(value):
+    timestamp = parse_iso_8601(value)
+    assert timestamp == EXPECTED
+    assert timestamp.utcoffset() == timedelta(0)
+
+
+def test_parse_iso_8601_without_fraction():
+    assert parse_iso_8601("2022-09-12T10:15:30Z") == EXPECTED.replace(microsecond=0)
+
+
+def test_parse_iso_8601_invalid():
+    with pytest.raises(ValueError):
+        parse_iso_8601("yesterday")
+    with pytest.raises(TypeError):
+        parse_iso_8601(1662977730)
+
+
+def test_default_parser_is_iso_8601():
+    assert get_timestamp_parser(None) is parse_iso_8601
+    assert get_timestamp_parser(TimestampFormats.ISO_8601.value) is parse_iso_8601
+
+
+@pytest.mark.parametrize(
+    "timestamp_format,value",
+    [
+        (TimestampFormats.EPOCH_S.value, 1662977730.123),
+        (TimestampFormats.EPOCH_S.value, "1662977730.123"),
+        (TimestampFormats.EPOCH_MS.value, 1662977730123),
+        (TimestampFormats.EPOCH_MS.value, "1662977730123"),
+        (TimestampFormats.EPOCH_US.value, 1662977730123000),
+        (TimestampFormats.EPOCH_NS.value, 1662977730123000000),
+        (TimestampFormats.EPOCH_NS.value, "1662977730123000999"),
+    ],
+)
+def test_epoch_parsers(timestamp_format, value):
+    timestamp = get_timestamp_parser(timestamp_format)(value)
+    # Float values may be off by rounding
+    assert abs(timestamp - EXPECTED) < timedelta(milliseconds=1)
+    assert timestamp.tzinfo == timezone.utc
+
+
+def test_epoch_parser_keeps_precision_of_large_integers():
+    parse = get_timestamp_parser(TimestampFormats.EPOCH_NS.value)
+    assert parse(1662977730123456789) == EXPECTED.replace(microsecond=123456)
+
+
+def test_epoch_parser_invalid():
+    with pytest.raises(ValueError):
+        get_timestamp_parser(TimestampFormats.EPOCH_MS.value)("now")
+
+
+def test_strptime_parser():
+    parse = get_timestamp_parser("%d.%m.%Y %H:%M:%S")
+    assert parse("12.09.2022 10:15:30") == EXPECTED.replace(microsecond=0)
+
+    parse_with_offset = get_timestamp_parser("%d.%m.%Y %H:%M:%S%z")
+    assert parse_with_offset("12.09.2022 12:15:30+0200") == EXPECTED.replace(
+        microsecond=0
+    )
+    with pytest.raises(ValueError):
+        parse("2022-09-12T10:15:30")
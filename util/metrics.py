@@ -0,0 +1,132 @@
+"""
+Minimal, low-overhead metric primitives (no locks, plain counters) and rendering to the Prometheus text format.
+Metrics are collected per process, published as snapshots (dicts) and aggregated by summing the snapshots.
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+# Upper bounds of the latency histogram buckets (in s)
+LATENCY_BUCKETS = (
+    0.00001,
+    0.00005,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+)
+
+# (metric name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Observing costs one binary search over the bucket bounds
+    """
+
+    __slots__ = ["buckets", "counts", "sum", "count"]
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # Last one: larger than all bounds (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+def merge_histograms(histograms: Iterable[Dict]) -> Dict | None:
+    """
+    :param histograms: snapshots created by Histogram.to_dict with the same buckets
+    :return: the summed histogram snapshot. None, if no histograms were given
+    """
+    merged = None
+    for histogram in histograms:
+        if merged is None:
+            merged = {
+                "buckets": histogram["buckets"],
+                "counts": list(histogram["counts"]),
+                "sum": histogram["sum"],
+                "count": histogram["count"],
+            }
+            continue
+        merged["counts"] = [
+            a + b for a, b in zip(merged["counts"], histogram["counts"])
+        ]
+        merged["sum"] += histogram["sum"]
+        merged["count"] += histogram["count"]
+    return merged
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if len(labels) == 0:
+        return f"{name} {value}"
+    label_str = ",".join(
+        f'{key}="{_escape_label_value(str(label_value))}"'
+        for key, label_value in labels.items()
+    )
+    return f"{name}{{{label_str}}} {value}"
+
+
+def histogram_samples(
+    name: str, labels: Dict[str, str], histogram: Dict
+) -> List[Sample]:
+    """
+    :return: the cumulative bucket, sum and count samples of a histogram snapshot
+    """
+    samples: List[Sample] = []
+    cumulative = 0
+    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+        cumulative += count
+        samples.append((f"{name}_bucket", {**labels, "le": str(bound)}, cumulative))
+    samples.append((f"{name}_bucket", {**labels, "le": "+Inf"}, histogram["count"]))
+    samples.append((f"{name}_sum", labels, histogram["sum"]))
+    samples.append((f"{name}_count", labels, histogram["count"]))
+    return samples
+
+
+def render_prometheus(
+    metric_types: Dict[str, Tuple[str, str]], samples: List[Sample]
+) -> str:
+    """
+    Renders samples to the Prometheus text exposition format
+    :param metric_types: metric name -> (type, help text)
+    :param samples: samples of the metrics. Histogram samples are assigned to their metric by the name prefix
+    :return:
+    """
+    samples_per_metric: Dict[str, List[Sample]] = {name: [] for name in metric_types}
+    for sample in samples:
+        name = sample[0]
+        if name not in samples_per_metric:
+            name = name.rsplit("_", 1)[0]
+        samples_per_metric[name].append(sample)
+
+    lines = []
+    for name, (metric_type, help_text) in metric_types.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample_name, labels, value in samples_per_metric[name]:
+            lines.append(_format_sample(sample_name, labels, value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,59 @@
+"""
+Compact binary format for time-series responses, negotiated via the Accept header (JSON stays the default):
+little-endian uint64 number of readings n, n int64 times (epoch in ns) and n float64 values.
+Decoded without parsing, directly from the buffers.
+Only numeric time-series are encoded this way (others are returned as JSON).
+"""
+import struct
+
+import numpy as np
+import pandas as pd
+
+TIMESERIES_MEDIA_TYPE = "application/vnd.sindit.timeseries"
+
+# Metadata of the adaptive range responses (in the JSON body otherwise)
+COUNT_HEADER = "X-Timeseries-Count"
+AGGREGATION_METHOD_HEADER = "X-Timeseries-Aggregation-Method"
+AGGREGATION_MAX_POINTS_HEADER = "X-Timeseries-Aggregation-Max-Points"
+
+_HEADER = struct.Struct("<Q")
+
+
+def accepts_binary(accept_header: str | None) -> bool:
+    return accept_header is not None and TIMESERIES_MEDIA_TYPE in accept_header
+
+
+def encode_dataframe(df: pd.DataFrame) -> bytes | None:
+    """
+    :param df: columns "time" and "value"
+    :return: the encoded readings. None, if the values are not numeric
+    """
+    if len(df) > 0 and df["value"].dtype.kind not in "fiu":
+        return None
+    times = (
+        pd.to_datetime(df["time"], utc=True)
+        .to_numpy(dtype="datetime64[ns]")
+        .view(np.int64)
+    )
+    return b"".join(
+        [
+            _HEADER.pack(len(df)),
+            times.astype("<i8", copy=False).tobytes(),
+            df["value"].to_numpy(dtype="<f8").tobytes(),
+        ]
+    )
+
+
+def decode_dataframe(content: bytes) -> pd.DataFrame:
+    """
+    :param content: encoded readings
+    :return: dataframe with the columns "time" (UTC) and "value", backed by the buffer
+    """
+    (count,) = _HEADER.unpack_from(content)
+    times = np.frombuffer(content, dtype="<i8", count=count, offset=_HEADER.size)
+    values = np.frombuffer(
+        content, dtype="<f8", count=count, offset=_HEADER.size + 8 * count
+    )
+    return pd.DataFrame(
+        {"time": pd.to_datetime(times, unit="ns", utc=True), "value": values}
+    )